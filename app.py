@@ -1,21 +1,511 @@
 import numpy as np
-from flask import Flask, request, jsonify, render_template
-import pickle
+from flask import Flask, Response, g, request, jsonify, render_template, stream_with_context
 import os
+import atexit
+import gc
+import hmac
+import io
+import json
+import threading
+import time
+
+from features import (FEATURE_NAMES, PayloadError, csv_matrices, format_predictions, iter_text_lines,
+                      payload_to_matrix, prediction_header)
+from batching import MicroBatcher
+from drift import DriftBaseline, DriftMonitor
+from encoding import CategoricalEncoder, UnknownCategoryError
+from feature_store import FeatureStore, FeatureStoreReloader, UnknownRestaurantError
+from forest import FALLBACK_MIN_ROWS, FlatForest
+from inference_pool import InferencePool, PoolSaturated
+from metrics import BATCH_SIZE_BUCKETS, Registry
+from model_loader import ModelReloader, artifact_version, load_model, warm_up
+from precompute import PredictionTableKeeper
+from prediction_cache import PredictionCache
+from prediction_log import PredictionLog
+from profiling import FORMATS as PROFILE_FORMATS, ProfileSession
+from timing import JsonlSpanExporter, end_request, phase, start_request
 
 app = Flask(__name__)
 
+# Upper bound on rows accepted by one JSON batch request
+MAX_BATCH_ROWS = int(os.environ.get('ZOMATO_MAX_BATCH_ROWS', '10000'))
+
+# 'flat' serves predictions from the array-backed engine in forest.py
+# (a few hundred microseconds per row instead of about 9 ms), handing
+# matrices of forest.FALLBACK_MIN_ROWS rows or more to the unpickled
+# ExtraTreesRegressor, which is faster on those; 'sklearn' keeps the
+# ExtraTreesRegressor for everything
+INFERENCE_ENGINE = os.environ.get('ZOMATO_INFERENCE_ENGINE', 'flat')
+
+# Rows parsed and scored per forest call by the streaming CSV endpoint
+CSV_CHUNK_ROWS = int(os.environ.get('ZOMATO_CSV_CHUNK_ROWS', '4096'))
+
+# Number of single-row predictions kept by the LRU cache (0 disables it)
+PREDICTION_CACHE_SIZE = int(os.environ.get('ZOMATO_PREDICTION_CACHE_SIZE', '4096'))
+prediction_cache = PredictionCache(PREDICTION_CACHE_SIZE) if PREDICTION_CACHE_SIZE > 0 else None
+
+# Concurrent single-row predictions are merged into batches of up to this
+# many rows, waiting at most MICROBATCH_MAX_WAIT_US for a batch to fill up
+# (a batch size of 0 disables micro-batching)
+MICROBATCH_MAX_SIZE = int(os.environ.get('ZOMATO_MICROBATCH_MAX_SIZE', '0'))
+MICROBATCH_MAX_WAIT_US = int(os.environ.get('ZOMATO_MICROBATCH_MAX_WAIT_US', '500'))
+
+# Forest traversal can run in this many separate processes attached to a
+# shared-memory copy of the model (0 keeps it in the request threads); at
+# most INFERENCE_QUEUE_DEPTH matrices may wait for the pool at once
+INFERENCE_PROCESSES = int(os.environ.get('ZOMATO_INFERENCE_PROCESSES', '0'))
+INFERENCE_QUEUE_DEPTH = int(os.environ.get('ZOMATO_INFERENCE_QUEUE_DEPTH', '64'))
+inference_pool = None
+
+# Trained model served by the app: model.pkl, or the forest artifact also
+# written by model.py (see artifact.py) with ZOMATO_MODEL_PATH=model.forest,
+# which loads without scikit-learn and is memory-mapped but has no sklearn
+# fallback for large matrices (see forest.py)
+MODEL_PATH = os.environ.get('ZOMATO_MODEL_PATH') or 'model.pkl'
+
+# Map a forest artifact's node arrays from the page cache instead of reading
+# them into the heap, so every process serving the same file on this host
+# shares one physical copy, including after hot reloads in each worker
+MODEL_MMAP = os.environ.get('ZOMATO_MODEL_MMAP', '1') == '1'
+
+# Seconds between checks of MODEL_PATH for a newly trained model, and of
+# FEATURE_STORE_PATH for a changed table (0 disables watching); POST
+# /admin/reload reloads the model on demand when ZOMATO_ADMIN_TOKEN is set
+MODEL_WATCH_INTERVAL = float(os.environ.get('ZOMATO_MODEL_WATCH_INTERVAL', '0'))
+ADMIN_TOKEN = os.environ.get('ZOMATO_ADMIN_TOKEN')
+
+# Vocabularies written by preprocessing.py, used to encode raw categorical
+# values; ZOMATO_UNKNOWN_CATEGORY decides what happens to unseen ones
+# ('reject' answers 400, 'fallback' encodes them as encoding.UNKNOWN_CODE)
+VOCABULARIES_PATH = os.environ.get('ZOMATO_VOCABULARIES', 'vocabularies.json')
+UNKNOWN_CATEGORY = os.environ.get('ZOMATO_UNKNOWN_CATEGORY', 'reject')
+category_encoder = None
+try:
+    if os.path.exists(VOCABULARIES_PATH):
+        category_encoder = CategoricalEncoder.from_file(VOCABULARIES_PATH, UNKNOWN_CATEGORY)
+except Exception as e:
+    print(f"Error loading vocabularies: {e}")
+
+# Training table that /api/v1/predict/by-id looks restaurants up in: a CSV
+# like Zomato_df.csv (cached column-wise by dataset.py) or a cache directory
+FEATURE_STORE_PATH = os.environ.get('ZOMATO_FEATURE_STORE', 'Zomato_df.csv')
+feature_store = None
+try:
+    if os.path.exists(FEATURE_STORE_PATH):
+        feature_store = FeatureStore.from_dataset(FEATURE_STORE_PATH)
+except Exception as e:
+    print(f"Error loading feature store: {e}")
+
+# Compare the features of live requests with the training distribution
+# (see drift.py), using the baseline written by drift.py, or one computed
+# from the feature store when there is no such file; drift scores are
+# refreshed every ZOMATO_DRIFT_INTERVAL seconds and served at /api/v1/drift
+DRIFT_MONITOR = os.environ.get('ZOMATO_DRIFT_MONITOR', '1') == '1'
+DRIFT_BASELINE_PATH = os.environ.get('ZOMATO_DRIFT_BASELINE', 'drift_baseline.json')
+DRIFT_INTERVAL = float(os.environ.get('ZOMATO_DRIFT_INTERVAL', '60'))
+DRIFT_MIN_ROWS = int(os.environ.get('ZOMATO_DRIFT_MIN_ROWS', '200'))
+drift_monitor = None
+try:
+    if DRIFT_MONITOR:
+        if os.path.exists(DRIFT_BASELINE_PATH):
+            drift_baseline = DriftBaseline.from_file(DRIFT_BASELINE_PATH)
+        elif feature_store is not None:
+            drift_baseline = DriftBaseline.from_matrix(feature_store.features)
+        else:
+            drift_baseline = None
+        if drift_baseline is not None:
+            drift_monitor = DriftMonitor(drift_baseline, DRIFT_INTERVAL, DRIFT_MIN_ROWS)
+except Exception as e:
+    print(f"Error loading drift baseline: {e}")
+
+# Score every restaurant of the feature store with the current model ahead
+# of time (see precompute.py), answering known feature vectors from that
+# table and sending only novel ones to the forest
+PRECOMPUTE_PREDICTIONS = os.environ.get('ZOMATO_PRECOMPUTE', '1') == '1'
+prediction_tables = PredictionTableKeeper() if PRECOMPUTE_PREDICTIONS else None
+
+# Time the phases of each request and report them in a Server-Timing
+# header (see timing.py); with ZOMATO_TRACE_FILE every request's phases are
+# also appended to that file as JSON spans. span_exporter may be replaced by
+# any callable taking the request record.
+REQUEST_TIMING = os.environ.get('ZOMATO_REQUEST_TIMING', '0') == '1'
+TRACE_FILE = os.environ.get('ZOMATO_TRACE_FILE')
+span_exporter = JsonlSpanExporter(TRACE_FILE) if TRACE_FILE else None
+
+# With ZOMATO_PREDICTION_LOG_DIR every prediction (inputs, output, model
+# version, latency) is queued in memory and written to rotated JSONL files
+# there by a background thread (see prediction_log.py)
+PREDICTION_LOG_DIR = os.environ.get('ZOMATO_PREDICTION_LOG_DIR')
+PREDICTION_LOG_MAX_BYTES = int(os.environ.get('ZOMATO_PREDICTION_LOG_MAX_BYTES', str(64 << 20)))
+PREDICTION_LOG_ROTATE_SECONDS = float(os.environ.get('ZOMATO_PREDICTION_LOG_ROTATE_SECONDS', '3600'))
+PREDICTION_LOG_COMPRESS = os.environ.get('ZOMATO_PREDICTION_LOG_COMPRESS', '0') == '1'
+PREDICTION_LOG_CAPACITY = int(os.environ.get('ZOMATO_PREDICTION_LOG_CAPACITY', '65536'))
+prediction_log = PredictionLog(
+    PREDICTION_LOG_DIR, PREDICTION_LOG_MAX_BYTES, PREDICTION_LOG_ROTATE_SECONDS,
+    PREDICTION_LOG_COMPRESS, PREDICTION_LOG_CAPACITY,
+) if PREDICTION_LOG_DIR else None
+if prediction_log is not None:
+    atexit.register(prediction_log.close)
+
+# Prometheus metrics served at /metrics (see metrics.py)
+metrics_registry = Registry()
+requests_total = metrics_registry.counter(
+    'zomato_requests_total', 'HTTP requests by route, method and status code', ('route', 'method', 'status'))
+request_duration = metrics_registry.histogram(
+    'zomato_request_duration_seconds', 'Time to produce a response, by route', ('route',))
+requests_in_flight = metrics_registry.gauge(
+    'zomato_requests_in_flight', 'Requests being handled, by route', ('route',))
+errors_total = metrics_registry.counter(
+    'zomato_errors_total', 'Failed requests by route and error type', ('route', 'type'))
+forest_batch_rows = metrics_registry.histogram(
+    'zomato_forest_batch_rows', 'Rows scored per forest evaluation', buckets=BATCH_SIZE_BUCKETS)
+precomputed_rows = metrics_registry.counter(
+    'zomato_precomputed_rows_total', 'Rows answered from the precomputed prediction table')
+
+# Error type recorded for JSON responses with these status codes; /predict
+# reports its errors in the page and sets g.error_type itself
+ERROR_TYPES = {
+    400: 'invalid_input', 403: 'forbidden', 404: 'not_found', 413: 'batch_too_large',
+    422: 'invalid_model', 500: 'prediction_failed', 503: 'unavailable',
+}
+
+# POST /admin/profile captures a profile of live requests (see profiling.py);
+# profiles are also saved to ZOMATO_PROFILE_DIR when it is set
+PROFILE_DIR = os.environ.get('ZOMATO_PROFILE_DIR')
+profile_session = None
+_profile_lock = threading.Lock()
+
+model_version = None
+model_load_seconds = None
+_last_load_seconds = None
+_model_lock = threading.Lock()
+
+# Rows predicted by the background warm-up before /readyz reports ready
+WARMUP_ROWS = int(os.environ.get('ZOMATO_WARMUP_ROWS', '64'))
+
+# Answer prediction routes with 503 until the model is warm, so a load
+# balancer retries them on a replica that is ready
+REJECT_UNTIL_READY = os.environ.get('ZOMATO_REJECT_UNTIL_READY', '0') == '1'
+
+# Model object that last completed warm-up, and the outcome of the
+# background warm-up running in this process
+warmed_model = None
+warmup_error = None
+_warmup_model = None
+_warmup_pid = None
+
+
+def load_served_model(path):
+    '''
+    Load a model the way it is served, remembering how long loading took
+    '''
+    global _last_load_seconds
+    started = time.perf_counter()
+    loaded = load_model(path, INFERENCE_ENGINE, mmap=MODEL_MMAP)
+    _last_load_seconds = time.perf_counter() - started
+    return loaded
+
+
 # Load model with error handling
 try:
-    if os.path.exists('model.pkl'):
-        model = pickle.load(open('model.pkl', 'rb'))
+    if os.path.exists(MODEL_PATH):
+        model = load_served_model(MODEL_PATH)
+        model_version = artifact_version(MODEL_PATH)
+        model_load_seconds = _last_load_seconds
     else:
-        print("Warning: model.pkl not found. Please run model.py to generate the model.")
+        print(f"Warning: {MODEL_PATH} not found. Please run model.py to generate the model.")
         model = None
 except Exception as e:
     print(f"Error loading model: {e}")
     model = None
 
+if INFERENCE_PROCESSES > 0 and isinstance(model, FlatForest):
+    inference_pool = InferencePool(model, INFERENCE_PROCESSES, INFERENCE_QUEUE_DEPTH)
+
+
+def install_model(new_model, version=None):
+    '''
+    Atomically swap in a new model.
+
+    Requests read the global once when they start, so requests already in
+    flight finish on the old model. The prediction cache and micro-batcher
+    key their state on the model object and follow the swap by themselves.
+    new_model must already have passed model_loader.warm_up().
+    '''
+    global model, model_version, model_load_seconds, inference_pool, warmed_model
+    with _model_lock:
+        if INFERENCE_PROCESSES > 0 and isinstance(new_model, FlatForest):
+            if inference_pool is None:
+                inference_pool = InferencePool(new_model, INFERENCE_PROCESSES, INFERENCE_QUEUE_DEPTH)
+            else:
+                inference_pool.reload(new_model)
+        warmed_model = new_model
+        model = new_model
+        model_version = version
+        model_load_seconds = _last_load_seconds
+    refresh_prediction_table()
+
+
+def install_feature_store(store):
+    '''
+    Swap in a reloaded feature store; the prediction table is updated for
+    the rows whose features changed
+    '''
+    global feature_store
+    feature_store = store
+    refresh_prediction_table()
+
+
+def refresh_prediction_table(wait=False):
+    '''
+    Bring the precomputed prediction table up to date with the current
+    model and feature store, in the background unless wait is set
+    '''
+    if prediction_tables is not None:
+        prediction_tables.refresh(model, feature_store, wait)
+
+
+def _run_warmup(current_model):
+    global warmed_model, warmup_error
+    try:
+        warm_up(current_model, WARMUP_ROWS)
+    except Exception as e:
+        warmup_error = str(e)
+        print(f"Model warm-up failed: {e}")
+    else:
+        if model is not current_model:
+            return  # replaced while warming up; the new model gets its own warm-up
+        warmed_model = current_model
+        warmup_error = None
+        refresh_prediction_table()
+
+
+def ensure_warmup():
+    '''
+    Start warming up the current model in the background unless this
+    process already warmed it or tried to
+    '''
+    global _warmup_model, _warmup_pid, warmup_error
+    current_model = model
+    if current_model is None or warmed_model is current_model:
+        return
+    if _warmup_pid == os.getpid() and _warmup_model is current_model:
+        return  # running, or already failed for this model
+    _warmup_model, _warmup_pid, warmup_error = current_model, os.getpid(), None
+    threading.Thread(target=_run_warmup, args=(current_model,), name='model-warmup', daemon=True).start()
+
+
+def is_ready():
+    current_model = model
+    return current_model is not None and warmed_model is current_model
+
+
+model_reloader = ModelReloader(
+    MODEL_PATH, install_model,
+    loader=load_served_model,
+    poll_interval=MODEL_WATCH_INTERVAL,
+)
+feature_store_reloader = FeatureStoreReloader(
+    FEATURE_STORE_PATH, install_feature_store, poll_interval=MODEL_WATCH_INTERVAL)
+
+
+def run_model(current_model, features):
+    '''
+    Score a feature matrix, in the inference pool when it serves this model,
+    except for matrices large enough for the model's sklearn fallback
+    '''
+    pool = inference_pool
+    forest_batch_rows.observe(len(features))
+    with phase('forest'):
+        large = getattr(current_model, 'fallback', None) is not None and len(features) >= FALLBACK_MIN_ROWS
+        if pool is not None and pool.model is current_model and not large:
+            return pool.predict(features)
+        return current_model.predict(features)
+
+
+def score_matrix(current_model, features):
+    '''
+    Score a feature matrix, answering feature vectors of known restaurants
+    from the precomputed table and only the novel ones with the forest
+    '''
+    table = current_table(current_model)
+    if table is None:
+        return run_model(current_model, features)
+    novel_rows = [0]
+
+    def score_novel(novel):
+        novel_rows[0] = len(novel)
+        return run_model(current_model, novel)
+
+    predictions = table.predict(features, score_novel)
+    precomputed_rows.inc(amount=len(features) - novel_rows[0])
+    return predictions
+
+
+def current_table(current_model):
+    '''
+    Precomputed prediction table of current_model, None while it is being built
+    '''
+    if prediction_tables is None:
+        return None
+    return prediction_tables.current(current_model, feature_store)
+
+
+micro_batcher = MicroBatcher(MICROBATCH_MAX_SIZE, MICROBATCH_MAX_WAIT_US, score=run_model) \
+    if MICROBATCH_MAX_SIZE > 0 else None
+
+
+def freeze_model():
+    '''
+    Make the loaded model immutable before worker processes are forked.
+
+    Called by the pre-fork server in the master process: read-only node
+    arrays and a frozen garbage collector mean workers never write to (and
+    therefore never copy) the pages holding the model.
+    '''
+    if hasattr(model, 'freeze'):
+        model.freeze()
+    gc.collect()
+    gc.freeze()
+
+
+def admin_authorized():
+    '''
+    True when the request carries the configured admin token
+    '''
+    if not ADMIN_TOKEN:
+        return False
+    supplied = request.headers.get('X-Admin-Token', '')
+    return hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode())
+
+
+ensure_warmup()
+
+# Routes that evaluate the model and are refused until it is warm when
+# REJECT_UNTIL_READY is set
+PREDICTION_ENDPOINTS = {'predict', 'predict_batch', 'predict_csv', 'predict_raw', 'predict_by_id'}
+
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_route = request.endpoint or 'unmatched'
+    g.metrics_started = time.perf_counter()
+    requests_in_flight.inc(g.metrics_route)
+
+
+@app.after_request
+def record_request_metrics(response):
+    route = g.get('metrics_route')
+    if route is None:
+        return response
+    request_duration.observe(time.perf_counter() - g.metrics_started, route)
+    requests_total.inc(route, request.method, str(response.status_code))
+    error_type = g.get('error_type') or ERROR_TYPES.get(response.status_code)
+    if error_type is not None:
+        errors_total.inc(route, error_type)
+    return response
+
+
+@app.teardown_request
+def end_request_metrics(exc):
+    route = g.pop('metrics_route', None)
+    if route is not None:
+        requests_in_flight.dec(route)
+
+
+@app.before_request
+def start_request_timer():
+    if REQUEST_TIMING or span_exporter is not None:
+        g.request_timer, g.request_timer_token = start_request(request.endpoint or request.path)
+
+
+@app.after_request
+def report_request_timing(response):
+    timer = g.get('request_timer')
+    if timer is None:
+        return response
+    if REQUEST_TIMING:
+        response.headers['Server-Timing'] = timer.server_timing()
+    exporter = span_exporter
+    if exporter is not None:
+        try:
+            exporter(timer.to_record(method=request.method, path=request.path, status=response.status_code))
+        except Exception as e:
+            print(f"Error exporting request spans: {e}")
+    return response
+
+
+@app.teardown_request
+def end_request_timer(exc):
+    token = g.pop('request_timer_token', None)
+    if token is not None:
+        end_request(token)
+
+
+@app.before_request
+def start_request_profile():
+    session = profile_session
+    if session is not None:
+        token = session.begin(request.endpoint)
+        if token is not None:
+            g.profile = (session, token)
+
+
+@app.teardown_request
+def end_request_profile(exc):
+    profile = g.pop('profile', None)
+    if profile is not None:
+        session, token = profile
+        session.end(token)
+
+
+@app.after_request
+def queue_prediction_log(response):
+    logged = g.pop('logged_predictions', None)
+    if logged is not None and prediction_log is not None:
+        features, predictions = logged
+        latency_ms = (time.perf_counter() - g.metrics_started) * 1000 if 'metrics_started' in g else None
+        prediction_log.record(request.endpoint, features, predictions, latency_ms, model_version)
+    return response
+
+
+@app.before_request
+def start_background_threads():
+    # Threads do not survive fork(), so each server worker starts its own
+    model_reloader.start_watching()
+    feature_store_reloader.start_watching()
+    if drift_monitor is not None:
+        drift_monitor.start()
+    ensure_warmup()
+
+
+@app.before_request
+def reject_until_ready():
+    if REJECT_UNTIL_READY and request.endpoint in PREDICTION_ENDPOINTS and not is_ready():
+        return jsonify({'error': 'Model is not ready'}), 503, {'Retry-After': '1'}
+
+
+@app.route('/healthz')
+def healthz():
+    '''
+    Liveness: the process is up and serving requests
+    '''
+    return jsonify({'status': 'ok'})
+
+
+@app.route('/readyz')
+def readyz():
+    '''
+    Readiness: the model is loaded and has completed its warm-up batch
+    '''
+    if model is None:
+        return jsonify({'status': 'not ready', 'reason': 'Model not loaded'}), 503
+    if not is_ready():
+        reason = f'Warm-up failed: {warmup_error}' if warmup_error else 'Warming up'
+        return jsonify({'status': 'not ready', 'reason': reason}), 503
+    return jsonify({'status': 'ready', 'model_version': model_version})
+
+
 @app.route('/')
 def home():
     return render_template('index.html')
@@ -26,19 +516,429 @@ def predict():
     '''
     For rendering results on HTML GUI
     '''
-    if model is None:
+    current_model = model
+    if current_model is None:
+        g.error_type = 'unavailable'
         return render_template('index.html', prediction_text='Error: Model not loaded. Please contact administrator.')
     
     try:
-        features = [int(x) for x in request.form.values()]
-        final_features = [np.array(features)]
-        prediction = model.predict(final_features)
+        with phase('form'):
+            values = list(request.form.values())
+        with phase('convert'):
+            # A missing or extra field is the client's mistake, not a model failure
+            if len(values) != len(FEATURE_NAMES):
+                raise ValueError(f'Expected {len(FEATURE_NAMES)} form values, got {len(values)}')
+            if category_encoder is not None:
+                features = category_encoder.encode_form(values)
+            else:
+                features = [int(x) for x in values]
+    except ValueError:
+        g.error_type = 'invalid_input'
+        return render_template('index.html', prediction_text='Error: Invalid input.')
+    if drift_monitor is not None:
+        drift_monitor.update(features)
 
-        output = round(prediction[0], 1)
+    try:
+        with phase('predict'):
+            prediction = predict_one(current_model, features)
+        if prediction_log is not None:
+            g.logged_predictions = (features, prediction)
+
+        with phase('round'):
+            output = round(prediction, 1)
 
-        return render_template('index.html', prediction_text='Your Rating is: {}'.format(output))
+        with phase('render'):
+            return render_template('index.html', prediction_text='Your Rating is: {}'.format(output))
     except Exception as e:
-        return render_template('index.html', prediction_text='Error: Invalid input or prediction failed.')
+        g.error_type = 'prediction_failed'
+        return render_template('index.html', prediction_text='Error: Prediction failed.')
+
+
+def predict_one(current_model, features):
+    '''
+    Score one feature row, answering repeats from the prediction cache
+    '''
+    def evaluate():
+        if micro_batcher is not None:
+            return micro_batcher.predict(current_model, features)
+        with phase('array'):
+            final_features = [np.array(features)]
+        return run_model(current_model, final_features)[0]
+
+    table = current_table(current_model)
+    if table is not None:
+        prediction = table.get(features)
+        if prediction is not None:
+            precomputed_rows.inc()
+            return prediction
+    if prediction_cache is None:
+        return evaluate()
+    return prediction_cache.get_or_compute(tuple(features), evaluate, current_model)
+
+
+@app.route('/api/v1/predict', methods=['POST'])
+def predict_batch():
+    '''
+    JSON API scoring N rows with a single forest call
+    '''
+    current_model = model
+    if current_model is None:
+        return jsonify({'error': 'Model not loaded'}), 503
+
+    with phase('parse'):
+        payload = request.get_json(silent=True)
+    if payload is None:
+        return jsonify({'error': 'Request body must be JSON'}), 400
+    try:
+        with phase('encode'):
+            features = payload_to_matrix(payload)
+    except PayloadError as e:
+        return jsonify({'error': str(e)}), 400
+    return batch_response(current_model, features)
+
+
+@app.route('/api/v1/predict/raw', methods=['POST'])
+def predict_raw():
+    '''
+    JSON API like /api/v1/predict, taking raw values ("BTM", "Yes",
+    "1,200") that are encoded server-side
+    '''
+    current_model = model
+    if current_model is None:
+        return jsonify({'error': 'Model not loaded'}), 503
+    encoder = category_encoder
+    if encoder is None:
+        return jsonify({'error': 'Vocabularies not loaded'}), 503
+
+    with phase('parse'):
+        payload = request.get_json(silent=True)
+    if payload is None:
+        return jsonify({'error': 'Request body must be JSON'}), 400
+    try:
+        with phase('encode'):
+            features, unknown = encoder.encode_payload(payload)
+    except UnknownCategoryError as e:
+        g.error_type = 'unknown_category'
+        return jsonify({'error': str(e), 'unknown_categories': e.unknown}), 400
+    except PayloadError as e:
+        return jsonify({'error': str(e)}), 400
+    extra = {'unknown_categories': unknown} if unknown else {}
+    return batch_response(current_model, features, **extra)
+
+
+@app.route('/api/v1/predict/by-id', methods=['POST'])
+def predict_by_id():
+    '''
+    JSON API scoring restaurants of the training table by ID, with optional
+    feature overrides, e.g. {"ids": [12, 40], "overrides": {"cost": 500}}
+    '''
+    current_model = model
+    if current_model is None:
+        return jsonify({'error': 'Model not loaded'}), 503
+    store = feature_store
+    if store is None:
+        return jsonify({'error': 'Feature store not loaded'}), 503
+
+    with phase('parse'):
+        payload = request.get_json(silent=True)
+    if payload is None:
+        return jsonify({'error': 'Request body must be JSON'}), 400
+    try:
+        with phase('lookup'):
+            features = store.payload_to_matrix(payload)
+    except UnknownRestaurantError as e:
+        g.error_type = 'unknown_restaurant'
+        return jsonify({'error': str(e), 'unknown_ids': e.unknown}), 404
+    except PayloadError as e:
+        return jsonify({'error': str(e)}), 400
+    return batch_response(current_model, features)
+
+
+def batch_response(current_model, features, **extra):
+    '''
+    Score a feature matrix with one forest call and build the JSON response
+    '''
+    if len(features) > MAX_BATCH_ROWS:
+        return jsonify({'error': f'At most {MAX_BATCH_ROWS} rows per request'}), 413
+    if len(features) == 0:
+        return jsonify({'predictions': [], 'count': 0, **extra})
+    if drift_monitor is not None:
+        drift_monitor.update_matrix(features)
+
+    try:
+        with phase('predict'):
+            predictions = np.asarray(score_matrix(current_model, features))
+    except PoolSaturated:
+        return jsonify({'error': 'Server busy, retry shortly'}), 503, {'Retry-After': '1'}
+    except Exception:
+        return jsonify({'error': 'Prediction failed'}), 500
+    if prediction_log is not None:
+        g.logged_predictions = (features, predictions)
+
+    with phase('serialize'):
+        return jsonify({'predictions': predictions.tolist(), 'count': len(predictions), **extra})
+
+
+def detach_upload(upload):
+    '''
+    Binary stream over an uploaded file that outlives the request.
+
+    Flask closes request.files when the view returns, before a streamed
+    response has been read. Werkzeug spools large uploads to a temporary
+    file, which is reopened through a duplicate descriptor; small uploads
+    are held in memory and simply copied.
+    '''
+    stream = upload.stream
+    try:
+        fd = stream.fileno()
+    except (AttributeError, OSError):
+        return io.BytesIO(upload.read())
+    detached = os.fdopen(os.dup(fd), 'rb')
+    detached.seek(0)
+    return detached
+
+
+@app.route('/api/v1/predict/csv', methods=['POST'])
+def predict_csv():
+    '''
+    Score an uploaded CSV (multipart field 'file' or a raw text/csv body)
+    chunk by chunk, streaming the predictions back as CSV or, with
+    ?format=ndjson, as one JSON object per line.
+
+    Only one chunk of rows is held in memory at a time, whatever the size
+    of the upload. Errors found after the response has started end the
+    stream with an error record instead of an HTTP status.
+    '''
+    current_model = model
+    if current_model is None:
+        return jsonify({'error': 'Model not loaded'}), 503
+    output_format = request.args.get('format', 'csv')
+    if output_format not in ('csv', 'ndjson'):
+        return jsonify({'error': "format must be 'csv' or 'ndjson'"}), 400
+    id_column = request.args.get('id_column')
+
+    upload = request.files.get('file')
+    lines = iter_text_lines(detach_upload(upload) if upload is not None else request.stream)
+    try:
+        chunks = csv_matrices(lines, CSV_CHUNK_ROWS, id_column)
+    except (PayloadError, UnicodeDecodeError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    key = id_column or 'row'
+
+    def generate():
+        if output_format == 'csv':
+            yield prediction_header(key)
+        try:
+            for ids, features in chunks:
+                if drift_monitor is not None:
+                    drift_monitor.update_matrix(features)
+                started = time.perf_counter()
+                predictions = np.asarray(score_matrix(current_model, features))
+                if prediction_log is not None:
+                    prediction_log.record('predict_csv', features, predictions,
+                                          (time.perf_counter() - started) * 1000, model_version)
+                yield format_predictions(ids, predictions.tolist(), output_format, key)
+        except (PayloadError, UnicodeDecodeError) as e:
+            yield error_record(str(e), 'invalid_input')
+        except PoolSaturated:
+            yield error_record('Server busy, retry shortly', 'unavailable')
+        except Exception:
+            yield error_record('Prediction failed', 'prediction_failed')
+
+    def error_record(message, error_type):
+        # The 200 status is already sent, so the error is only counted here
+        errors_total.inc('predict_csv', error_type)
+        if output_format == 'csv':
+            return 'error,"' + message.replace('"', '""') + '"\n'
+        return json.dumps({'error': message}) + '\n'
+
+    mimetype = 'text/csv' if output_format == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+
+@app.route('/api/v1/stats')
+def stats():
+    '''
+    Prediction cache, micro-batching, prediction table and prediction log counters
+    '''
+    return jsonify({
+        'prediction_cache': prediction_cache.stats() if prediction_cache is not None else None,
+        'micro_batching': micro_batcher.stats() if micro_batcher is not None else None,
+        'prediction_table': prediction_tables.stats() if prediction_tables is not None else None,
+        'prediction_log': prediction_log.stats() if prediction_log is not None else None,
+    })
+
+
+@app.route('/api/v1/drift')
+def drift():
+    '''
+    Drift of live request features from the training data, per feature, as
+    of the last periodic evaluation (?refresh=1 evaluates now, which also
+    starts a new window, and needs the admin token)
+    '''
+    if drift_monitor is None:
+        return jsonify({'error': 'Drift monitoring is disabled'}), 404
+    if request.args.get('refresh') == '1':
+        if not admin_authorized():
+            return jsonify({'error': 'Forbidden'}), 403
+        return jsonify(drift_monitor.evaluate())
+    report = drift_monitor.report()
+    if report is None:
+        # Evaluating here would start a new window on behalf of any client
+        return jsonify({'status': 'not_evaluated', 'evaluated_at': None,
+                        'interval_seconds': drift_monitor.interval})
+    return jsonify(report)
+
+
+@app.route('/metrics')
+def metrics():
+    '''
+    Prometheus metrics of this process
+    '''
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+@metrics_registry.collector
+def collect_model_metrics():
+    current_model = model
+    loaded = current_model is not None
+    samples = [
+        ('zomato_model_loaded', 'gauge', 'Whether a model is loaded', [({}, int(loaded))]),
+        ('zomato_model_ready', 'gauge', 'Whether the loaded model completed its warm-up', [({}, int(is_ready()))]),
+        ('zomato_model_reloads_total', 'counter', 'Models hot-reloaded since start-up',
+         [({}, model_reloader.reloads)]),
+        ('zomato_model_reload_failures_total', 'counter', 'Reload attempts rejected by validation',
+         [({}, model_reloader.failures)]),
+    ]
+    if loaded:
+        samples.append(('zomato_model_info', 'gauge', 'Version of the artifact being served and its engine',
+                        [({'version': model_version or '', 'engine': type(current_model).__name__}, 1)]))
+    if model_load_seconds is not None:
+        samples.append(('zomato_model_load_seconds', 'gauge', 'Time it took to load the served model',
+                        [({}, model_load_seconds)]))
+    return samples
+
+
+@metrics_registry.collector
+def collect_cache_metrics():
+    samples = []
+    if prediction_cache is not None:
+        cache = prediction_cache.stats()
+        samples += [
+            ('zomato_prediction_cache_hits_total', 'counter', 'Single-row predictions answered from the LRU cache',
+             [({}, cache['hits'] + cache['coalesced'])]),
+            ('zomato_prediction_cache_misses_total', 'counter', 'Single-row predictions the LRU cache missed',
+             [({}, cache['misses'])]),
+            ('zomato_prediction_cache_hit_ratio', 'gauge', 'Share of cache lookups that were hits',
+             [({}, cache['hit_ratio'])]),
+            ('zomato_prediction_cache_size', 'gauge', 'Entries held by the LRU cache', [({}, cache['size'])]),
+        ]
+    if prediction_tables is not None:
+        table = prediction_tables.stats()
+        samples += [
+            ('zomato_prediction_table_rows', 'gauge', 'Restaurants in the precomputed prediction table',
+             [({}, table['rows'])]),
+            ('zomato_prediction_table_builds_total', 'counter', 'Full and incremental prediction table builds',
+             [({'kind': 'full'}, table['builds']), ({'kind': 'incremental'}, table['incremental_updates'])]),
+        ]
+    if prediction_log is not None:
+        log = prediction_log.stats()
+        samples += [
+            ('zomato_prediction_log_written_total', 'counter', 'Requests written to the prediction log',
+             [({}, log['written'])]),
+            ('zomato_prediction_log_dropped_total', 'counter',
+             'Requests dropped from the prediction log because its buffer was full or a write failed',
+             [({}, log['dropped'])]),
+            ('zomato_prediction_log_queued', 'gauge', 'Requests waiting for the prediction log writer',
+             [({}, log['queued'])]),
+        ]
+    return samples
+
+
+@metrics_registry.collector
+def collect_drift_metrics():
+    if drift_monitor is None or drift_monitor.evaluations == 0:
+        return []
+    report = drift_monitor.report()
+    samples = [
+        ({'feature': name, 'period': period}, scores['psi'])
+        for period in ('window', 'total')
+        for name, scores in report[period]['features'].items()
+        if scores['psi'] is not None
+    ]
+    return [('zomato_feature_drift_psi', 'gauge',
+             'Population stability index of live features against the training data', samples)]
+
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    '''
+    Load, validate and warm up MODEL_PATH, then swap it in
+    '''
+    if not admin_authorized():
+        return jsonify({'error': 'Forbidden'}), 403
+    ok, message = model_reloader.reload()
+    if not ok:
+        return jsonify({'status': 'failed', 'error': message, 'version': model_version}), 422
+    return jsonify({'status': 'reloaded', 'version': message})
+
+
+@app.route('/admin/profile', methods=['POST'])
+def admin_profile():
+    '''
+    Profile live traffic of this process and return the result.
+
+    Captures the next ?requests=N (default 10) matching requests, waiting at
+    most ?timeout seconds (default 60), or all of them for ?seconds=T.
+    ?mode=cprofile returns pstats data (?format=text for a report),
+    ?mode=sample collapsed stacks sampled every ?interval_ms. ?endpoint=
+    (repeatable) picks the routes, by default the prediction routes.
+    '''
+    global profile_session
+    if not admin_authorized():
+        return jsonify({'error': 'Forbidden'}), 403
+
+    args = request.args
+    mode = args.get('mode', 'cprofile')
+    if mode not in PROFILE_FORMATS:
+        return jsonify({'error': f"mode must be one of {', '.join(PROFILE_FORMATS)}"}), 400
+    output_format = args.get('format', PROFILE_FORMATS[mode][0])
+    if output_format not in PROFILE_FORMATS[mode]:
+        return jsonify({'error': f"{mode} profiles can be returned as {', '.join(PROFILE_FORMATS[mode])}"}), 400
+    try:
+        seconds = float(args['seconds']) if 'seconds' in args else None
+        requests_count = int(args['requests']) if 'requests' in args else (None if seconds else 10)
+        timeout = min(float(args.get('timeout', '60')), 300.0)
+        interval = float(args.get('interval_ms', '5')) / 1000.0
+        if seconds is not None and seconds > 300:
+            raise ValueError('seconds must be at most 300')
+        session = ProfileSession(mode, requests_count, seconds,
+                                 args.getlist('endpoint') or PREDICTION_ENDPOINTS, interval)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    with _profile_lock:
+        if profile_session is not None:
+            session.close()
+            return jsonify({'error': 'A profile is already being captured'}), 409
+        profile_session = session
+    try:
+        complete = session.wait(timeout)
+    finally:
+        with _profile_lock:
+            profile_session = None
+        session.close()
+
+    body, mimetype = session.result(output_format)
+    headers = {
+        'X-Profile-Requests': str(session.captured),
+        'X-Profile-Complete': 'true' if complete else 'false',
+    }
+    if PROFILE_DIR:
+        headers['X-Profile-Path'] = session.save(PROFILE_DIR, output_format)
+    return Response(body, mimetype=mimetype, headers=headers)
+
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
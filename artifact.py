@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Standalone binary format for FlatForest models
+
+Unpickling model.pkl imports scikit-learn and rebuilds 120 tree objects
+before the first prediction. A forest artifact instead stores the
+FlatForest node arrays as raw little-endian bytes behind a small JSON
+header, so loading it needs NumPy only and costs one memory map:
+
+    offset 0    magic b'ZFOREST\\0'
+    offset 8    header length (uint32, little-endian)
+    offset 12   JSON header: format version, forest shape, array layout
+                and the SHA-256 of the data section
+    aligned     data section, every array starting on a 64-byte boundary
+
+Convert an existing pickle with:
+
+    python artifact.py model.pkl model.forest
+"""
+import argparse
+import hashlib
+import json
+import os
+import struct
+import sys
+import tempfile
+
+import numpy as np
+
+from forest import FlatForest
+
+MAGIC = b'ZFOREST\0'
+FORMAT_VERSION = 1
+
+_LENGTH = struct.Struct('<I')
+_ALIGNMENT = 64
+
+# On-disk dtype of every node array, matching what FlatForest holds in memory
+_DTYPES = {
+    'feature': '<i4',
+    'threshold': '<f8',
+    'children': '<i4',
+    'value': '<f8',
+    'roots': '<i4',
+}
+
+
+class ArtifactError(ValueError):
+    """Raised for files that are not valid forest artifacts"""
+
+
+def _align(offset):
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+def is_forest_artifact(path):
+    """True when the file at path starts with the forest artifact magic"""
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def save_forest(forest, path):
+    """
+    Write forest to path as a forest artifact.
+
+    The file is written next to path and renamed over it, so readers (and
+    the model watcher) never see a partially written artifact.
+    """
+    layout = {}
+    chunks = []
+    size = 0
+    digest = hashlib.sha256()
+    for name, dtype in _DTYPES.items():
+        data = np.ascontiguousarray(getattr(forest, name), dtype=dtype).tobytes()
+        padding = b'\0' * (_align(size) - size)
+        size += len(padding)
+        layout[name] = [size, dtype, [len(data) // np.dtype(dtype).itemsize]]
+        chunks.extend([padding, data])
+        digest.update(padding)
+        digest.update(data)
+        size += len(data)
+
+    header = json.dumps({
+        'format_version': FORMAT_VERSION,
+        'n_features': forest.n_features,
+        'max_depth': forest.max_depth,
+        'n_estimators': forest.n_estimators,
+        'n_nodes': forest.n_nodes,
+        'arrays': layout,
+        'data_size': size,
+        'sha256': digest.hexdigest(),
+    }, sort_keys=True).encode()
+    prefix = MAGIC + _LENGTH.pack(len(header)) + header
+    prefix += b'\0' * (_align(len(prefix)) - len(prefix))
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(prefix)
+            for chunk in chunks:
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp() creates the file private to its owner; the artifact is
+        # read by other users, such as the app user of the container
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def read_header(path):
+    """Parse the header of a forest artifact; returns (header, data_offset)"""
+    with open(path, 'rb') as f:
+        prefix = f.read(len(MAGIC) + _LENGTH.size)
+        if prefix[:len(MAGIC)] != MAGIC:
+            raise ArtifactError(f'{path} is not a forest artifact')
+        (length,) = _LENGTH.unpack(prefix[len(MAGIC):])
+        try:
+            header = json.loads(f.read(length))
+        except ValueError as e:
+            raise ArtifactError(f'Corrupt forest artifact header: {e}') from e
+    if header.get('format_version') != FORMAT_VERSION:
+        raise ArtifactError(f"Unsupported forest artifact version {header.get('format_version')}")
+    return header, _align(len(MAGIC) + _LENGTH.size + length)
+
+
+def load_forest(path, mmap=True, verify=True):
+    """
+    Load a forest artifact as a read-only FlatForest.
+
+    With mmap the node arrays are views of a read-only memory map of the
+    file, so nothing is copied and processes loading the same file share
+    its page-cache pages. verify checks the data section's SHA-256.
+    """
+    header, data_offset = read_header(path)
+    data_size = header['data_size']
+    if os.path.getsize(path) != data_offset + data_size:
+        raise ArtifactError(f'{path} is truncated or has trailing data')
+
+    if mmap:
+        data = np.memmap(path, dtype=np.uint8, mode='r', offset=data_offset, shape=(data_size,))
+    else:
+        with open(path, 'rb') as f:
+            f.seek(data_offset)
+            data = np.frombuffer(f.read(data_size), dtype=np.uint8)
+    if verify and hashlib.sha256(data).hexdigest() != header['sha256']:
+        raise ArtifactError(f'Checksum mismatch in {path}')
+
+    arrays = {}
+    for name, (offset, dtype, shape) in header['arrays'].items():
+        arrays[name] = np.ndarray(tuple(shape), dtype=np.dtype(dtype), buffer=data, offset=offset)
+    forest = FlatForest.from_arrays(arrays, header['n_features'], header['max_depth'])
+    return forest.freeze()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert a pickled forest into a forest artifact')
+    parser.add_argument('model', help='pickled ExtraTreesRegressor, e.g. model.pkl')
+    parser.add_argument('output', help='artifact to write, e.g. model.forest')
+    args = parser.parse_args()
+
+    import pickle
+    with open(args.model, 'rb') as f:
+        model = pickle.load(f)
+    try:
+        forest = FlatForest.from_sklearn(model)
+    except ValueError as e:
+        print(f"Error converting {args.model}: {e}")
+        sys.exit(1)
+    save_forest(forest, args.output)
+    print(f"Wrote {args.output}: {forest.n_estimators} trees, {forest.n_nodes} nodes, "
+          f"{os.path.getsize(args.output) / 1024 / 1024:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
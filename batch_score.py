@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Score large feature files offline across a pool of processes
+
+    python batch_score.py restaurants.csv predictions.csv --processes 4
+
+The input is read in chunks of --chunk-rows rows: a CSV with the eight
+feature columns, a Parquet file (requires pyarrow) or a directory holding
+one ``<feature>.npy`` array per feature column, which is memory-mapped.
+Chunks are scored by worker processes that each load the model once,
+through the same load_model() as app.py, and the predictions are written
+in input order as CSV or NDJSON. A throughput summary goes to stderr.
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from features import (FEATURE_DTYPE, FEATURE_NAMES, PayloadError, csv_matrices, format_predictions,
+                      prediction_header)
+from model_loader import load_model
+
+# Model loaded by each pool process in _load_worker_model()
+_worker_model = None
+
+
+def read_chunks(path, chunk_rows=4096, id_column=None):
+    """Yield (ids, feature matrix) chunks of at most chunk_rows rows from a feature file"""
+    if os.path.isdir(path):
+        return _npy_chunks(path, chunk_rows, id_column)
+    if path.endswith('.parquet'):
+        return _parquet_chunks(path, chunk_rows, id_column)
+    return _csv_chunks(path, chunk_rows, id_column)
+
+
+def _csv_chunks(path, chunk_rows, id_column):
+    with open(path, newline='', encoding='utf-8') as f:
+        yield from csv_matrices(f, chunk_rows, id_column)
+
+
+def _parquet_chunks(path, chunk_rows, id_column):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise PayloadError("Reading Parquet files requires pyarrow (pip install pyarrow)")
+    parquet = pq.ParquetFile(path)
+    columns = FEATURE_NAMES + ([id_column] if id_column is not None else [])
+    missing = [name for name in columns if name not in parquet.schema_arrow.names]
+    if missing:
+        raise PayloadError(f"Missing columns: {', '.join(missing)}")
+
+    first_row = 0
+    for batch in parquet.iter_batches(batch_size=chunk_rows, columns=columns):
+        matrix = np.empty((batch.num_rows, len(FEATURE_NAMES)), dtype=FEATURE_DTYPE)
+        for j, name in enumerate(FEATURE_NAMES):
+            matrix[:, j] = batch.column(name).to_numpy(zero_copy_only=False)
+        if id_column is not None:
+            ids = batch.column(id_column).to_pylist()
+        else:
+            ids = range(first_row, first_row + batch.num_rows)
+        first_row += batch.num_rows
+        yield ids, _finite(matrix, first_row - batch.num_rows)
+
+
+def _npy_chunks(directory, chunk_rows, id_column):
+    names = FEATURE_NAMES + ([id_column] if id_column is not None else [])
+    missing = [name for name in names if not os.path.exists(os.path.join(directory, f'{name}.npy'))]
+    if missing:
+        raise PayloadError(f"Missing column files: {', '.join(f'{name}.npy' for name in missing)}")
+    columns = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r') for name in names}
+    n_rows = len(columns[FEATURE_NAMES[0]])
+    if any(len(column) != n_rows for column in columns.values()):
+        raise PayloadError("Column files have different lengths")
+
+    for start in range(0, n_rows, chunk_rows):
+        stop = min(start + chunk_rows, n_rows)
+        matrix = np.empty((stop - start, len(FEATURE_NAMES)), dtype=FEATURE_DTYPE)
+        for j, name in enumerate(FEATURE_NAMES):
+            matrix[:, j] = columns[name][start:stop]
+        ids = columns[id_column][start:stop].tolist() if id_column is not None else range(start, stop)
+        yield ids, _finite(matrix, start)
+
+
+def _finite(matrix, first_row):
+    if not np.isfinite(matrix).all():
+        raise PayloadError(f"Non-finite feature value in rows {first_row}-{first_row + len(matrix) - 1}")
+    return matrix
+
+
+def _load_worker_model(model_path, engine):
+    global _worker_model
+    # Chunks are plain matrices; sklearn warns that the forest was fitted on a DataFrame
+    warnings.filterwarnings('ignore', message='X does not have valid feature names')
+    _worker_model = load_model(model_path, engine)
+
+
+def _score_chunk(X):
+    start = time.perf_counter()
+    predictions = np.asarray(_worker_model.predict(X), dtype=np.float64)
+    return predictions, time.perf_counter() - start
+
+
+def score_file(model_path, input_path, output, processes=None, chunk_rows=4096,
+               output_format='csv', id_column=None, engine='sklearn'):
+    """
+    Score every row of input_path and write the predictions to the text
+    stream output, in input order.
+
+    With processes=0 the chunks are scored in this process. Otherwise at
+    most two chunks per process are in flight, which bounds memory however
+    large the input is. Returns counters and per-stage timings in seconds:
+    ``read`` (parsing input), ``predict`` (summed over all processes),
+    ``wait`` (blocked on the pool) and ``write`` (formatting output).
+    """
+    processes = os.cpu_count() if processes is None else processes
+    stats = {'rows': 0, 'chunks': 0, 'processes': processes,
+             'read': 0.0, 'predict': 0.0, 'wait': 0.0, 'write': 0.0}
+    started = time.perf_counter()
+    key = id_column or 'row'
+
+    def write(ids, predictions):
+        start = time.perf_counter()
+        output.write(format_predictions(ids, predictions.tolist(), output_format, key))
+        stats['write'] += time.perf_counter() - start
+        stats['rows'] += len(predictions)
+        stats['chunks'] += 1
+
+    def chunks():
+        reader = read_chunks(input_path, chunk_rows, id_column)
+        while True:
+            start = time.perf_counter()
+            chunk = next(reader, None)
+            stats['read'] += time.perf_counter() - start
+            if chunk is None:
+                return
+            yield chunk
+
+    if output_format == 'csv':
+        output.write(prediction_header(key))
+
+    if processes == 0:
+        _load_worker_model(model_path, engine)
+        for ids, X in chunks():
+            predictions, seconds = _score_chunk(X)
+            stats['predict'] += seconds
+            write(ids, predictions)
+    else:
+        with ProcessPoolExecutor(processes, initializer=_load_worker_model,
+                                 initargs=(model_path, engine)) as executor:
+            pending = deque()
+
+            def write_oldest():
+                ids, future = pending.popleft()
+                start = time.perf_counter()
+                predictions, seconds = future.result()
+                stats['wait'] += time.perf_counter() - start
+                stats['predict'] += seconds
+                write(ids, predictions)
+
+            for ids, X in chunks():
+                pending.append((ids, executor.submit(_score_chunk, X)))
+                if len(pending) >= 2 * processes:
+                    write_oldest()
+            while pending:
+                write_oldest()
+
+    stats['seconds'] = time.perf_counter() - started
+    stats['rows_per_second'] = stats['rows'] / stats['seconds'] if stats['seconds'] else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score a feature file with the trained model')
+    parser.add_argument('input', help='CSV, .parquet file or directory of <feature>.npy columns')
+    parser.add_argument('output', nargs='?', default='-', help='predictions file (default: stdout)')
+    parser.add_argument('--model', default='model.pkl', help='model.pkl or a model.forest artifact')
+    parser.add_argument('--processes', type=int, default=os.cpu_count(),
+                        help='worker processes (0 scores in this process)')
+    parser.add_argument('--chunk-rows', type=int, default=4096, help='rows per forest call')
+    parser.add_argument('--format', choices=['csv', 'ndjson'], default='csv', dest='output_format')
+    parser.add_argument('--id-column', help='input column to write instead of the row number')
+    parser.add_argument('--engine', choices=['flat', 'sklearn'], default='sklearn',
+                        help="'flat' compiles a pickled forest to forest.FlatForest, only faster for chunks "
+                             "under forest.FALLBACK_MIN_ROWS rows (ignored for artifacts)")
+    args = parser.parse_args()
+
+    output = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+    try:
+        stats = score_file(args.model, args.input, output, args.processes, args.chunk_rows,
+                           args.output_format, args.id_column, args.engine)
+    except (OSError, PayloadError) as e:
+        print(f"Error scoring {args.input}: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(f"Scored {stats['rows']} rows in {stats['chunks']} chunks in {stats['seconds']:.2f} s "
+          f"({stats['rows_per_second']:.0f} rows/s, {stats['processes']} processes)\n"
+          f"  read {stats['read']:.2f} s, predict {stats['predict']:.2f} s (all processes), "
+          f"wait {stats['wait']:.2f} s, write {stats['write']:.2f} s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Dynamic micro-batching of concurrent single-row predictions
+"""
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+import numpy as np
+
+from features import FEATURE_DTYPE
+
+
+class MicroBatcher:
+    """
+    Collects single-row prediction requests from many threads and scores
+    them as one matrix.
+
+    A batch is flushed as soon as it holds ``max_batch_size`` rows or
+    ``max_wait_us`` microseconds have passed since its first row arrived,
+    whichever comes first. Every caller gets back the prediction for its own
+    row. Rows submitted against different model objects are scored
+    separately, each with the model it was submitted with, through
+    ``score(model, matrix)`` (``model.predict(matrix)`` by default).
+    """
+
+    def __init__(self, max_batch_size=32, max_wait_us=500, score=None):
+        if max_batch_size < 1:
+            raise ValueError('max_batch_size must be at least 1')
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_us / 1e6
+        self._score_matrix = score or _predict
+        self._queue = queue.SimpleQueue()
+        self._worker = None
+        self._worker_pid = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._flushed_full = 0
+        self._flushed_timeout = 0
+
+    def predict(self, model, row):
+        """Score one row, blocking until its batch has been evaluated"""
+        return self.submit(model, row).result()
+
+    def submit(self, model, row):
+        """Queue one row and return a Future resolving to its prediction"""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((model, row, future))
+        return future
+
+    def stats(self):
+        """Batch sizes actually achieved since start-up"""
+        with self._stats_lock:
+            histogram = dict(sorted(self._batch_sizes.items()))
+            flushed_full, flushed_timeout = self._flushed_full, self._flushed_timeout
+        batches = sum(histogram.values())
+        rows = sum(size * count for size, count in histogram.items())
+        return {
+            'batches': batches,
+            'rows': rows,
+            'mean_batch_size': rows / batches if batches else 0.0,
+            'batch_size_histogram': histogram,
+            'flushed_full': flushed_full,
+            'flushed_timeout': flushed_timeout,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_us': self.max_wait * 1e6,
+        }
+
+    def _ensure_worker(self):
+        # Threads do not survive fork(), so a pre-forked worker process
+        # starts its own flusher on first use
+        if self._worker_pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker_pid != os.getpid() or not self._worker.is_alive():
+                self._queue = queue.SimpleQueue()
+                self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                self._worker.start()
+                self._worker_pid = os.getpid()
+
+    def _run(self):
+        pending = self._queue
+        while True:
+            batch = [pending.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch):
+        with self._stats_lock:
+            self._batch_sizes[len(batch)] += 1
+            if len(batch) >= self.max_batch_size:
+                self._flushed_full += 1
+            else:
+                self._flushed_timeout += 1
+
+        by_model = {}
+        for item in batch:
+            by_model.setdefault(id(item[0]), []).append(item)
+        for items in by_model.values():
+            self._score(items)
+
+    def _score(self, items):
+        model = items[0][0]
+        try:
+            matrix = np.array([row for _, row, _ in items], dtype=FEATURE_DTYPE)
+            predictions = np.asarray(self._score_matrix(model, matrix))
+            if predictions.shape[0] != len(items):
+                raise ValueError('Model returned a different number of predictions than rows')
+        except Exception as e:
+            if len(items) > 1:
+                # Isolate the failing row(s) so one bad request does not
+                # fail everybody else's prediction
+                for item in items:
+                    self._score([item])
+                return
+            items[0][2].set_exception(e)
+            return
+        for (_, _, future), prediction in zip(items, predictions):
+            future.set_result(prediction)
+
+
+def _predict(model, matrix):
+    return model.predict(matrix)
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Latency and throughput benchmarks with a history file and a regression gate
+
+Measures, for the model the app would serve:
+
+* ``predict_single_ms_*`` / ``predict_batch_ms_*``: p50/p95/p99 latency of
+  model.predict() on one row and on --batch-rows rows, plus batch rows/s
+* ``flask_predict_*``: /predict through the Flask test client, in process
+* ``server_predict_*``: /predict through gunicorn (gunicorn.conf.py) on a
+  local port, driven by --concurrency keep-alive clients
+* ``model_load_ms`` and ``artifact_bytes`` of the model file
+* ``training_s``: wall time of model.py in a scratch directory
+
+Every run appends one JSON line to the history file. --save-baseline also
+stores the run as the baseline, and --check exits with status 1 when a
+metric is worse than the baseline by more than --threshold (relative).
+Rows are drawn at random so the prediction cache and the precomputed
+table do not hide the cost of the forest.
+
+    python benchmark.py --skip training
+    python benchmark.py --check --threshold 0.25
+"""
+import argparse
+import datetime
+import http.client
+import json
+import math
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+import numpy as np
+
+from features import FORM_FIELDS
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_HISTORY = 'benchmark_history.jsonl'
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+
+SECTIONS = ('model', 'flask', 'server', 'load', 'training')
+
+# Metric name prefix or name -> whether a larger value is better
+_HIGHER_IS_BETTER = ('_rps', '_rows_per_s')
+
+
+def higher_is_better(name):
+    return name.endswith(_HIGHER_IS_BETTER)
+
+
+def percentiles(durations, prefix):
+    """p50/p95/p99 of durations (seconds) as ``<prefix>_p50`` ... in milliseconds"""
+    ms = np.asarray(durations) * 1000
+    return {f'{prefix}_p{q}': round(float(np.percentile(ms, q)), 4) for q in (50, 95, 99)}
+
+
+def time_calls(call, args_list, warmup=5):
+    """Duration of call(*args) for each args in args_list, after a few warm-up calls"""
+    for args in args_list[:warmup]:
+        call(*args)
+    durations = []
+    for args in args_list:
+        started = time.perf_counter()
+        call(*args)
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def random_rows(n_rows, seed=0):
+    """Feature rows spanning typical value ranges, unlikely to repeat"""
+    from model_loader import warmup_matrix
+    return warmup_matrix(n_rows, seed)
+
+
+def bench_model(model, repeat=200, batch_rows=1000):
+    rows = random_rows(repeat)
+    metrics = percentiles(time_calls(model.predict, [(rows[i:i + 1],) for i in range(repeat)]), 'predict_single_ms')
+    batches = [(random_rows(batch_rows, seed),) for seed in range(max(repeat // 20, 5))]
+    durations = time_calls(model.predict, batches, warmup=1)
+    metrics.update(percentiles(durations, 'predict_batch_ms'))
+    metrics['predict_batch_rows_per_s'] = round(batch_rows / float(np.median(durations)), 1)
+    return metrics
+
+
+def form_data(row):
+    return {field: str(int(value)) for field, value in zip(FORM_FIELDS, row)}
+
+
+def bench_flask(app_module, repeat=200):
+    """/predict through the Flask test client of an imported app module"""
+    client = app_module.app.test_client()
+    forms = [(form_data(row),) for row in random_rows(repeat, seed=1)]
+
+    def post(form):
+        response = client.post('/predict', data=form)
+        if b'Your Rating is' not in response.data:
+            raise RuntimeError('/predict did not return a rating')
+
+    started = time.perf_counter()
+    durations = time_calls(post, forms)
+    elapsed = time.perf_counter() - started
+    metrics = percentiles(durations, 'flask_predict_ms')
+    metrics['flask_predict_rps'] = round(len(durations) / elapsed, 1)
+    return metrics
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(model_path, workers=2, port=None, startup_timeout=120):
+    """Start gunicorn serving app.py on a local port; returns (process, port) once ready"""
+    port = port or free_port()
+    env = dict(os.environ, ZOMATO_BIND=f'127.0.0.1:{port}', ZOMATO_WORKERS=str(workers),
+               ZOMATO_MODEL_PATH=os.path.abspath(model_path))
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                               cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('gunicorn exited during start-up')
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            connection.request('GET', '/readyz')
+            if connection.getresponse().status == 200:
+                return process, port
+        except OSError:
+            pass
+        time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError('gunicorn did not become ready')
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def bench_server(model_path, seconds=5.0, concurrency=8, workers=2):
+    """/predict through gunicorn with concurrency keep-alive clients for seconds"""
+    process, port = start_server(model_path, workers)
+    try:
+        bodies = [urllib.parse.urlencode(form_data(row)) for row in random_rows(1000, seed=2)]
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+        durations, failures = [], []
+        deadline = time.perf_counter() + seconds
+
+        def client(offset):
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            i = offset
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    connection.request('POST', '/predict', bodies[i % len(bodies)], headers)
+                    response = connection.getresponse()
+                    response.read()
+                    ok = response.status == 200
+                except OSError:
+                    ok = False
+                    connection.close()
+                    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                (durations if ok else failures).append(time.perf_counter() - started)
+                i += concurrency
+            connection.close()
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        stop_server(process)
+    if not durations:
+        raise RuntimeError('No successful requests')
+    metrics = percentiles(durations, 'server_predict_ms')
+    metrics['server_predict_rps'] = round(len(durations) / elapsed, 1)
+    metrics['server_predict_errors'] = len(failures)
+    return metrics
+
+
+def bench_load(model_path, repeat=5):
+    from model_loader import load_model
+    durations = time_calls(load_model, [(model_path,)] * repeat, warmup=1)
+    return {
+        'model_load_ms': round(min(durations) * 1000, 3),
+        'artifact_bytes': os.path.getsize(model_path),
+    }
+
+
+def bench_training(dataset='Zomato_df.csv'):
+    """Wall time of model.py, run in a scratch directory so the repo's model files stay untouched"""
+    scratch = tempfile.mkdtemp(prefix='zomato-train-')
+    try:
+        if os.path.exists(dataset):
+            shutil.copy(dataset, os.path.join(scratch, 'Zomato_df.csv'))
+        env = dict(os.environ, PYTHONPATH=PROJECT_ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+        started = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(PROJECT_ROOT, 'model.py')], cwd=scratch, env=env,
+                       check=True, stdout=subprocess.DEVNULL)
+        return {'training_s': round(time.perf_counter() - started, 3)}
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def run(model_path, skip=(), repeat=200, batch_rows=1000, server_seconds=5.0, concurrency=8, workers=2,
+        report=print):
+    """Run every section not in skip and return {metric: value}"""
+    metrics = {}
+    if 'model' not in skip:
+        from model_loader import load_model
+        metrics.update(bench_model(load_model(model_path), repeat, batch_rows))
+        report('model.predict done')
+    if 'flask' not in skip:
+        os.environ['ZOMATO_MODEL_PATH'] = os.path.abspath(model_path)
+        import app
+        app.ensure_warmup()
+        metrics.update(bench_flask(app, repeat))
+        report('Flask test client done')
+    if 'server' not in skip:
+        metrics.update(bench_server(model_path, server_seconds, concurrency, workers))
+        report('gunicorn done')
+    if 'load' not in skip:
+        metrics.update(bench_load(model_path))
+        report('model load done')
+    if 'training' not in skip:
+        metrics.update(bench_training(os.path.join(PROJECT_ROOT, 'Zomato_df.csv')))
+        report('training done')
+    return metrics
+
+
+def make_record(metrics, model_path):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'host': platform.node(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'model': os.path.basename(model_path),
+        'metrics': metrics,
+    }
+
+
+def append_history(record, path=DEFAULT_HISTORY):
+    with open(path, 'a') as f:
+        f.write(json.dumps(record, sort_keys=True) + '\n')
+
+
+def read_history(path=DEFAULT_HISTORY):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare(metrics, baseline, threshold=0.2):
+    """
+    Metrics worse than baseline by more than threshold (relative), as
+    (name, baseline, value, relative change) tuples. Any rise of a
+    lower-is-better metric from a zero baseline (errors, drops) is one.
+    """
+    regressions = []
+    for name, value in sorted(metrics.items()):
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        if reference == 0:
+            if higher_is_better(name) or value <= 0:
+                continue
+            regressions.append((name, reference, value, math.inf))
+            continue
+        change = (value - reference) / abs(reference)
+        worse = -change if higher_is_better(name) else change
+        if worse > threshold:
+            regressions.append((name, reference, value, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark prediction latency, throughput, loading and training')
+    parser.add_argument('--model', help='model to benchmark (default: what app.py serves)')
+    parser.add_argument('--skip', nargs='*', default=[], choices=SECTIONS, help='sections to leave out')
+    parser.add_argument('--repeat', type=int, default=200, help='timed calls per latency measurement')
+    parser.add_argument('--batch-rows', type=int, default=1000, help='rows per batched prediction')
+    parser.add_argument('--server-seconds', type=float, default=5.0, help='duration of the server load test')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent clients of the server')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help='JSON lines file every run is appended to')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='stored baseline run')
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the baseline')
+    parser.add_argument('--check', action='store_true', help='exit with status 1 on a regression')
+    parser.add_argument('--threshold', type=float, default=0.2, help='tolerated relative regression')
+    args = parser.parse_args()
+
+    model_path = args.model or os.environ.get('ZOMATO_MODEL_PATH') or 'model.pkl'
+    if not os.path.exists(model_path):
+        print(f"Error: {model_path} not found. Please run model.py to generate the model.")
+        sys.exit(1)
+    try:
+        metrics = run(model_path, set(args.skip), args.repeat, args.batch_rows, args.server_seconds,
+                      args.concurrency, args.workers, report=lambda message: print(message, file=sys.stderr))
+    except (OSError, RuntimeError, subprocess.CalledProcessError) as e:
+        print(f"Error benchmarking {model_path}: {e}")
+        sys.exit(1)
+
+    record = make_record(metrics, model_path)
+    append_history(record, args.history)
+    for name, value in metrics.items():
+        print(f"  {name:<32}{value}")
+
+    status = 0
+    if args.check:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)['metrics']
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error reading baseline {args.baseline}: {e}")
+            sys.exit(1)
+        regressions = compare(metrics, baseline, args.threshold)
+        for name, reference, value, change in regressions:
+            print(f"REGRESSION {name}: {reference} -> {value} ({change:+.1%})")
+        if regressions:
+            status = 1
+        else:
+            print(f"No regression beyond {args.threshold:.0%} against {args.baseline}")
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(record, f, indent=2, sort_keys=True)
+    sys.exit(status)
+
+
+if __name__ == '__main__':
+    main()
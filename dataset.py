@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Columnar, memory-mapped cache of the training dataset
+
+Parsing Zomato_df.csv on every training run spends most of the startup in
+the CSV parser and holds every column as int64/float64. The cache converts
+the CSV once into one ``<column>.npy`` file per column, each downcast to
+the narrowest dtype that holds its values (int8/int16/int32, float32), and
+afterwards loads the columns as read-only memory maps:
+
+    Zomato_df.cache/
+        manifest.json       source SHA-256, row count and column dtypes
+        online_order.npy    ...one file per column
+
+The cache is rebuilt whenever the SHA-256 of the source CSV changes. The
+CSV's unnamed index column is kept as ``restaurant_id``.
+
+    python dataset.py [Zomato_df.csv]
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+DEFAULT_SOURCE = 'Zomato_df.csv'
+CACHE_VERSION = 1
+MANIFEST = 'manifest.json'
+
+# Column names given to unnamed CSV columns, i.e. the saved DataFrame index
+_RENAMES = {'Unnamed: 0': 'restaurant_id'}
+
+_INTEGER_DTYPES = [np.int8, np.int16, np.int32, np.int64]
+
+
+def default_cache_dir(source):
+    """Cache directory used for source: Zomato_df.csv -> Zomato_df.cache"""
+    return os.path.splitext(source)[0] + '.cache'
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def downcast(values):
+    """
+    Narrowest dtype copy of a numeric column: integers (and floats that
+    only hold whole numbers) become the smallest signed integer type that
+    fits, other floats become float32
+    """
+    values = np.asarray(values)
+    if values.dtype.kind == 'b':
+        return values.astype(np.int8)
+    if values.dtype.kind == 'f':
+        if len(values) and np.isfinite(values).all() and (values == np.floor(values)).all():
+            values = values.astype(np.int64)
+        else:
+            return values.astype(np.float32)
+    if values.dtype.kind not in 'iu':
+        raise ValueError(f'Column of dtype {values.dtype} is not numeric')
+    if not len(values):
+        return values.astype(np.int8)
+    low, high = values.min(), values.max()
+    for dtype in _INTEGER_DTYPES:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return values.astype(dtype)
+    raise ValueError('Integer column does not fit in int64')
+
+
+def read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_fresh(source, cache_dir=None, source_hash=None):
+    """True when cache_dir holds a complete cache built from the current source"""
+    cache_dir = cache_dir or default_cache_dir(source)
+    manifest = read_manifest(cache_dir)
+    if manifest is None or manifest.get('version') != CACHE_VERSION:
+        return False
+    if manifest.get('source_sha256') != (source_hash or file_sha256(source)):
+        return False
+    return all(os.path.exists(os.path.join(cache_dir, f'{name}.npy')) for name in manifest['columns'])
+
+
+def build_cache(source, cache_dir=None, source_hash=None):
+    """
+    Parse source once and write the downcast column files to cache_dir.
+
+    Files are written to a temporary directory that then replaces the old
+    cache, so readers never load a half-written cache.
+    """
+    import pandas as pd
+
+    cache_dir = cache_dir or default_cache_dir(source)
+    source_hash = source_hash or file_sha256(source)
+    frame = pd.read_csv(source).rename(columns=_RENAMES)
+
+    parent = os.path.dirname(os.path.abspath(cache_dir))
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix='.dataset-')
+    try:
+        columns = {}
+        for name in frame.columns:
+            values = downcast(frame[name].to_numpy())
+            np.save(os.path.join(tmp_dir, f'{name}.npy'), values)
+            columns[name] = values.dtype.str
+        with open(os.path.join(tmp_dir, MANIFEST), 'w') as f:
+            json.dump({
+                'version': CACHE_VERSION,
+                'source': os.path.basename(source),
+                'source_sha256': source_hash,
+                'rows': len(frame),
+                'columns': columns,
+            }, f, indent=2)
+        if os.path.exists(cache_dir):
+            shutil.rmtree(cache_dir)
+        os.replace(tmp_dir, cache_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return read_manifest(cache_dir)
+
+
+def load_columns(source=DEFAULT_SOURCE, cache_dir=None, mmap=True):
+    """
+    Columns of source by name, (re)building the cache first when it is
+    missing or stale. With mmap the arrays are read-only memory maps.
+    """
+    cache_dir = cache_dir or default_cache_dir(source)
+    source_hash = file_sha256(source)
+    if not is_fresh(source, cache_dir, source_hash):
+        build_cache(source, cache_dir, source_hash)
+    return load_cache(cache_dir, mmap)
+
+
+def load_cache(cache_dir, mmap=True):
+    """Columns of an existing cache directory, without checking its source"""
+    manifest = read_manifest(cache_dir)
+    if manifest is None:
+        raise ValueError(f'{cache_dir} is not a dataset cache')
+    mmap_mode = 'r' if mmap else None
+    return {
+        name: np.load(os.path.join(cache_dir, f'{name}.npy'), mmap_mode=mmap_mode)
+        for name in manifest['columns']
+    }
+
+
+def load_frame(source=DEFAULT_SOURCE, cache_dir=None):
+    """The cached dataset as a pandas DataFrame with the downcast dtypes"""
+    import pandas as pd
+    return pd.DataFrame(load_columns(source, cache_dir))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or refresh the columnar dataset cache')
+    parser.add_argument('source', nargs='?', default=DEFAULT_SOURCE, help='dataset CSV')
+    parser.add_argument('--cache-dir', help='cache directory (default: <source>.cache)')
+    args = parser.parse_args()
+
+    cache_dir = args.cache_dir or default_cache_dir(args.source)
+    try:
+        fresh = is_fresh(args.source, cache_dir)
+        manifest = read_manifest(cache_dir) if fresh else build_cache(args.source, cache_dir)
+    except (OSError, ValueError) as e:
+        print(f"Error caching {args.source}: {e}")
+        sys.exit(1)
+
+    cached = sum(os.path.getsize(os.path.join(cache_dir, f'{name}.npy')) for name in manifest['columns'])
+    print(f"{'Cache up to date' if fresh else 'Built cache'}: {cache_dir} "
+          f"({manifest['rows']} rows, {cached / 1024 / 1024:.1f} MB, "
+          f"CSV {os.path.getsize(args.source) / 1024 / 1024:.1f} MB)")
+    for name, dtype in manifest['columns'].items():
+        print(f"  {name:<15}{np.dtype(dtype).name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Streaming feature-drift monitor
+
+Live feature rows are counted into a fixed set of bins per feature, laid
+out by a DriftBaseline computed once from the training table:
+
+* ``votes`` and ``cost``: bins between the training quantiles, so each
+  holds about the same share of the training rows
+* the binary flags and categorical codes: one bin for each of the most
+  frequent training codes, one for the other training codes and one for
+  codes never seen in training (such as encoding.UNKNOWN_CODE)
+
+Memory is therefore fixed by the baseline, whatever the traffic. Counting
+follows metrics.py: every thread increments its own shard without a lock,
+the shard of an exited thread is folded into a shared total, and shards
+are only summed when drift is evaluated.
+
+DriftMonitor.evaluate(), run every ``interval`` seconds by a background
+thread, compares the rows counted since the previous evaluation (the
+window) and since start-up (the total) with the training distribution,
+scoring each feature by its population stability index (PSI): below 0.1
+is stable, 0.1 to 0.25 a moderate shift and above 0.25 drift.
+
+The baseline is written ahead of time with
+
+    python drift.py Zomato_df.csv --output drift_baseline.json
+"""
+import argparse
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+import weakref
+
+import numpy as np
+
+from features import FEATURE_NAMES
+from metrics import ThreadExit
+
+NUMERIC_FEATURES = ('votes', 'cost')
+
+# PSI above which a feature is reported as shifting, then as drifting
+PSI_WARNING = 0.1
+PSI_DRIFT = 0.25
+
+# Matrices with fewer rows are counted row by row, which is cheaper
+SMALL_MATRIX_ROWS = 16
+
+
+class DriftBaseline:
+    """
+    Bin layout and training counts of every feature. Each entry of
+    ``features`` is a dict with the feature ``name``, its ``kind``, the
+    training ``counts`` per bin and either the numeric bin ``edges`` or
+    the ``codes`` that have a bin of their own.
+    """
+
+    def __init__(self, features, rows):
+        self.features = features
+        self.rows = rows
+        self._slices = None
+        self._tables = None
+
+    @classmethod
+    def from_matrix(cls, X, numeric_bins=20, top_categories=30):
+        X = np.asarray(X)
+        features = []
+        for j, name in enumerate(FEATURE_NAMES):
+            values = X[:, j]
+            if name in NUMERIC_FEATURES:
+                quantiles = np.quantile(values, np.linspace(0, 1, numeric_bins + 1)[1:-1])
+                feature = {'name': name, 'kind': 'numeric', 'edges': np.unique(quantiles).tolist()}
+            else:
+                codes, counts = np.unique(values.astype(np.int64), return_counts=True)
+                top = codes[np.argsort(-counts, kind='stable')[:top_categories]]
+                feature = {'name': name, 'kind': 'categorical', 'codes': sorted(top.tolist()),
+                           'max_code': int(codes.max())}
+            features.append(feature)
+        baseline = cls(features, len(X))
+        counts = baseline.bin_counts(X)
+        for feature, (start, stop) in zip(features, baseline.slices()):
+            feature['counts'] = counts[start:stop].tolist()
+        return baseline
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        names = [feature['name'] for feature in data['features']]
+        if names != FEATURE_NAMES:
+            raise ValueError(f'{path} describes features {names}, expected {FEATURE_NAMES}')
+        return cls(data['features'], data['rows'])
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({'rows': self.rows, 'features': self.features}, f)
+
+    def sizes(self):
+        """Bins of each feature: numeric bins, or top codes plus 'other' and 'unseen'"""
+        return [len(feature['edges']) + 1 if feature['kind'] == 'numeric' else len(feature['codes']) + 2
+                for feature in self.features]
+
+    def slices(self):
+        """(start, stop) of each feature's bins in the flat count array"""
+        if self._slices is None:
+            offsets = np.concatenate([[0], np.cumsum(self.sizes())]).tolist()
+            self._slices = list(zip(offsets[:-1], offsets[1:]))
+        return self._slices
+
+    def lookup_tables(self):
+        """For categorical features, flat bin index of every training code"""
+        if self._tables is None:
+            self._tables = self._build_lookup_tables()
+        return self._tables
+
+    def _build_lookup_tables(self):
+        tables = []
+        for feature, (start, stop) in zip(self.features, self.slices()):
+            if feature['kind'] == 'numeric':
+                tables.append(None)
+                continue
+            other, unseen = stop - 2, stop - 1
+            table = np.full(feature['max_code'] + 2, other, dtype=np.int64)
+            table[-1] = unseen  # index used for every code outside 0..max_code
+            for i, code in enumerate(feature['codes']):
+                table[code] = start + i
+            tables.append(table)
+        return tables
+
+    def bin_counts(self, X):
+        """Flat count array of the rows of X"""
+        return np.bincount(self.bin_indices(X).ravel(), minlength=self.slices()[-1][1])
+
+    def bin_indices(self, X):
+        X = np.asarray(X)
+        indices = np.empty(X.shape, dtype=np.int64)
+        for j, (feature, (start, _), table) in enumerate(zip(self.features, self.slices(), self.lookup_tables())):
+            values = X[:, j]
+            if table is None:
+                indices[:, j] = start + np.searchsorted(feature['edges'], values, side='right')
+            else:
+                codes = values.astype(np.int64)
+                outside = (codes < 0) | (codes > feature['max_code']) | (codes != values)
+                indices[:, j] = table[np.where(outside, len(table) - 1, codes)]
+        return indices
+
+
+class DriftMonitor:
+    """Per-thread sketches of live feature rows, periodically compared with a DriftBaseline"""
+
+    def __init__(self, baseline, interval=60.0, min_rows=200):
+        self.baseline = baseline
+        self.interval = interval
+        self.min_rows = min_rows
+        self.evaluations = 0
+        self._slices = baseline.slices()
+        self._n_bins = self._slices[-1][1]
+        self._expected = np.array([count for feature in baseline.features for count in feature['counts']],
+                                  dtype=np.float64)
+        self._row_binners = self._make_row_binners()
+        self._lock = threading.Lock()
+        self._evaluate_lock = threading.Lock()
+        self._local = threading.local()
+        self._shards = []
+        # Rows counted by threads that have exited
+        self._retired = np.zeros(self._n_bins, dtype=np.int64)
+        self._previous = np.zeros(self._n_bins, dtype=np.int64)
+        self._previous_time = time.time()
+        self._started = self._previous_time
+        self._last_report = None
+        self._evaluator = None
+        self._evaluator_pid = None
+
+    def _make_row_binners(self):
+        """One function per feature mapping a value to its flat bin index, for update()"""
+        binners = []
+        for feature, (start, _), table in zip(self.baseline.features, self._slices, self.baseline.lookup_tables()):
+            if table is None:
+                edges = feature['edges']
+                binners.append(lambda value, edges=edges, start=start: start + bisect.bisect_right(edges, value))
+            else:
+                table = table.tolist()
+                max_code = feature['max_code']
+                binners.append(lambda value, table=table, max_code=max_code:
+                               table[int(value)] if 0 <= value <= max_code and value == int(value) else table[-1])
+        return binners
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            # Python ints for single rows, a NumPy array for matrices
+            shard = self._local.shard = ([0] * self._n_bins, np.zeros(self._n_bins, dtype=np.int64))
+            self._local.exit = ThreadExit()
+            weakref.finalize(self._local.exit, self._retire, shard).atexit = False
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def _retire(self, shard):
+        singles, matrices = shard
+        with self._lock:
+            self._shards = [other for other in self._shards if other is not shard]
+            self._retired += np.asarray(singles, dtype=np.int64)
+            self._retired += matrices
+
+    def update(self, row):
+        """Count one feature row (a sequence of numbers in FEATURE_NAMES order)"""
+        counts = self._shard()[0]
+        for binner, value in zip(self._row_binners, row):
+            counts[binner(value)] += 1
+
+    def update_matrix(self, X):
+        """Count every row of a feature matrix"""
+        if len(X) < SMALL_MATRIX_ROWS:
+            # Vectorizing does not pay off for a handful of rows
+            for row in np.asarray(X).tolist():
+                self.update(row)
+        else:
+            counts = self._shard()[1]
+            counts += self.baseline.bin_counts(X)
+
+    def counts(self):
+        """Flat counts of every row seen so far, summed over threads"""
+        with self._lock:
+            shards = list(self._shards)
+            total = self._retired.copy()
+        for singles, matrices in shards:
+            total += np.asarray(list(singles), dtype=np.int64)
+            total += matrices
+        return total
+
+    def evaluate(self):
+        """Score the window since the previous evaluation and the total; returns the report"""
+        with self._evaluate_lock:
+            now = time.time()
+            total = self.counts()
+            window = total - self._previous
+            report = {
+                'evaluated_at': now,
+                'baseline_rows': self.baseline.rows,
+                'window': self._score(window, self._previous_time, now),
+                'total': self._score(total, self._started, now),
+            }
+            self._previous, self._previous_time = total, now
+            self._last_report = report
+            self.evaluations += 1
+        return report
+
+    def _score(self, counts, started, ended):
+        # Every row lands in exactly one bin of each feature
+        rows = int(counts[:self._slices[0][1]].sum())
+        result = {'started_at': started, 'ended_at': ended, 'rows': rows, 'features': {}, 'drifted': []}
+        for feature, (start, stop) in zip(self.baseline.features, self._slices):
+            scores = {'psi': None, 'status': 'insufficient_data'}
+            if rows >= self.min_rows:
+                value = psi(self._expected[start:stop], counts[start:stop])
+                scores = {'psi': round(value, 5), 'status': drift_status(value)}
+                if feature['kind'] == 'categorical':
+                    scores['unseen_share'] = round(counts[stop - 1] / rows, 5)
+                if scores['status'] == 'drift':
+                    result['drifted'].append(feature['name'])
+            result['features'][feature['name']] = scores
+        known = [scores['psi'] for scores in result['features'].values() if scores['psi'] is not None]
+        result['max_psi'] = max(known) if known else None
+        return result
+
+    def report(self):
+        """Latest evaluation, or None before the first one"""
+        return self._last_report
+
+    def start(self):
+        """Start the periodic evaluation thread in this process, once"""
+        if self.interval <= 0:
+            return
+        if self._evaluator_pid == os.getpid() and self._evaluator.is_alive():
+            return
+        self._evaluator = threading.Thread(target=self._evaluate_periodically, name='drift-monitor', daemon=True)
+        self._evaluator.start()
+        self._evaluator_pid = os.getpid()
+
+    def _evaluate_periodically(self):
+        while True:
+            time.sleep(self.interval)
+            self.evaluate()
+
+
+def psi(expected, actual, floor=1e-4):
+    """Population stability index of actual counts against expected counts over the same bins"""
+    p = np.maximum(np.asarray(expected, dtype=np.float64) / max(np.sum(expected), 1), floor)
+    q = np.maximum(np.asarray(actual, dtype=np.float64) / max(np.sum(actual), 1), floor)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+
+def drift_status(value):
+    if value > PSI_DRIFT:
+        return 'drift'
+    if value > PSI_WARNING:
+        return 'warning'
+    return 'ok'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute the training baseline of the drift monitor')
+    parser.add_argument('input', nargs='?', default='Zomato_df.csv', help='training table (CSV or dataset cache)')
+    parser.add_argument('--output', default='drift_baseline.json', help='baseline file to write')
+    parser.add_argument('--numeric-bins', type=int, default=20, help='quantile bins for votes and cost')
+    parser.add_argument('--top-categories', type=int, default=30,
+                        help='most frequent codes of each categorical feature that get their own bin')
+    args = parser.parse_args()
+
+    from feature_store import FeatureStore
+    try:
+        store = FeatureStore.from_dataset(args.input)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error reading {args.input}: {e}")
+        sys.exit(1)
+    baseline = DriftBaseline.from_matrix(store.features, args.numeric_bins, args.top_categories)
+    baseline.save(args.output)
+    print(f"Drift baseline of {baseline.rows} rows ({sum(baseline.sizes())} bins) written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
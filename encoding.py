@@ -0,0 +1,184 @@
+"""
+Server-side encoding of raw restaurant attributes into model features
+
+The forest was trained on label-encoded categorical columns. The encoder
+compiles the vocabularies saved by preprocessing.py into one dict per
+column, so clients can send "BTM" or "Casual Dining" instead of codes, and
+also accepts "Yes"/"No" flags and costs written with thousands separators.
+Categories are matched exactly first, then ignoring case and repeated
+whitespace. Values that are in neither index are unseen: by default they
+are rejected, with unknown='fallback' they are encoded as UNKNOWN_CODE,
+which sorts before every known code, and reported back to the caller.
+"""
+import json
+
+import numpy as np
+
+from features import FEATURE_DTYPE, FEATURE_NAMES, PayloadError
+
+CATEGORICAL_FEATURES = ['location', 'rest_type', 'cuisines', 'menu_item']
+
+# Code given to unseen categories under the 'fallback' policy
+UNKNOWN_CODE = -1
+
+UNKNOWN_POLICIES = ('reject', 'fallback')
+
+_FLAGS = {'yes': 1, 'no': 0, 'true': 1, 'false': 0, '1': 1, '0': 0}
+
+# Returned by dict.get for values missing from the exact index
+_MISSING = -2
+
+
+class UnknownCategoryError(PayloadError):
+    """Raised for unseen categorical values when the policy is 'reject'"""
+
+    def __init__(self, unknown):
+        self.unknown = unknown
+        details = '; '.join(f"{column}: {', '.join(map(repr, values))}" for column, values in unknown.items())
+        super().__init__(f"Unknown categories ({details})")
+
+
+def normalize(value):
+    """Key of the lenient index: case-folded, whitespace collapsed"""
+    return ' '.join(value.split()).casefold()
+
+
+class CategoricalEncoder:
+    """Encodes raw feature values with precompiled per-column hash indexes"""
+
+    def __init__(self, vocabularies, unknown='reject'):
+        if unknown not in UNKNOWN_POLICIES:
+            raise ValueError(f"unknown must be one of {', '.join(UNKNOWN_POLICIES)}")
+        missing = [column for column in CATEGORICAL_FEATURES if column not in vocabularies]
+        if missing:
+            raise ValueError(f"Vocabularies missing for: {', '.join(missing)}")
+        self.unknown = unknown
+        self.sizes = {column: len(vocabularies[column]) for column in CATEGORICAL_FEATURES}
+        self._exact = {}
+        self._lenient = {}
+        for column in CATEGORICAL_FEATURES:
+            values = vocabularies[column]
+            self._exact[column] = {value: code for code, value in enumerate(values)}
+            lenient = {}
+            for code, value in enumerate(values):
+                lenient.setdefault(normalize(value), code)
+            self._lenient[column] = lenient
+
+    @classmethod
+    def from_file(cls, path, unknown='reject'):
+        """Build an encoder from a vocabularies.json written by preprocessing.py"""
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f), unknown)
+
+    def encode_column(self, column, values):
+        """Codes of one categorical column's raw values, and the unseen values"""
+        get = self._exact[column].get
+        try:
+            codes = [get(value, _MISSING) for value in values]
+        except TypeError:
+            raise PayloadError(f"Feature {column!r} must be a string")
+        unseen = []
+        if _MISSING in codes:
+            for i, code in enumerate(codes):
+                if code != _MISSING:
+                    continue
+                value = values[i]
+                code = self._lenient[column].get(normalize(value)) if isinstance(value, str) else None
+                if code is None:
+                    unseen.append(value)
+                    code = UNKNOWN_CODE
+                codes[i] = code
+        return codes, unseen
+
+    def encode_columns(self, columns):
+        """
+        Feature matrix for {feature_name: [raw values...]}, plus the unseen
+        values by column (empty unless the policy is 'fallback')
+        """
+        missing = [name for name in FEATURE_NAMES if name not in columns]
+        if missing:
+            raise PayloadError(f"Missing feature columns: {', '.join(missing)}")
+        not_lists = [name for name in FEATURE_NAMES if not isinstance(columns[name], list)]
+        if not_lists:
+            raise PayloadError(f"Feature columns must be lists: {', '.join(not_lists)}")
+        n_rows = len(columns[FEATURE_NAMES[0]])
+        matrix = np.empty((n_rows, len(FEATURE_NAMES)), dtype=FEATURE_DTYPE)
+        unknown = {}
+        for j, name in enumerate(FEATURE_NAMES):
+            values = columns[name]
+            if len(values) != n_rows:
+                raise PayloadError(f"Column {name!r} must be a list of {n_rows} values")
+            if name in CATEGORICAL_FEATURES:
+                matrix[:, j], unseen = self.encode_column(name, values)
+                if unseen:
+                    unknown[name] = sorted(set(map(str, unseen)))
+            else:
+                matrix[:, j] = _numeric_column(name, values)
+        if unknown and self.unknown == 'reject':
+            raise UnknownCategoryError(unknown)
+        return matrix, unknown
+
+    def encode_payload(self, payload):
+        """
+        Like features.payload_to_matrix(), for raw ``{"instances": [...]}``
+        or ``{"columns": {...}}`` payloads; returns (matrix, unknown)
+        """
+        if not isinstance(payload, dict):
+            raise PayloadError("Request body must be a JSON object")
+        if 'columns' in payload:
+            columns = payload['columns']
+            if not isinstance(columns, dict):
+                raise PayloadError("'columns' must be an object of feature name to list")
+            return self.encode_columns(columns)
+        if 'instances' not in payload:
+            raise PayloadError("Request body must contain 'instances' or 'columns'")
+        rows = payload['instances']
+        if not isinstance(rows, list):
+            raise PayloadError("'instances' must be a list of objects")
+        try:
+            columns = {name: [row[name] for row in rows] for name in FEATURE_NAMES}
+        except KeyError as e:
+            raise PayloadError(f"Missing feature {e.args[0]!r}")
+        except TypeError:
+            raise PayloadError("Every instance must be an object keyed by feature name")
+        return self.encode_columns(columns)
+
+    def encode_form(self, values):
+        """
+        Feature row for the eight HTML form values: numbers are taken as they
+        are (so existing integer codes keep working), anything else is encoded
+        """
+        if len(values) != len(FEATURE_NAMES):
+            raise PayloadError(f"Expected {len(FEATURE_NAMES)} form values, got {len(values)}")
+        row = []
+        for name, value in zip(FEATURE_NAMES, values):
+            try:
+                row.append(int(value))
+            except ValueError:
+                if name in CATEGORICAL_FEATURES:
+                    codes, unseen = self.encode_column(name, [value])
+                    if unseen and self.unknown == 'reject':
+                        raise UnknownCategoryError({name: unseen})
+                    row.append(codes[0])
+                else:
+                    row.append(float(_numeric_column(name, [value])[0]))
+        return row
+
+
+def _numeric_column(name, values):
+    if name in ('online_order', 'book_table'):
+        values = [_FLAGS.get(value.strip().casefold(), value) if isinstance(value, str) else value
+                  for value in values]
+    elif name == 'cost':
+        values = [value.replace(',', '') if isinstance(value, str) else value for value in values]
+    try:
+        # Values past the float32 range become inf and are rejected below
+        with np.errstate(over='ignore'):
+            column = np.array(values, dtype=FEATURE_DTYPE)
+    except OverflowError:
+        column = np.array([np.inf], dtype=FEATURE_DTYPE)
+    except (TypeError, ValueError):
+        raise PayloadError(f"Feature {name!r} must be numeric")
+    if not np.isfinite(column).all():
+        raise PayloadError(f"Feature {name!r} must be a finite number")
+    return column
@@ -0,0 +1,224 @@
+"""
+In-memory feature store of the training table, keyed by restaurant
+
+Callers that know which restaurant they are asking about can send its ID
+instead of all eight features:
+
+    {"ids": [12, 40, 7]}
+    {"ids": [12, 40, 7], "overrides": {"cost": 500}}
+    {"instances": [{"id": 12, "cost": 500}, {"id": 40, "online_order": 0}]}
+
+Overrides replace stored (encoded) feature values, for every row or per
+instance. The store keeps one contiguous (n, 8) float32 matrix in
+FEATURE_NAMES order next to a sorted key array, so a batch of IDs is
+resolved with one np.searchsorted() and gathered with one fancy-index
+copy, ready for a single forest call. It is built from the columnar
+dataset cache (see dataset.py): Zomato_df.csv, or a cache directory.
+FeatureStoreReloader rebuilds it when that table changes on disk.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+
+from dataset import DEFAULT_SOURCE, MANIFEST, load_cache, load_columns
+from features import FEATURE_DTYPE, FEATURE_NAMES, PayloadError
+
+# Column of the training table identifying a restaurant
+DEFAULT_KEY = 'restaurant_id'
+
+_FEATURE_INDEX = {name: j for j, name in enumerate(FEATURE_NAMES)}
+
+
+class UnknownRestaurantError(PayloadError):
+    """Raised when requested IDs are not in the store"""
+
+    def __init__(self, unknown):
+        self.unknown = unknown
+        shown = ', '.join(map(str, unknown[:10])) + (', ...' if len(unknown) > 10 else '')
+        super().__init__(f"Unknown restaurant IDs: {shown}")
+
+
+class FeatureStore:
+    """Feature rows of the training table, looked up by integer key"""
+
+    def __init__(self, keys, features):
+        keys = np.asarray(keys, dtype=np.int64)
+        features = np.asarray(features, dtype=FEATURE_DTYPE)
+        if features.shape != (len(keys), len(FEATURE_NAMES)):
+            raise ValueError(f"Expected a ({len(keys)}, {len(FEATURE_NAMES)}) feature matrix")
+        if len(keys) > 1 and not (keys[1:] > keys[:-1]).all():
+            order = np.argsort(keys, kind='stable')
+            keys, features = keys[order], features[order]
+            if (keys[1:] == keys[:-1]).any():
+                raise ValueError("Restaurant keys must be unique")
+        self.keys = np.ascontiguousarray(keys)
+        self.features = np.ascontiguousarray(features)
+        self.keys.flags.writeable = False
+        self.features.flags.writeable = False
+
+    @classmethod
+    def from_columns(cls, columns, key=DEFAULT_KEY):
+        """
+        Store of a {column: array} table; without a key column rows are
+        keyed by their position
+        """
+        missing = [name for name in FEATURE_NAMES if name not in columns]
+        if missing:
+            raise ValueError(f"Table is missing feature columns: {', '.join(missing)}")
+        n_rows = len(columns[FEATURE_NAMES[0]])
+        keys = columns[key] if key in columns else np.arange(n_rows)
+        features = np.empty((n_rows, len(FEATURE_NAMES)), dtype=FEATURE_DTYPE)
+        for j, name in enumerate(FEATURE_NAMES):
+            features[:, j] = columns[name]
+        return cls(keys, features)
+
+    @classmethod
+    def from_dataset(cls, path=DEFAULT_SOURCE, key=DEFAULT_KEY):
+        """Store of a training table CSV (through its cache) or of a cache directory"""
+        columns = load_cache(path) if os.path.isdir(path) else load_columns(path)
+        return cls.from_columns(columns, key)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def positions(self, ids):
+        """Row positions of ids; raises UnknownRestaurantError naming the missing ones"""
+        ids = _as_ids(ids)
+        positions = np.searchsorted(self.keys, ids)
+        np.minimum(positions, len(self.keys) - 1, out=positions)
+        found = self.keys[positions] == ids if len(self.keys) else np.zeros(len(ids), dtype=bool)
+        if not found.all():
+            raise UnknownRestaurantError(np.unique(ids[~found]).tolist())
+        return positions
+
+    def lookup(self, ids):
+        """Writable (len(ids), 8) feature matrix of ids, in request order"""
+        return self.features[self.positions(ids)]
+
+    def payload_to_matrix(self, payload):
+        """Feature matrix for an ``ids`` or ``instances`` payload (see module docstring)"""
+        if not isinstance(payload, dict):
+            raise PayloadError("Request body must be a JSON object")
+        if 'ids' in payload:
+            matrix = self.lookup(payload['ids'])
+            overrides = payload.get('overrides', {})
+            if not isinstance(overrides, dict):
+                raise PayloadError("'overrides' must be an object of feature name to value")
+            for name, value in overrides.items():
+                matrix[:, _feature_index(name)] = _feature_value(name, value)
+            return matrix
+        if 'instances' in payload:
+            return self._instances_to_matrix(payload['instances'])
+        raise PayloadError("Request body must contain 'ids' or 'instances'")
+
+    def _instances_to_matrix(self, instances):
+        if not isinstance(instances, list):
+            raise PayloadError("'instances' must be a list of objects")
+        try:
+            ids = [instance['id'] for instance in instances]
+        except KeyError:
+            raise PayloadError("Every instance must have an 'id'")
+        except TypeError:
+            raise PayloadError("Every instance must be an object with an 'id'")
+        matrix = self.lookup(ids)
+        for i, instance in enumerate(instances):
+            if len(instance) > 1:
+                for name, value in instance.items():
+                    if name != 'id':
+                        matrix[i, _feature_index(name)] = _feature_value(name, value)
+        return matrix
+
+
+def _as_ids(ids):
+    if not isinstance(ids, (list, np.ndarray)):
+        raise PayloadError("'ids' must be a list of integers")
+    ids = np.asarray(ids)
+    if len(ids) == 0:
+        return ids.astype(np.int64)
+    if ids.ndim != 1 or ids.dtype.kind not in 'iu':
+        raise PayloadError("Restaurant IDs must be integers")
+    return ids.astype(np.int64, copy=False)
+
+
+def _feature_index(name):
+    try:
+        return _FEATURE_INDEX[name]
+    except KeyError:
+        raise PayloadError(f"Unknown feature {name!r} in overrides")
+
+
+def _feature_value(name, value):
+    if not isinstance(value, bool) and isinstance(value, (int, float)):
+        # Checked after the cast: 1e40 is a finite float but an infinite float32
+        try:
+            with np.errstate(over='ignore'):
+                value = FEATURE_DTYPE(value)
+        except OverflowError:
+            value = np.inf
+        if np.isfinite(value):
+            return value
+    raise PayloadError(f"Override of {name!r} must be a finite number")
+
+
+class FeatureStoreReloader:
+    """
+    Loads the store again when the training table changes and hands it to
+    ``install``, polling like model_loader.ModelReloader: a change is picked
+    up once the file's mtime and size stayed the same for one interval.
+    """
+
+    def __init__(self, path, install, poll_interval=0, key=DEFAULT_KEY):
+        self.path = path
+        self.install = install
+        self.poll_interval = poll_interval
+        self.key = key
+        self.last_error = None
+        self._signature = self._current_signature()
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._watcher_pid = None
+
+    def reload(self):
+        """Load and install the store; returns (installed, message)"""
+        with self._reload_lock:
+            signature = self._current_signature()
+            try:
+                store = FeatureStore.from_dataset(self.path, self.key)
+            except Exception as e:
+                self.last_error = f'{type(e).__name__}: {e}'
+                self._signature = signature
+                return False, self.last_error
+            self.install(store)
+            self._signature = signature
+            self.last_error = None
+            return True, f'{len(store)} restaurants'
+
+    def start_watching(self):
+        """Start the polling thread in this process, once"""
+        if self.poll_interval <= 0:
+            return
+        if self._watcher_pid == os.getpid() and self._watcher.is_alive():
+            return
+        self._watcher = threading.Thread(target=self._watch, name='feature-store-watcher', daemon=True)
+        self._watcher.start()
+        self._watcher_pid = os.getpid()
+
+    def _watch(self):
+        previous = self._current_signature()
+        while True:
+            time.sleep(self.poll_interval)
+            signature = self._current_signature()
+            if signature is not None and signature == previous and signature != self._signature:
+                ok, message = self.reload()
+                print(f"Feature store reload {'succeeded' if ok else 'failed'}: {message}")
+            previous = signature
+
+    def _current_signature(self):
+        path = os.path.join(self.path, MANIFEST) if os.path.isdir(self.path) else self.path
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
@@ -0,0 +1,199 @@
+"""
+Feature schema shared by the web app, the batch tools and the training script
+"""
+import codecs
+import csv
+import io
+import json
+
+import numpy as np
+
+# Column order the ExtraTreesRegressor in model.py was trained on
+FEATURE_NAMES = [
+    'online_order', 'book_table', 'votes', 'location',
+    'rest_type', 'cuisines', 'cost', 'menu_item'
+]
+
+# Field names of the HTML form in templates/index.html, in the same order
+FORM_FIELDS = [
+    'Online Order', 'Book Table', 'Votes', 'Location',
+    'Restaurant Type', 'Cuisines', 'Cost', 'Menu Item'
+]
+
+# sklearn trees compare float32 inputs against their thresholds, so building
+# the matrix in float32 up front saves a conversion copy inside predict()
+FEATURE_DTYPE = np.float32
+
+
+class PayloadError(ValueError):
+    """Raised when a prediction payload cannot be turned into a feature matrix"""
+
+
+def rows_to_matrix(rows):
+    """Build an (n, 8) matrix from a list of {feature_name: value} objects"""
+    if not isinstance(rows, list):
+        raise PayloadError("'instances' must be a list of objects")
+    try:
+        values = [[row[name] for name in FEATURE_NAMES] for row in rows]
+    except KeyError as e:
+        raise PayloadError(f"Missing feature {e.args[0]!r}")
+    except TypeError:
+        raise PayloadError("Every instance must be an object keyed by feature name")
+    return _as_matrix(values, len(rows))
+
+
+def columns_to_matrix(columns):
+    """Build an (n, 8) matrix from a {feature_name: [values...]} object"""
+    if not isinstance(columns, dict):
+        raise PayloadError("'columns' must be an object of feature name to list")
+    missing = [name for name in FEATURE_NAMES if name not in columns]
+    if missing:
+        raise PayloadError(f"Missing feature columns: {', '.join(missing)}")
+
+    first = columns[FEATURE_NAMES[0]]
+    if not isinstance(first, list):
+        raise PayloadError(f"Column {FEATURE_NAMES[0]!r} must be a list of values")
+    n_rows = len(first)
+    matrix = np.empty((n_rows, len(FEATURE_NAMES)), dtype=FEATURE_DTYPE)
+    for j, name in enumerate(FEATURE_NAMES):
+        column = columns[name]
+        if not isinstance(column, list) or len(column) != n_rows:
+            raise PayloadError(f"Column {name!r} must be a list of {n_rows} values")
+        try:
+            matrix[:, j] = column
+        except (TypeError, ValueError):
+            raise PayloadError(f"Column {name!r} contains non-numeric values")
+    return _check_finite(matrix)
+
+
+def payload_to_matrix(payload):
+    """
+    Turn a JSON prediction payload into one contiguous feature matrix.
+
+    Accepts either row-oriented ``{"instances": [{...}, ...]}`` or
+    column-oriented ``{"columns": {"votes": [...], ...}}`` payloads.
+    """
+    if not isinstance(payload, dict):
+        raise PayloadError("Request body must be a JSON object")
+    if 'instances' in payload:
+        return rows_to_matrix(payload['instances'])
+    if 'columns' in payload:
+        return columns_to_matrix(payload['columns'])
+    raise PayloadError("Request body must contain 'instances' or 'columns'")
+
+
+def iter_text_lines(stream, encoding='utf-8', block_size=1 << 16):
+    """
+    Decode a binary stream into text lines, reading block_size bytes at a
+    time; works with any object that has read(n), such as a WSGI input
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ''
+    while True:
+        block = stream.read(block_size)
+        lines = (pending + decoder.decode(block, final=not block)).split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + '\n'
+        if not block:
+            break
+    if pending:
+        yield pending
+
+
+def csv_matrices(lines, chunk_rows=4096, id_column=None):
+    """
+    Parse CSV text with a header row into feature matrices of at most
+    ``chunk_rows`` rows each.
+
+    The header is read and checked immediately; the data rows are parsed
+    lazily by the returned generator, which yields ``(ids, matrix)`` pairs.
+    ``ids`` holds the raw ``id_column`` values of the chunk's rows, or their
+    0-based row numbers when no id column is given. Columns other than the
+    features and the id column are ignored.
+    """
+    reader = csv.reader(lines)
+    try:
+        header = [name.strip() for name in next(reader)]
+    except StopIteration:
+        raise PayloadError("CSV input is empty")
+    positions = {name: i for i, name in enumerate(header)}
+    missing = [name for name in FEATURE_NAMES if name not in positions]
+    if missing:
+        raise PayloadError(f"Missing feature columns: {', '.join(missing)}")
+    if id_column is not None and id_column not in positions:
+        raise PayloadError(f"Missing id column {id_column!r}")
+    indices = [positions[name] for name in FEATURE_NAMES]
+    id_index = positions.get(id_column)
+    return _csv_chunks(reader, indices, id_index, chunk_rows)
+
+
+def _csv_chunks(reader, indices, id_index, chunk_rows):
+    rows, ids = [], []
+    n_rows = 0
+    for record in reader:
+        if not record:
+            continue
+        try:
+            rows.append([record[i] for i in indices])
+            if id_index is not None:
+                ids.append(record[id_index])
+        except IndexError:
+            raise PayloadError(f"CSV line {reader.line_num} has only {len(record)} fields")
+        if len(rows) == chunk_rows:
+            yield _csv_chunk(rows, ids, n_rows, id_index)
+            n_rows += len(rows)
+            rows, ids = [], []
+    if rows:
+        yield _csv_chunk(rows, ids, n_rows, id_index)
+
+
+def _csv_chunk(rows, ids, first_row, id_index):
+    try:
+        matrix = np.array(rows, dtype=FEATURE_DTYPE)
+    except ValueError:
+        raise PayloadError(
+            f"Non-numeric feature value in CSV rows {first_row}-{first_row + len(rows) - 1}")
+    if id_index is None:
+        ids = range(first_row, first_row + len(rows))
+    return ids, _check_finite(matrix)
+
+
+def prediction_header(key='row'):
+    """Header line of CSV predictions rendered by format_predictions()"""
+    return _csv_text([(key, 'prediction')])
+
+
+def format_predictions(ids, predictions, output_format='csv', key='row'):
+    """
+    Render one chunk of predictions as CSV lines (``<key>,prediction``, no
+    header) or as NDJSON objects ``{"<key>": id, "prediction": value}``
+    """
+    if output_format == 'csv':
+        return _csv_text(zip(ids, predictions))
+    return ''.join(json.dumps({key: i, 'prediction': p}) + '\n' for i, p in zip(ids, predictions))
+
+
+def _csv_text(rows):
+    # Quotes ids containing commas, quotes or line breaks
+    text = io.StringIO()
+    csv.writer(text, lineterminator='\n').writerows(rows)
+    return text.getvalue()
+
+
+def _as_matrix(values, n_rows):
+    try:
+        matrix = np.array(values, dtype=FEATURE_DTYPE)
+    except (TypeError, ValueError):
+        raise PayloadError("Feature values must be numeric")
+    if n_rows == 0:
+        matrix = matrix.reshape(0, len(FEATURE_NAMES))
+    if matrix.shape != (n_rows, len(FEATURE_NAMES)):
+        raise PayloadError("Every feature value must be a single number")
+    return _check_finite(matrix)
+
+
+def _check_finite(matrix):
+    if not np.isfinite(matrix).all():
+        raise PayloadError("Feature values must be finite numbers")
+    return matrix
@@ -0,0 +1,35 @@
+"""
+Gunicorn settings for serving app.py in production
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The app (and the model with it) is imported once in the master process and
+frozen before the workers are forked, so N workers share one copy of the
+forest through copy-on-write pages. A forest artifact (model.forest) is
+memory-mapped instead, which also keeps models hot-reloaded inside the
+workers, and other servers on the host mapping the same file, on one shared
+copy. Use worker_memory.py to check how much resident memory each worker
+actually owns.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('ZOMATO_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('ZOMATO_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.environ.get('ZOMATO_THREADS', '4'))
+worker_class = 'gthread'
+timeout = int(os.environ.get('ZOMATO_WORKER_TIMEOUT', '30'))
+
+# Load the model in the master before forking instead of once per worker
+preload_app = True
+
+accesslog = '-'
+errorlog = '-'
+
+
+def when_ready(server):
+    import app
+    # Built before forking, so workers start with (and share) the table
+    app.refresh_prediction_table(wait=True)
+    app.freeze_model()
+    server.log.info('Model frozen in master (pid %s) before forking workers', os.getpid())
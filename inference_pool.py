@@ -0,0 +1,180 @@
+"""
+Pool of inference processes serving a FlatForest from shared memory
+
+Tree traversal holds the GIL, so large predictions in request threads stall
+parsing and rendering for every other request in the same process. With an
+InferencePool the HTTP threads only submit feature matrices and wait on
+futures; the forest walks happen in separate worker processes. The node
+arrays are copied once into a POSIX shared memory block, and every worker
+maps that block instead of receiving its own copy of the model.
+"""
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from forest import FlatForest
+
+# Forest attached by each pool worker process in _attach_forest()
+_worker_forest = None
+_worker_block = None
+
+_ALIGNMENT = 64
+
+
+class PoolSaturated(RuntimeError):
+    """Raised when more predictions are queued than the pool's depth limit allows"""
+
+
+class SharedForest:
+    """A FlatForest's node arrays copied into one named shared memory block"""
+
+    def __init__(self, forest):
+        layout = {}
+        size = 0
+        for name, array in forest.arrays().items():
+            size = -(-size // _ALIGNMENT) * _ALIGNMENT
+            layout[name] = (size, array.dtype.str, array.shape)
+            size += array.nbytes
+
+        self.block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for name, array in forest.arrays().items():
+            _view(self.block, layout[name])[...] = array
+        self.spec = {
+            'name': self.block.name,
+            'layout': layout,
+            'n_features': forest.n_features,
+            'max_depth': forest.max_depth,
+        }
+        self._owner_pid = os.getpid()
+
+    def release(self):
+        """Unmap the block and, in the creating process, delete it"""
+        self.block.close()
+        if os.getpid() == self._owner_pid:
+            try:
+                self.block.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def attach_forest(spec):
+    """Map a SharedForest block created by another process as a FlatForest"""
+    block = shared_memory.SharedMemory(name=spec['name'])
+    arrays = {name: _view(block, entry) for name, entry in spec['layout'].items()}
+    forest = FlatForest.from_arrays(arrays, spec['n_features'], spec['max_depth'])
+    return forest.freeze(), block
+
+
+def _view(block, entry):
+    offset, dtype, shape = entry
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf, offset=offset)
+
+
+def _attach_forest(spec):
+    global _worker_forest, _worker_block
+    _worker_forest, _worker_block = attach_forest(spec)
+
+
+def _predict(X):
+    return _worker_forest.predict(X)
+
+
+class InferencePool:
+    """
+    Runs FlatForest.predict in ``processes`` worker processes.
+
+    At most ``max_queue_depth`` matrices may be queued or running at once;
+    beyond that submit() raises PoolSaturated so callers can shed load
+    instead of queueing without bound. reload() swaps in a new forest:
+    predictions already submitted finish on the old workers, which are then
+    shut down and their shared memory released.
+    """
+
+    def __init__(self, forest, processes=2, max_queue_depth=64):
+        if processes < 1:
+            raise ValueError('processes must be at least 1')
+        self.processes = processes
+        self.max_queue_depth = max_queue_depth
+        self.model = forest
+        self._shared = SharedForest(forest)
+        self._executor = None
+        self._executor_pid = None
+        self._depth = 0
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    @property
+    def queue_depth(self):
+        return self._depth
+
+    def predict(self, X, timeout=None):
+        """Score X in a worker process and wait for the result"""
+        return self.submit(X).result(timeout)
+
+    def submit(self, X):
+        """Queue X for prediction and return a Future"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        with self._lock:
+            if self._depth >= self.max_queue_depth:
+                raise PoolSaturated(f'{self._depth} predictions already queued')
+            self._depth += 1
+            try:
+                future = self._current_executor().submit(_predict, X)
+            except BaseException:
+                self._depth -= 1
+                raise
+        future.add_done_callback(self._release_slot)
+        return future
+
+    def reload(self, forest):
+        """Serve a new forest; in-flight predictions complete on the old one"""
+        shared = SharedForest(forest)
+        with self._lock:
+            old_shared, old_executor = self._shared, self._executor
+            self.model = forest
+            self._shared = shared
+            self._executor = None
+        self._retire(old_shared, old_executor)
+
+    def close(self):
+        """Stop the workers and release the shared forest"""
+        with self._lock:
+            shared, executor = self._shared, self._executor
+            self._shared = self._executor = None
+        if shared is not None:
+            self._retire(shared, executor, wait=True)
+
+    def _current_executor(self):
+        # Executors (and their management threads) do not survive fork(),
+        # so each pre-forked server worker starts its own set of processes
+        if self._executor is None or self._executor_pid != os.getpid():
+            if self._shared is None:
+                raise RuntimeError('InferencePool is closed')
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_attach_forest,
+                initargs=(self._shared.spec,),
+            )
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def _release_slot(self, future):
+        with self._lock:
+            self._depth -= 1
+
+    def _retire(self, shared, executor, wait=False):
+        def shutdown():
+            if executor is not None and self._executor_pid == os.getpid():
+                executor.shutdown(wait=True)
+            shared.release()
+
+        if wait:
+            shutdown()
+        else:
+            threading.Thread(target=shutdown, name='inference-pool-retire', daemon=True).start()
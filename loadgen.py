@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Load generator for a locally running instance of the app
+
+Requests are either sampled from the training distribution (rows of
+Zomato_df.csv) or replayed from a recorded JSON lines log, and sent to
+/predict (form posts, like the web page) or /api/v1/predict (JSON rows,
+--batch-size per request). Three ways to drive them:
+
+* ``--rate R``: open loop, R requests/s whatever the server does. Latency
+  is measured from when a request was due, not when it was sent, so a
+  server falling behind shows up in the latency instead of lowering the
+  load (no coordinated omission).
+* ``--concurrency C``: closed loop, C clients each sending their next
+  request as soon as the previous one is answered.
+* ``--ramp START:STOP:STEP``: open loop at increasing rates, stopping at
+  the saturation point: the first rate the server cannot sustain
+  (throughput below 95% of the offered rate, p99 above --slo-ms or an
+  error rate above --max-error-rate).
+
+A replay log holds one request per line, either a full request
+``{"path": "/api/v1/predict", "json": {...}}`` /
+``{"path": "/predict", "form": {...}}`` or one row of features by name
+(``{"votes": 120, ...}``) sent to --endpoint. An optional ``"t"`` (seconds
+since the start of the recording) replays the original timing, scaled by
+--speed, unless --rate or --concurrency is given.
+
+Everything is plain asyncio and http.client-level HTTP/1.1 over keep-alive
+connections; no network access beyond --url is needed. --serve starts
+gunicorn (gunicorn.conf.py) on a free local port for the duration of the run.
+
+    python loadgen.py --serve --rate 200 --duration 30
+    python loadgen.py --url http://127.0.0.1:5000 --ramp 100:1000:100 --endpoint api --batch-size 50
+    python loadgen.py --replay requests.log.jsonl --speed 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import urllib.parse
+from collections import Counter, namedtuple
+
+import numpy as np
+
+import benchmark
+from features import FEATURE_NAMES, FORM_FIELDS, PayloadError, rows_to_matrix
+
+ENDPOINTS = {'predict': '/predict', 'api': '/api/v1/predict'}
+
+Request = namedtuple('Request', 'method path body content_type')
+
+
+def form_request(row):
+    form = {field: str(int(value)) for field, value in zip(FORM_FIELDS, row)}
+    return Request('POST', ENDPOINTS['predict'], urllib.parse.urlencode(form).encode(),
+                   'application/x-www-form-urlencoded')
+
+
+def json_request(path, payload):
+    return Request('POST', path, json.dumps(payload).encode(), 'application/json')
+
+
+def api_request(rows):
+    columns = {name: [row[i].item() for row in rows] for i, name in enumerate(FEATURE_NAMES)}
+    return json_request(ENDPOINTS['api'], {'columns': columns})
+
+
+def rows_to_requests(rows, endpoint='predict', batch_size=1):
+    """Requests for each row (/predict) or for each batch_size rows (/api/v1/predict)"""
+    if endpoint == 'predict':
+        return [form_request(row) for row in rows]
+    return [api_request(rows[i:i + batch_size]) for i in range(0, len(rows), batch_size)]
+
+
+def dataset_requests(path='Zomato_df.csv', endpoint='predict', batch_size=1, n_requests=10000, seed=0):
+    """Requests built from rows sampled (with replacement) from the training data"""
+    from dataset import load_columns
+    columns = load_columns(path)
+    n_rows = len(columns[FEATURE_NAMES[0]])
+    picks = np.random.RandomState(seed).randint(0, n_rows, n_requests * (batch_size if endpoint == 'api' else 1))
+    rows = np.column_stack([np.asarray(columns[name])[picks] for name in FEATURE_NAMES])
+    return rows_to_requests(rows, endpoint, batch_size)
+
+
+def read_log(path, endpoint='predict'):
+    """(offset seconds or None, Request) for each line of a recorded request log"""
+    entries = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                offset = record.pop('t', None)
+                if 'path' in record:
+                    if 'form' in record:
+                        body = urllib.parse.urlencode(record['form']).encode()
+                        request = Request(record.get('method', 'POST'), record['path'], body,
+                                          'application/x-www-form-urlencoded')
+                    elif 'json' in record:
+                        request = json_request(record['path'], record['json'])
+                        request = request._replace(method=record.get('method', 'POST'))
+                    else:
+                        request = Request(record.get('method', 'GET'), record['path'], b'', None)
+                else:
+                    row = rows_to_matrix([record])
+                    request = rows_to_requests(row, endpoint)[0]
+            except (ValueError, KeyError, TypeError, PayloadError) as e:
+                raise ValueError(f'{path}, line {line_number}: {e}')
+            entries.append((offset, request))
+    return entries
+
+
+class Results:
+    """Latencies and outcomes of the requests of one run"""
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = Counter()
+        self.statuses = Counter()
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, latency, outcome):
+        """outcome is an HTTP status code or the name of the error"""
+        if isinstance(outcome, int):
+            self.statuses[outcome] += 1
+            if outcome < 400:
+                self.latencies.append(latency)
+                return
+        self.errors[str(outcome)] += 1
+
+    def summary(self, offered_rate=None):
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        completed = len(self.latencies)
+        total = completed + sum(self.errors.values())
+        summary = {
+            'requests': total,
+            'errors': dict(self.errors),
+            'error_rate': round(sum(self.errors.values()) / total, 4) if total else 0.0,
+            'throughput_rps': round(completed / elapsed, 1) if elapsed > 0 else 0.0,
+            'duration_s': round(elapsed, 3),
+        }
+        if offered_rate is not None:
+            summary['offered_rps'] = offered_rate
+        if completed:
+            ms = np.asarray(self.latencies) * 1000
+            for q in (50, 90, 99):
+                summary[f'latency_ms_p{q}'] = round(float(np.percentile(ms, q)), 3)
+            summary['latency_ms_max'] = round(float(ms.max()), 3)
+        return summary
+
+
+class ConnectionPool:
+    """Keep-alive HTTP/1.1 connections to one host, at most limit open at once"""
+
+    def __init__(self, host, port, limit=256, timeout=30.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._idle = []
+        self._slots = asyncio.Semaphore(limit)
+
+    async def send(self, request):
+        """Send request and return the response status, raising OSError or TimeoutError"""
+        async with self._slots:
+            while self._idle:
+                # The server may have closed an idle connection since; retry those on a new one
+                connection = self._idle.pop()
+                try:
+                    return await self._send_on(connection, request)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    continue
+            connection = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+            return await self._send_on(connection, request)
+
+    async def _send_on(self, connection, request):
+        try:
+            status, keep_alive = await asyncio.wait_for(self._exchange(connection, request), self.timeout)
+        except BaseException:
+            connection[1].close()
+            raise
+        if keep_alive:
+            self._idle.append(connection)
+        else:
+            connection[1].close()
+        return status
+
+    async def _exchange(self, connection, request):
+        reader, writer = connection
+        head = [f'{request.method} {request.path} HTTP/1.1', f'Host: {self.host}:{self.port}',
+                f'Content-Length: {len(request.body)}']
+        if request.content_type:
+            head.append(f'Content-Type: {request.content_type}')
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode() + request.body)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError('Connection closed by the server')
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                await reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        elif 'content-length' in headers:
+            await reader.readexactly(int(headers['content-length']))
+        else:
+            await reader.read()
+            return status, False
+        return status, headers.get('connection', '').lower() != 'close'
+
+    def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle = []
+
+
+async def _timed(pool, request, due, results):
+    try:
+        outcome = await pool.send(request)
+    except asyncio.TimeoutError:
+        outcome = 'timeout'
+    except (OSError, ValueError, IndexError, asyncio.IncompleteReadError) as e:
+        outcome = type(e).__name__
+    results.record(time.perf_counter() - due, outcome)
+
+
+async def run_schedule(pool, requests, offsets):
+    """Send requests[i] at offsets[i] seconds from now (open loop)"""
+    results = Results()
+    start = results.started
+    tasks = []
+    for request, offset in zip(requests, offsets):
+        due = start + offset
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(_timed(pool, request, due, results)))
+    await asyncio.gather(*tasks)
+    results.finished = time.perf_counter()
+    return results
+
+
+def arrival_offsets(rate, duration, poisson=True, seed=0):
+    """Send times for rate requests/s over duration seconds, exponential gaps when poisson"""
+    count = max(int(rate * duration), 1)
+    if not poisson:
+        return np.arange(count) / rate
+    gaps = np.random.RandomState(seed).exponential(1.0 / rate, count)
+    return np.cumsum(gaps) - gaps[0]
+
+
+async def run_open_loop(pool, requests, rate, duration, poisson=True, seed=0):
+    offsets = arrival_offsets(rate, duration, poisson, seed)
+    return await run_schedule(pool, [requests[i % len(requests)] for i in range(len(offsets))], offsets)
+
+
+async def run_closed_loop(pool, requests, concurrency, duration=None):
+    """concurrency clients sending back to back for duration seconds (or until requests run out)"""
+    results = Results()
+    deadline = results.started + duration if duration else None
+    queue = iter(range(len(requests) if deadline is None else sys.maxsize))
+
+    async def client():
+        for i in queue:
+            now = time.perf_counter()
+            if deadline is not None and now >= deadline:
+                break
+            await _timed(pool, requests[i % len(requests)], now, results)
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    results.finished = time.perf_counter()
+    return results
+
+
+def saturated(summary, slo_ms, max_error_rate):
+    """Whether a run at summary['offered_rps'] was more than the server could sustain"""
+    return (summary['throughput_rps'] < 0.95 * summary['offered_rps'] * (1 - summary['error_rate'])
+            or summary['error_rate'] > max_error_rate
+            or summary.get('latency_ms_p99', float('inf')) > slo_ms)
+
+
+async def run_ramp(pool, requests, rates, duration, slo_ms=100.0, max_error_rate=0.01, report=None):
+    """
+    Open-loop runs at each rate in turn until one saturates the server;
+    returns (summaries, highest sustained rate or None)
+    """
+    summaries, sustained = [], None
+    for rate in rates:
+        summary = (await run_open_loop(pool, requests, rate, duration)).summary(rate)
+        summaries.append(summary)
+        if report is not None:
+            report(summary)
+        if saturated(summary, slo_ms, max_error_rate):
+            break
+        sustained = rate
+    return summaries, sustained
+
+
+def parse_ramp(text):
+    try:
+        start, stop, step = (float(part) for part in text.split(':'))
+    except ValueError:
+        raise argparse.ArgumentTypeError('expected START:STOP:STEP, e.g. 100:1000:100')
+    if start <= 0 or step <= 0 or stop < start:
+        raise argparse.ArgumentTypeError('expected 0 < START <= STOP and STEP > 0')
+    return list(np.arange(start, stop + step / 2, step).round(3))
+
+
+def format_summary(summary):
+    parts = [f"{summary['requests']} requests", f"{summary['throughput_rps']} req/s"]
+    if 'offered_rps' in summary:
+        parts.insert(0, f"offered {summary['offered_rps']} req/s")
+    if 'latency_ms_p50' in summary:
+        parts.append('latency ms p50 {latency_ms_p50} p90 {latency_ms_p90} p99 {latency_ms_p99} '
+                     'max {latency_ms_max}'.format(**summary))
+    parts.append(f"errors {summary['error_rate']:.2%}" + (f" {summary['errors']}" if summary['errors'] else ''))
+    return ', '.join(parts)
+
+
+async def run(args, host, port):
+    pool = ConnectionPool(host, port, args.connections, args.timeout)
+    # A replayed log is sent once through unless a duration is given
+    duration = args.duration or (None if args.replay else 10.0)
+    try:
+        if args.replay:
+            entries = read_log(args.replay, args.endpoint)
+            if not entries:
+                raise ValueError(f'{args.replay} holds no requests')
+            requests = [request for _, request in entries]
+            offsets = [offset for offset, _ in entries]
+            if args.rate is None and args.concurrency is None and args.ramp is None \
+                    and all(offset is not None for offset in offsets):
+                first = min(offsets)
+                results = await run_schedule(pool, requests, [(offset - first) / args.speed for offset in offsets])
+                return {'mode': 'replay', 'summary': results.summary()}
+        else:
+            n_requests = max(int((args.rate or 0) * duration), 10000)
+            requests = dataset_requests(args.dataset, args.endpoint, args.batch_size, n_requests, args.seed)
+            random.Random(args.seed).shuffle(requests)
+
+        if args.ramp:
+            summaries, sustained = await run_ramp(
+                pool, requests, args.ramp, duration or 10.0, args.slo_ms, args.max_error_rate,
+                report=None if args.json else lambda summary: print(format_summary(summary)))
+            return {'mode': 'ramp', 'steps': summaries, 'saturation_rps': sustained}
+        if args.rate is not None:
+            results = await run_open_loop(pool, requests, args.rate, duration or 10.0, seed=args.seed)
+            return {'mode': 'open', 'summary': results.summary(args.rate)}
+        results = await run_closed_loop(pool, requests, args.concurrency or 1, duration)
+        return {'mode': 'closed', 'summary': results.summary()}
+    finally:
+        pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate load against a locally running instance')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='instance to load')
+    parser.add_argument('--serve', action='store_true', help='start gunicorn on a free local port instead')
+    parser.add_argument('--model', help='model --serve loads (default: what app.py serves)')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers started by --serve')
+    parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), default='predict', help='route to drive')
+    parser.add_argument('--batch-size', type=int, default=1, help='rows per /api/v1/predict request')
+    parser.add_argument('--dataset', default='Zomato_df.csv', help='rows requests are sampled from')
+    parser.add_argument('--replay', help='JSON lines request log to replay instead')
+    parser.add_argument('--speed', type=float, default=1.0, help='replay speed-up of recorded timings')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--rate', type=float, help='open loop: requests per second')
+    mode.add_argument('--concurrency', type=int, help='closed loop: concurrent clients')
+    mode.add_argument('--ramp', type=parse_ramp, help='open loop at increasing rates START:STOP:STEP')
+    parser.add_argument('--duration', type=float, help='seconds per run or ramp step (default 10)')
+    parser.add_argument('--connections', type=int, default=256, help='maximum open connections')
+    parser.add_argument('--timeout', type=float, default=30.0, help='seconds before a request fails')
+    parser.add_argument('--slo-ms', type=float, default=100.0, help='p99 latency a ramp step must meet')
+    parser.add_argument('--max-error-rate', type=float, default=0.01, help='error rate a ramp step must meet')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the request sample')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+    if args.batch_size < 1 or (args.batch_size > 1 and args.endpoint != 'api'):
+        parser.error('--batch-size applies to --endpoint api and must be at least 1')
+    if args.speed <= 0 or min(args.duration or 1, args.rate or 1, args.concurrency or 1) <= 0:
+        parser.error('--speed, --duration, --rate and --concurrency must be positive')
+
+    server = None
+    try:
+        if args.serve:
+            model_path = args.model or os.environ.get('ZOMATO_MODEL_PATH') or 'model.pkl'
+            server, port = benchmark.start_server(model_path, args.workers)
+            host = '127.0.0.1'
+        else:
+            url = urllib.parse.urlsplit(args.url)
+            host, port = url.hostname or '127.0.0.1', url.port or 80
+        report = asyncio.run(run(args, host, port))
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"Error generating load: {e}")
+        sys.exit(1)
+    finally:
+        if server is not None:
+            benchmark.stop_server(server)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    elif report['mode'] == 'ramp':
+        sustained = report['saturation_rps']
+        print(f"Saturation point: {sustained} req/s" if sustained is not None
+              else 'Saturated at the first rate; lower the ramp start')
+    else:
+        print(format_summary(report['summary']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""
+Prometheus metrics without a client library
+
+Counters, gauges and histograms are recorded into per-thread shards: each
+thread updates its own dict with no lock, and only the first update of a
+new thread takes the registry-wide lock to register its shard. When a
+thread exits its shard is folded into a shared total, so the shards stay
+as many as the live threads. A scrape copies every shard and sums them,
+so recording stays cheap however many request threads are running.
+Values that already live elsewhere (cache statistics, the model version)
+are read at scrape time through Registry.collector() callbacks instead
+of being mirrored on every request.
+
+Every process keeps its own metrics: behind a pre-fork server each worker
+reports the requests it served.
+"""
+import bisect
+import math
+import threading
+import weakref
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow batches
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Rows per forest call: powers of two up to the default batch row limit
+BATCH_SIZE_BUCKETS = tuple(2 ** i for i in range(15))
+
+
+class ThreadExit:
+    """Stored next to a shard in thread-local storage, freed when the thread ends"""
+    __slots__ = ('__weakref__',)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._registry = registry
+        self._local = threading.local()
+        self._shards = []
+        # Everything recorded by threads that have exited
+        self._retired = {}
+
+    def _shard(self):
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            self._local.exit = ThreadExit()
+            weakref.finalize(self._local.exit, self._retire, values).atexit = False
+            with self._registry.lock:
+                self._shards.append(values)
+            return values
+
+    def _retire(self, values):
+        with self._registry.lock:
+            self._shards = [shard for shard in self._shards if shard is not values]
+            self._fold(self._retired, values)
+
+    def _merged(self):
+        with self._registry.lock:
+            shards = [shard.copy() for shard in self._shards]
+            retired = {}
+            self._fold(retired, self._retired)
+        return shards + [retired]
+
+    def _fold(self, totals, shard):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        values = self._shard()
+        values[labels] = values.get(labels, 0) + amount
+
+    def _fold(self, totals, shard):
+        for labels, value in shard.items():
+            totals[labels] = totals.get(labels, 0) + value
+
+    def samples(self):
+        totals = {} if self.labelnames else {(): 0}
+        for shard in self._merged():
+            self._fold(totals, shard)
+        for labels, value in sorted(totals.items()):
+            yield self.name, self.labelnames, labels, value
+
+
+class Gauge(Counter):
+    """Summed across threads, so inc() and dec() may happen on different ones"""
+    kind = 'gauge'
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        values = self._shard()
+        counts = values.get(labels)
+        if counts is None:
+            # One slot per bucket, one for +Inf, then the sum
+            counts = values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def _fold(self, totals, shard):
+        for labels, counts in shard.items():
+            total = totals.setdefault(labels, [0] * len(counts))
+            for i, count in enumerate(list(counts)):
+                total[i] += count
+
+    def samples(self):
+        totals = {} if self.labelnames else {(): [0] * (len(self.buckets) + 1) + [0.0]}
+        for shard in self._merged():
+            self._fold(totals, shard)
+        names = self.labelnames + ('le',)
+        for labels, counts in sorted(totals.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield self.name + '_bucket', names, labels + (_format_value(bound),), cumulative
+            yield self.name + '_sum', self.labelnames, labels, counts[-1]
+            yield self.name + '_count', self.labelnames, labels, cumulative
+
+
+class Registry:
+    """Metrics of this process, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, collect):
+        """
+        Register collect(), called on every scrape, returning
+        (name, type, help, [(labels dict, value), ...]) tuples
+        """
+        self._collectors.append(collect)
+        return collect
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labelnames, labels, value in metric.samples():
+                lines.append(f'{name}{_format_labels(labelnames, labels)} {_format_value(value)}')
+        for collect in self._collectors:
+            for name, kind, documentation, samples in collect():
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(names, values):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return str(value)
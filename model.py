@@ -6,12 +6,18 @@ from sklearn.ensemble import ExtraTreesRegressor
 from sklearn.model_selection import train_test_split
 import os
 
+from artifact import save_forest
+from forest import FlatForest
+
 import warnings
 warnings.filterwarnings('ignore')
 
 # Check if dataset exists, if not create dummy data
-if os.path.exists('zomato_df.csv'):
-    df = pd.read_csv('zomato_df.csv')
+if os.path.exists('Zomato_df.csv'):
+    # Parsed once into the typed columnar cache in Zomato_df.cache/ (see
+    # dataset.py); later runs memory-map the cached columns
+    from dataset import load_frame
+    df = load_frame('Zomato_df.csv')
     print("Using existing dataset")
 else:
     print("Dataset not found, creating dummy data for model training...")
@@ -34,9 +40,9 @@ else:
     df = pd.DataFrame(data)
     print("Dummy dataset created")
 
-# Drop 'Unnamed: 0' column if it exists
-if 'Unnamed: 0' in df.columns:
-    df.drop('Unnamed: 0', axis=1, inplace=True)
+# The dataset's index column identifies restaurants and is not a feature
+if 'restaurant_id' in df.columns:
+    df = df.drop('restaurant_id', axis=1)
 
 print(df.head())
 x=df.drop('rate',axis=1)
@@ -56,5 +62,9 @@ y_predict=ET_Model.predict(x_test)
 import pickle
 # # Saving model to disk
 pickle.dump(ET_Model, open('model.pkl','wb'))
+
+# Standalone forest artifact: loads by memory map with NumPy only, no
+# sklearn import or unpickling (served with ZOMATO_MODEL_PATH=model.forest)
+save_forest(FlatForest.from_sklearn(ET_Model), 'model.forest')
 model=pickle.load(open('model.pkl','rb'))
 print(y_predict)
@@ -0,0 +1,150 @@
+"""
+Loading, validation, warm-up and hot reloading of the model artifact
+"""
+import os
+import pickle
+import threading
+import time
+
+import numpy as np
+
+from artifact import is_forest_artifact, load_forest
+from features import FEATURE_DTYPE, FEATURE_NAMES
+from forest import compile_model
+
+
+class InvalidModelError(ValueError):
+    """Raised when a freshly loaded model fails validation"""
+
+
+def load_model(path, engine='flat', mmap=True):
+    """
+    Load a trained model: a forest artifact (see artifact.py) is loaded as a
+    FlatForest whatever the engine, memory-mapped unless mmap is false; a
+    pickle is unpickled and compiled to the flat engine (which keeps the
+    sklearn model for large matrices) unless engine='sklearn'
+    """
+    if is_forest_artifact(path):
+        return load_forest(path, mmap=mmap)
+    with open(path, 'rb') as f:
+        model = pickle.load(f)
+    if engine == 'flat':
+        model = compile_model(model)
+    return model
+
+
+def artifact_signature(path):
+    """Cheap identity of the file on disk, used to notice that it changed"""
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def artifact_version(path):
+    """Short human-readable version string for the artifact at path"""
+    mtime_ns, size = artifact_signature(path)
+    return f'{os.path.basename(path)}@{mtime_ns // 1_000_000_000}:{size}'
+
+
+def warmup_matrix(n_rows=16, seed=0):
+    """Deterministic feature rows spanning typical value ranges"""
+    rng = np.random.RandomState(seed)
+    upper = {'online_order': 2, 'book_table': 2, 'votes': 5000, 'cost': 3000}
+    columns = [rng.randint(0, upper.get(name, 100), n_rows) for name in FEATURE_NAMES]
+    return np.ascontiguousarray(np.column_stack(columns), dtype=FEATURE_DTYPE)
+
+
+def warm_up(model, n_rows=16):
+    """
+    Run a batch and a single-row prediction through the model, raising
+    InvalidModelError if it does not return one finite rating per row.
+
+    Besides validating the model this pays NumPy's and sklearn's lazy
+    first-call costs before real traffic does.
+    """
+    if not hasattr(model, 'predict'):
+        raise InvalidModelError('Model has no predict method')
+    X = warmup_matrix(max(n_rows, 1))
+    try:
+        batch = np.asarray(model.predict(X), dtype=float)
+        single = np.asarray(model.predict(X[:1]), dtype=float)
+    except Exception as e:
+        raise InvalidModelError(f'Warm-up prediction failed: {e}') from e
+    if batch.shape != (len(X),) or single.shape != (1,):
+        raise InvalidModelError('Model returned the wrong number of predictions')
+    if not np.isfinite(batch).all() or not np.isfinite(single).all():
+        raise InvalidModelError('Model returned non-finite predictions')
+
+
+class ModelReloader:
+    """
+    Loads a new model artifact in the background and hands it to ``install``.
+
+    A candidate is only installed after it loaded and passed warm_up(), so a
+    broken or half-written artifact never replaces a working model. With
+    ``poll_interval`` > 0 a watcher thread reloads whenever the file's
+    mtime or size changes and has stayed unchanged for one more interval.
+    """
+
+    def __init__(self, path, install, loader=load_model, poll_interval=0, warmup_rows=16):
+        self.path = path
+        self.install = install
+        self.loader = loader
+        self.poll_interval = poll_interval
+        self.warmup_rows = warmup_rows
+        self.last_error = None
+        self.reloads = 0
+        self.failures = 0
+        self._signature = self._current_signature()
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._watcher_pid = None
+
+    def reload(self):
+        """Load, validate and install the artifact; returns (installed, message)"""
+        with self._reload_lock:
+            signature = self._current_signature()
+            try:
+                candidate = self.loader(self.path)
+                warm_up(candidate, self.warmup_rows)
+            except Exception as e:
+                self.failures += 1
+                self.last_error = f'{type(e).__name__}: {e}'
+                # Remember the broken file so the watcher does not retry it
+                # on every poll; a new write changes the signature again
+                self._signature = signature
+                return False, self.last_error
+
+            version = artifact_version(self.path)
+            self.install(candidate, version)
+            self._signature = signature
+            self.reloads += 1
+            self.last_error = None
+            return True, version
+
+    def start_watching(self):
+        """Start the polling thread in this process, once"""
+        if self.poll_interval <= 0:
+            return
+        if self._watcher_pid == os.getpid() and self._watcher.is_alive():
+            return
+        self._watcher = threading.Thread(target=self._watch, name='model-watcher', daemon=True)
+        self._watcher.start()
+        self._watcher_pid = os.getpid()
+
+    def _watch(self):
+        previous = self._current_signature()
+        while True:
+            time.sleep(self.poll_interval)
+            signature = self._current_signature()
+            # Wait until the file stopped changing between two polls, so a
+            # copy still in progress is not picked up
+            if signature is not None and signature == previous and signature != self._signature:
+                ok, message = self.reload()
+                print(f"Model reload {'succeeded' if ok else 'failed'}: {message}")
+            previous = signature
+
+    def _current_signature(self):
+        try:
+            return artifact_signature(self.path)
+        except OSError:
+            return None
@@ -0,0 +1,178 @@
+"""
+Materialized predictions for every restaurant in the feature store
+
+Most queries are for restaurants of the training table with their stored
+features unchanged. A PredictionTable scores every row of a FeatureStore
+once with a given model and indexes the predictions by the exact bytes of
+each float32 feature row, so a request row that matches a known vector is
+answered with one dict lookup; only novel vectors are sent to the forest.
+
+PredictionTableKeeper keeps the table in step with the served model and
+store: a new model triggers a full rebuild in a background thread, a new
+store only rescores the feature vectors the previous table did not hold.
+Until the new table is ready, requests fall through to the forest.
+"""
+import os
+import threading
+
+import numpy as np
+
+from features import FEATURE_DTYPE, FEATURE_NAMES
+
+# Rows scored per model call while building a table
+BUILD_CHUNK_ROWS = 8192
+
+_ROW_BYTES = np.dtype(FEATURE_DTYPE).itemsize * len(FEATURE_NAMES)
+
+
+def row_keys(features):
+    """Hashable key (the raw bytes) of each row of an (n, 8) feature matrix"""
+    features = np.ascontiguousarray(features, dtype=FEATURE_DTYPE)
+    return features.view(f'V{_ROW_BYTES}').ravel().tolist()
+
+
+def _predict(model, features):
+    return model.predict(features)
+
+
+class PredictionTable:
+    """Predictions of one model for every feature vector of one store"""
+
+    def __init__(self, model, store, predictions):
+        self.model = model
+        self.store = store
+        self.predictions = np.asarray(predictions, dtype=np.float64)
+        self.predictions.flags.writeable = False
+        self._index = dict(zip(row_keys(store.features), range(len(store))))
+
+    @classmethod
+    def build(cls, model, store, score=_predict, chunk_rows=BUILD_CHUNK_ROWS):
+        """Score every row of store with model, chunk_rows rows per call"""
+        return cls(model, store, _score_rows(model, store.features, score, chunk_rows))
+
+    def update(self, store, score=_predict, chunk_rows=BUILD_CHUNK_ROWS):
+        """
+        Table of the same model for a new store, reusing the predictions of
+        feature vectors this table already holds; returns (table, rows scored)
+        """
+        positions = np.array(self.positions(store.features), dtype=np.int64)
+        novel = np.flatnonzero(positions < 0)
+        predictions = np.empty(len(store), dtype=np.float64)
+        known = positions >= 0
+        predictions[known] = self.predictions[positions[known]]
+        if len(novel):
+            predictions[novel] = _score_rows(self.model, store.features[novel], score, chunk_rows)
+        return PredictionTable(self.model, store, predictions), len(novel)
+
+    def __len__(self):
+        return len(self.predictions)
+
+    def positions(self, features):
+        """Table position of each feature row, -1 for vectors it does not hold"""
+        get = self._index.get
+        return [get(key, -1) for key in row_keys(features)]
+
+    def get(self, row):
+        """Prediction for one feature row, or None when the vector is novel"""
+        position = self._index.get(np.asarray(row, dtype=FEATURE_DTYPE).tobytes())
+        return None if position is None else float(self.predictions[position])
+
+    def predict(self, features, score):
+        """
+        Predictions for a feature matrix: known vectors from the table, the
+        others from score(novel_rows) in a single call
+        """
+        positions = np.array(self.positions(features), dtype=np.int64)
+        novel = positions < 0
+        if not novel.any():
+            return self.predictions[positions]
+        predictions = np.empty(len(positions), dtype=np.float64)
+        predictions[~novel] = self.predictions[positions[~novel]]
+        predictions[novel] = score(np.ascontiguousarray(features[novel]))
+        return predictions
+
+
+def _score_rows(model, features, score, chunk_rows):
+    predictions = np.empty(len(features), dtype=np.float64)
+    for start in range(0, len(features), chunk_rows):
+        chunk = np.ascontiguousarray(features[start:start + chunk_rows])
+        predictions[start:start + len(chunk)] = score(model, chunk)
+    return predictions
+
+
+class PredictionTableKeeper:
+    """
+    Holds the PredictionTable of the current model and store, building the
+    next one in a background thread whenever either changes
+    """
+
+    def __init__(self, score=_predict, chunk_rows=BUILD_CHUNK_ROWS):
+        self.score = score
+        self.chunk_rows = chunk_rows
+        self.table = None
+        self.last_error = None
+        self.builds = 0
+        self.updates = 0
+        self.rows_scored = 0
+        self._target = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def current(self, model, store):
+        """The table for model and store, or None while it is not built"""
+        table = self.table
+        if table is not None and table.model is model and table.store is store:
+            return table
+        return None
+
+    def refresh(self, model, store, wait=False):
+        """
+        Start building the table for model and store unless it exists or
+        this process is already building it; with wait, block until done
+        """
+        if model is None or store is None or self.current(model, store) is not None:
+            return
+        with self._lock:
+            target = (model, store, os.getpid())
+            thread = self._thread
+            if self._target != target or thread is None:
+                self._target = target
+                thread = self._thread = threading.Thread(
+                    target=self._build, args=(model, store), name='prediction-table', daemon=True)
+                thread.start()
+        if wait:
+            thread.join()
+
+    def _build(self, model, store):
+        try:
+            previous = self.table
+            if previous is not None and previous.model is model:
+                table, scored = previous.update(store, self.score, self.chunk_rows)
+                updated = True
+            else:
+                table = PredictionTable.build(model, store, self.score, self.chunk_rows)
+                scored, updated = len(table), False
+        except Exception as e:
+            self.last_error = f'{type(e).__name__}: {e}'
+            print(f"Prediction table build failed: {e}")
+            return
+        with self._lock:
+            if self._target is None or self._target[:2] != (model, store):
+                return  # superseded by a newer model or store
+            self.table = table
+            self.last_error = None
+            self.rows_scored += scored
+            if updated:
+                self.updates += 1
+            else:
+                self.builds += 1
+
+    def stats(self):
+        table = self.table
+        return {
+            'rows': len(table) if table is not None else 0,
+            'builds': self.builds,
+            'incremental_updates': self.updates,
+            'rows_scored': self.rows_scored,
+            'last_error': self.last_error,
+        }
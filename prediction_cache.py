@@ -0,0 +1,91 @@
+"""
+Bounded in-process LRU cache for single-row predictions
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class PredictionCache:
+    """
+    LRU cache of predictions keyed on the normalized feature tuple.
+
+    Entries belong to one model: passing a different ``model`` object to
+    get_or_compute() drops every cached prediction. Concurrent misses for the
+    same key are coalesced so that only one caller evaluates the forest and
+    the others wait for its result.
+    """
+
+    def __init__(self, maxsize=4096):
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._model = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_compute(self, key, compute, model):
+        """Return the cached prediction for key, calling compute() on a miss"""
+        flight_key = (id(model), key)
+        with self._lock:
+            if model is not self._model:
+                self._entries.clear()
+                self._model = model
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+            flight = self._in_flight.get(flight_key)
+            if flight is not None:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+                own_flight = self._in_flight[flight_key] = Future()
+
+        if flight is not None:
+            return flight.result()
+        return self._compute(key, flight_key, own_flight, compute, model)
+
+    def _compute(self, key, flight_key, flight, compute, model):
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[flight_key]
+            flight.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._in_flight[flight_key]
+            if model is self._model:
+                self._entries[key] = value
+                if len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        flight.set_result(value)
+        return value
+
+    def clear(self):
+        """Drop all cached predictions; in-flight computations still complete"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Snapshot of the cache counters"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'hit_ratio': (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,204 @@
+"""
+Buffered prediction log for auditing and retraining
+
+Request handlers call PredictionLog.record(), which only appends a tuple of
+references (the feature rows, the predictions, the model version and the
+latency) to an in-memory ring buffer. A background thread wakes every
+``flush_interval`` seconds, turns what accumulated into JSON lines and
+appends them to the current log file:
+
+    {"time": 1700000000.123, "endpoint": "predict_batch", "model_version": "model.forest@...",
+     "latency_ms": 2.41, "features": [[1, 0, 775, ...], ...], "predictions": [4.1, ...]}
+
+``features`` holds one row per prediction, in FEATURE_NAMES order. Files are
+rotated once they reach ``max_bytes`` or are ``rotate_seconds`` old, and
+gzip-compressed after rotation when ``compress`` is set. Each process
+writes its own files, named after the time they were opened and the pid.
+
+The buffer holds at most ``capacity`` requests. When the writer cannot keep
+up, the oldest entries are overwritten and counted in ``dropped``: logging
+never blocks a request and never grows memory without bound. Write errors
+are counted and the entries concerned dropped.
+"""
+import glob
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class PredictionLog:
+    """Ring buffer of predictions drained to rotated JSONL files by a background thread"""
+
+    def __init__(self, directory, max_bytes=64 << 20, rotate_seconds=3600, compress=False,
+                 capacity=65536, flush_interval=1.0, prefix='predictions'):
+        if capacity < 1:
+            raise ValueError('capacity must be at least 1')
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.compress = compress
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.prefix = prefix
+        self.written = 0
+        self.dropped = 0
+        self.write_errors = 0
+        self.files = 0
+        self._buffer = deque(maxlen=capacity)
+        self._drop_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._file = None
+        self._path = None
+        self._opened = None
+        self._sequence = 0
+
+    def record(self, endpoint, features, predictions, latency_ms=None, model_version=None):
+        """
+        Queue one request's predictions; features is a row or a matrix of rows.
+        Neither may be modified afterwards: they are serialized later.
+        """
+        if self._pid != os.getpid():
+            self._start()
+        buffer = self._buffer
+        if len(buffer) == self.capacity:
+            with self._drop_lock:
+                self.dropped += 1
+        buffer.append((time.time(), endpoint, model_version, latency_ms, features, predictions))
+
+    def _start(self):
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # Entries and the open file inherited through fork() belong to the parent
+            self._buffer.clear()
+            self._file = None
+            self._stop = threading.Event()
+            self._pid = os.getpid()
+            os.makedirs(self.directory, exist_ok=True)
+            self._thread = threading.Thread(target=self._run, name='prediction-log', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of requests written"""
+        with self._write_lock:
+            entries = []
+            buffer = self._buffer
+            while buffer:
+                try:
+                    entries.append(buffer.popleft())
+                except IndexError:
+                    break
+            try:
+                if self._file is not None and self._due_for_rotation():
+                    self._rotate()
+                if not entries:
+                    return 0
+                if self._file is None:
+                    self._open()
+                self._file.write(''.join(_line(entry) for entry in entries))
+                self._file.flush()
+                if self._file.tell() >= self.max_bytes:
+                    self._rotate()
+            except (OSError, TypeError, ValueError) as e:
+                self.write_errors += 1
+                with self._drop_lock:
+                    self.dropped += len(entries)
+                print(f"Error writing prediction log: {e}")
+                return 0
+            self.written += len(entries)
+            return len(entries)
+
+    def _due_for_rotation(self):
+        return self.rotate_seconds and time.time() - self._opened >= self.rotate_seconds
+
+    def _open(self):
+        self._sequence += 1
+        name = f'{self.prefix}-{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-{self._sequence}.jsonl'
+        self._path = os.path.join(self.directory, name)
+        self._file = open(self._path, 'a', encoding='utf-8')
+        self._opened = time.time()
+        self.files += 1
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        if self.compress:
+            with open(self._path, 'rb') as source, gzip.open(self._path + '.gz', 'wb') as target:
+                shutil.copyfileobj(source, target)
+            os.remove(self._path)
+
+    def close(self):
+        """Stop the writer, flush what is left and close (and compress) the current file"""
+        thread = self._thread
+        if thread is not None and self._pid == os.getpid():
+            self._stop.set()
+            thread.join()
+            self._thread = None
+        self.flush()
+        with self._write_lock:
+            if self._file is not None:
+                self._rotate()
+
+    def stats(self):
+        return {
+            'queued': len(self._buffer),
+            'capacity': self.capacity,
+            'written': self.written,
+            'dropped': self.dropped,
+            'write_errors': self.write_errors,
+            'files': self.files,
+        }
+
+
+def _line(entry):
+    timestamp, endpoint, model_version, latency_ms, features, predictions = entry
+    # Single rows from /predict arrive as a list of numbers and a float,
+    # which are much cheaper to serialize without a round trip through NumPy
+    if isinstance(features, list) and features and not isinstance(features[0], (list, np.ndarray)):
+        rows = [features]
+    else:
+        features = np.asarray(features)
+        rows = (features.reshape(1, -1) if features.ndim == 1 else features).tolist()
+    if isinstance(predictions, (float, int)):
+        predictions = [float(predictions)]
+    else:
+        predictions = np.atleast_1d(np.asarray(predictions, dtype=float)).tolist()
+    record = {
+        'time': round(timestamp, 6),
+        'endpoint': endpoint,
+        'model_version': model_version,
+        'latency_ms': None if latency_ms is None else round(latency_ms, 3),
+        'features': rows,
+        'predictions': predictions,
+    }
+    return json.dumps(record, separators=(',', ':')) + '\n'
+
+
+def log_files(directory, prefix='predictions'):
+    """Log files in directory, oldest first (plain and compressed)"""
+    paths = glob.glob(os.path.join(directory, f'{prefix}-*.jsonl')) + \
+        glob.glob(os.path.join(directory, f'{prefix}-*.jsonl.gz'))
+    return sorted(paths, key=os.path.getmtime)
+
+
+def read_records(path):
+    """Records of one log file, plain or gzip-compressed"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Turn the raw Kaggle zomato.csv dump into the encoded training table
+
+This is the feature engineering of Zomato.ipynb as an importable pipeline:
+
+* drop exact duplicate listings (ignoring ``url`` and ``phone``), then
+  listings with any missing value
+* ``rate``: strip ``/5`` and drop unrated listings (``NEW``, ``-``)
+* ``approx_cost(for two people)`` -> ``cost`` without thousands separators
+* ``online_order`` / ``book_table``: Yes/No -> 1/0
+* ``location``, ``rest_type``, ``cuisines``, ``menu_item``: label-encoded
+  with a separate vocabulary per column, saved next to the table
+
+The dump is read in chunks with vectorized string operations. The long
+text columns (``reviews_list``, ``dish_liked``, ...) are only hashed for
+duplicate detection and never kept, so memory stays bounded by the chunk
+size plus the categorical vocabularies. Codes are assigned the way
+sklearn's LabelEncoder does (position in the sorted vocabulary), so the
+output matches the table the notebook wrote to Zomato_df.csv.
+
+    python preprocessing.py zomato.csv --output Zomato_df.csv
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+# Columns of the raw dump that the notebook dropped before anything else
+DROPPED_COLUMNS = ['url', 'phone']
+
+RENAMES = {
+    'approx_cost(for two people)': 'cost',
+    'listed_in(type)': 'type',
+    'listed_in(city)': 'city',
+}
+
+CATEGORICAL_COLUMNS = ['location', 'rest_type', 'cuisines', 'menu_item']
+
+# Columns of the training table, in the order the notebook saved them
+OUTPUT_COLUMNS = [
+    'online_order', 'book_table', 'rate', 'votes', 'location',
+    'rest_type', 'cuisines', 'cost', 'menu_item'
+]
+
+_YES_NO = {'Yes': 1, 'No': 0}
+
+
+def clean_chunk(chunk):
+    """
+    Convert the numeric and Yes/No columns of a chunk of raw listings
+    (already renamed, duplicates and incomplete rows removed), dropping
+    listings whose rating, cost or votes is not a number
+    """
+    cleaned = chunk[CATEGORICAL_COLUMNS].copy()
+    cleaned['online_order'] = chunk['online_order'].map(_YES_NO)
+    cleaned['book_table'] = chunk['book_table'].map(_YES_NO)
+    cleaned['rate'] = _to_number(chunk['rate'].str.replace('/5', '', regex=False))
+    cleaned['votes'] = _to_number(chunk['votes'])
+    cleaned['cost'] = _to_number(chunk['cost'].str.replace(',', '', regex=False))
+    return cleaned.dropna(subset=['online_order', 'book_table', 'rate', 'votes', 'cost'])
+
+
+def _to_number(values):
+    import pandas as pd
+    return pd.to_numeric(values.str.strip(), errors='coerce')
+
+
+class VocabularyBuilder:
+    """
+    Collects the distinct values of one categorical column across chunks.
+
+    Values get provisional codes in order of first appearance; finish()
+    returns the sorted vocabulary and the table mapping provisional codes
+    to positions in it.
+    """
+
+    def __init__(self):
+        self.codes = {}
+
+    def encode(self, values):
+        for value in values.unique():
+            self.codes.setdefault(value, len(self.codes))
+        return values.map(self.codes).to_numpy(dtype=np.int64)
+
+    def finish(self):
+        vocabulary = sorted(self.codes)
+        remap = np.empty(len(vocabulary), dtype=np.int64)
+        for position, value in enumerate(vocabulary):
+            remap[self.codes[value]] = position
+        return vocabulary, remap
+
+
+def preprocess(raw_path, output_path='Zomato_df.csv', vocab_path='vocabularies.json', chunk_rows=10000):
+    """
+    Run the pipeline on raw_path, writing the encoded table to output_path
+    and the per-column vocabularies to vocab_path; returns row counts
+    """
+    import pandas as pd
+
+    builders = {column: VocabularyBuilder() for column in CATEGORICAL_COLUMNS}
+    seen = set()
+    parts = []
+    stats = {'rows_read': 0, 'duplicates': 0, 'incomplete': 0, 'invalid': 0}
+
+    reader = pd.read_csv(raw_path, dtype=str, chunksize=chunk_rows,
+                         usecols=lambda column: column not in DROPPED_COLUMNS)
+    for chunk in reader:
+        stats['rows_read'] += len(chunk)
+        chunk = chunk.rename(columns=RENAMES)
+
+        # drop_duplicates() over every column, streamed: keep a row only on
+        # the first occurrence of its content hash in the whole file
+        hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+        first = ~pd.Series(hashes).duplicated().to_numpy()
+        first &= np.fromiter((h not in seen for h in hashes), dtype=bool, count=len(hashes))
+        seen.update(hashes[first].tolist())
+        stats['duplicates'] += int((~first).sum())
+        chunk = chunk[first]
+
+        complete = chunk.notna().all(axis=1)
+        stats['incomplete'] += int((~complete).sum())
+        cleaned = clean_chunk(chunk[complete])
+        stats['invalid'] += int(complete.sum()) - len(cleaned)
+
+        for column, builder in builders.items():
+            cleaned[column] = builder.encode(cleaned[column])
+        parts.append(cleaned[OUTPUT_COLUMNS].astype({
+            'online_order': np.int8, 'book_table': np.int8, 'votes': np.int64,
+        }))
+
+    table = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=OUTPUT_COLUMNS)
+    vocabularies = {}
+    for column, builder in builders.items():
+        vocabularies[column], remap = builder.finish()
+        table[column] = remap[table[column].to_numpy(dtype=np.int64)]
+
+    _write_atomically(output_path, lambda path: table.to_csv(path))
+    save_vocabularies(vocabularies, vocab_path)
+    stats['rows_written'] = len(table)
+    stats['vocabulary_sizes'] = {column: len(values) for column, values in vocabularies.items()}
+    return stats
+
+
+def save_vocabularies(vocabularies, path):
+    """Write {column: [values in code order]} as JSON"""
+    def write(tmp_path):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(vocabularies, f, ensure_ascii=False)
+    _write_atomically(path, write)
+
+
+def load_vocabularies(path='vocabularies.json'):
+    """The saved vocabularies, {column: [values in code order]}"""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_atomically(path, write):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the training table from the raw zomato.csv dump')
+    parser.add_argument('raw', help='raw Kaggle dump, e.g. zomato.csv')
+    parser.add_argument('--output', default='Zomato_df.csv', help='encoded training table')
+    parser.add_argument('--vocabularies', default='vocabularies.json', help='categorical vocabularies')
+    parser.add_argument('--chunk-rows', type=int, default=10000, help='raw rows parsed at a time')
+    args = parser.parse_args()
+
+    try:
+        stats = preprocess(args.raw, args.output, args.vocabularies, args.chunk_rows)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error preprocessing {args.raw}: {e}")
+        sys.exit(1)
+
+    print(f"Read {stats['rows_read']} listings: {stats['duplicates']} duplicates, "
+          f"{stats['incomplete']} with missing values, {stats['invalid']} unrated or invalid")
+    print(f"Wrote {stats['rows_written']} rows to {args.output}, vocabularies to {args.vocabularies}")
+    for column, size in stats['vocabulary_sizes'].items():
+        print(f"  {column:<12}{size} values")
+
+
+if __name__ == '__main__':
+    main()
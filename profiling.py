@@ -0,0 +1,178 @@
+"""
+On-demand profiling of live requests
+
+A ProfileSession captures either the next N matching requests or every
+matching request during a time window, in one of two modes:
+
+* ``cprofile``: deterministic cProfile of each request's thread, merged
+  into one pstats.Stats. Requests are profiled one at a time (cProfile
+  cannot follow several threads at once); requests arriving while another
+  is being profiled are served normally and not counted.
+* ``sample``: a background thread samples the stacks of the threads
+  handling matching requests every ``interval`` seconds and counts them as
+  collapsed stacks (``outer;inner;leaf count``), the input format of
+  flamegraph.pl and speedscope.
+
+The app only holds a session while an admin asked for one, so when idle
+profiling costs one global lookup per request.
+"""
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+MODES = ('cprofile', 'sample')
+
+# Output formats available for each mode
+FORMATS = {'cprofile': ('pstats', 'text'), 'sample': ('collapsed',)}
+
+MIMETYPES = {'pstats': 'application/octet-stream', 'text': 'text/plain', 'collapsed': 'text/plain'}
+EXTENSIONS = {'pstats': 'pstats', 'text': 'txt', 'collapsed': 'collapsed'}
+
+
+class ProfileSession:
+    """Profile of the next ``requests`` matching requests, or of ``seconds`` of traffic"""
+
+    def __init__(self, mode='cprofile', requests=None, seconds=None, endpoints=None, interval=0.005):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        if (requests is None) == (seconds is None):
+            raise ValueError('Give either a number of requests or a number of seconds')
+        if requests is not None and requests < 1:
+            raise ValueError('requests must be at least 1')
+        if seconds is not None and seconds <= 0:
+            raise ValueError('seconds must be positive')
+        if interval <= 0:
+            raise ValueError('interval must be positive')
+        self.mode = mode
+        self.requests = requests
+        self.seconds = seconds
+        self.endpoints = set(endpoints) if endpoints else None
+        self.interval = interval
+        self.started = time.monotonic()
+        self.captured = 0
+        self.samples = 0
+        self._begun = 0
+        self._stats = None
+        self._stacks = Counter()
+        self._threads = set()
+        self._profiling = False
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._sampler = None
+        if mode == 'sample':
+            self._sampler = threading.Thread(target=self._sample, name='profile-sampler', daemon=True)
+            self._sampler.start()
+
+    @property
+    def done(self):
+        if not self._done.is_set() and self.seconds is not None \
+                and time.monotonic() - self.started >= self.seconds:
+            self._done.set()
+        return self._done.is_set()
+
+    def begin(self, endpoint):
+        """Start capturing the current request if it matches; returns a token for end()"""
+        if self.endpoints is not None and endpoint not in self.endpoints:
+            return None
+        with self._lock:
+            if self.done or (self.requests is not None and self._begun >= self.requests):
+                return None
+            if self.mode == 'cprofile':
+                if self._profiling:
+                    return None
+                self._profiling = True
+            self._begun += 1
+            if self.mode == 'sample':
+                self._threads.add(threading.get_ident())
+                return threading.get_ident()
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def end(self, token):
+        """Stop capturing the request begin() returned token for"""
+        if isinstance(token, cProfile.Profile):
+            token.disable()
+        with self._lock:
+            if isinstance(token, cProfile.Profile):
+                self._profiling = False
+                if self._stats is None:
+                    self._stats = pstats.Stats(token)
+                else:
+                    self._stats.add(token)
+            else:
+                self._threads.discard(token)
+            self.captured += 1
+            if self.requests is not None and self.captured >= self.requests:
+                self._done.set()
+
+    def wait(self, timeout=None):
+        """Block until the session is complete or timeout seconds passed; True if complete"""
+        if self.seconds is not None:
+            remaining = self.seconds - (time.monotonic() - self.started)
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        self._done.wait(max(timeout, 0) if timeout is not None else None)
+        return self.done
+
+    def close(self):
+        """Stop sampling; requests still in flight are no longer captured"""
+        self._done.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    def _sample(self):
+        current_frames = sys._current_frames
+        while not self._done.wait(self.interval):
+            with self._lock:
+                threads = list(self._threads)
+            if not threads:
+                continue
+            frames = current_frames()
+            stacks = [collapse(frames[ident]) for ident in threads if ident in frames]
+            with self._lock:
+                self._stacks.update(stacks)
+                self.samples += len(stacks)
+
+    def result(self, output_format=None):
+        """(bytes, mimetype) of the profile in output_format (default: the mode's first format)"""
+        output_format = output_format or FORMATS[self.mode][0]
+        if output_format not in FORMATS[self.mode]:
+            raise ValueError(f"{self.mode} profiles can be returned as {', '.join(FORMATS[self.mode])}")
+        with self._lock:
+            if output_format == 'collapsed':
+                body = ''.join(f'{stack} {count}\n' for stack, count in self._stacks.most_common())
+                return body.encode(), MIMETYPES[output_format]
+            stats = self._stats or pstats.Stats()
+            if output_format == 'pstats':
+                # Same content as Stats.dump_stats(), loadable with pstats.Stats(path)
+                return marshal.dumps(stats.stats), MIMETYPES[output_format]
+            stream = io.StringIO()
+            stats.stream = stream
+            stats.sort_stats('cumulative').print_stats(60)
+            return stream.getvalue().encode(), MIMETYPES[output_format]
+
+    def save(self, directory, output_format=None):
+        """Write the result to a new file in directory and return its path"""
+        output_format = output_format or FORMATS[self.mode][0]
+        body, _ = self.result(output_format)
+        name = f'profile-{os.getpid()}-{time.strftime("%Y%m%d-%H%M%S")}-{self.mode}.{EXTENSIONS[output_format]}'
+        path = os.path.join(directory, name)
+        with open(path, 'wb') as f:
+            f.write(body)
+        return path
+
+
+def collapse(frame):
+    """One collapsed-stack line for frame: outermost call first, separated by ';'"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Compare two models on logged traffic before promoting one
+
+    python replay.py prediction-logs/ --candidate new/model.forest --processes 4
+
+Replays the rows of prediction logs written by the app (see
+prediction_log.py; a directory, or .jsonl / .jsonl.gz files) through the
+model being served (--baseline, by default what app.py would load) and a
+candidate, and reports:
+
+* prediction deltas, candidate minus baseline: mean, mean absolute, RMSE,
+  quantiles of the absolute delta and the share of rows above --tolerance
+* the distribution of each model's predictions (and of the logged ones),
+  and the shift between baseline and candidate as PSI and KS statistic
+* the per-row latency of each model on the replayed batches
+
+The logs are read in blocks of about --chunk-bytes and each block is parsed
+and scored by a pool process that loads both models once, through the same
+load_model() as app.py. Workers reduce their block to fixed-bin histograms
+and sums, which merge exactly, so memory stays constant however many
+rows are replayed and quantiles are precise to the bin width (0.01).
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+import warnings
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from features import FEATURE_DTYPE, FEATURE_NAMES
+from model_loader import load_model
+from prediction_log import log_files
+
+# Bin edges of the prediction histograms (ratings) and of the delta histogram
+RATING_EDGES = np.linspace(0.0, 5.0, 501)
+DELTA_EDGES = np.linspace(-5.0, 5.0, 1001)
+
+MODELS = ('baseline', 'candidate')
+
+# Models and tolerance of each pool process, set by _load_worker_models()
+_worker_models = None
+_worker_tolerance = None
+
+
+def log_paths(inputs):
+    """Log files named by inputs, expanding directories to their logs, oldest first"""
+    paths = []
+    for path in inputs:
+        if os.path.isdir(path):
+            paths.extend(log_files(path))
+        elif os.path.exists(path):
+            paths.append(path)
+        else:
+            raise FileNotFoundError(f'{path} not found')
+    return paths
+
+
+def read_blocks(paths, chunk_bytes=1 << 21):
+    """Yield blocks of whole log lines of about chunk_bytes each, across all paths"""
+    lines, size = [], 0
+    for path in paths:
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rb') as f:
+            for line in f:
+                lines.append(line)
+                size += len(line)
+                if size >= chunk_bytes:
+                    yield b''.join(lines)
+                    lines, size = [], 0
+    if lines:
+        yield b''.join(lines)
+
+
+def parse_block(block):
+    """(feature matrix, logged predictions, requests) of a block of log lines"""
+    rows, logged, requests = [], [], 0
+    for line in block.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        features = record['features']
+        predictions = record.get('predictions') or []
+        rows.extend(features)
+        logged.extend(predictions if len(predictions) == len(features) else [np.nan] * len(features))
+        requests += 1
+    matrix = np.array(rows, dtype=FEATURE_DTYPE).reshape(-1, len(FEATURE_NAMES))
+    return matrix, np.array(logged, dtype=np.float64), requests
+
+
+def _load_worker_models(baseline_path, candidate_path, engine, tolerance):
+    global _worker_models, _worker_tolerance
+    # Blocks are plain matrices; sklearn warns that the forest was fitted on a DataFrame
+    warnings.filterwarnings('ignore', message='X does not have valid feature names')
+    _worker_models = (load_model(baseline_path, engine), load_model(candidate_path, engine))
+    _worker_tolerance = tolerance
+
+
+def _histogram(values, edges):
+    return np.histogram(np.clip(values, edges[0], edges[-1]), edges)[0]
+
+
+def _replay_block(block):
+    """Parse and score a block with both models, reduced to a mergeable summary"""
+    X, logged, requests = parse_block(block)
+    summary = {'rows': len(X), 'requests': requests}
+    if len(X) == 0:
+        return summary
+    predictions = {}
+    for name, model in zip(MODELS, _worker_models):
+        start = time.perf_counter()
+        predictions[name] = np.asarray(model.predict(X), dtype=np.float64)
+        summary[f'{name}_seconds'] = time.perf_counter() - start
+        summary[f'{name}_hist'] = _histogram(predictions[name], RATING_EDGES)
+        summary[f'{name}_sum'] = predictions[name].sum()
+        summary[f'{name}_sq'] = np.square(predictions[name]).sum()
+
+    delta = predictions['candidate'] - predictions['baseline']
+    summary.update({
+        'delta_hist': _histogram(delta, DELTA_EDGES),
+        'delta_sum': delta.sum(),
+        'delta_sq': np.square(delta).sum(),
+        'delta_abs_sum': np.abs(delta).sum(),
+        'delta_abs_max': np.abs(delta).max(),
+        'over_tolerance': int((np.abs(delta) > _worker_tolerance).sum()),
+    })
+    known = ~np.isnan(logged)
+    summary['logged_rows'] = int(known.sum())
+    summary['logged_hist'] = _histogram(logged[known], RATING_EDGES)
+    summary['logged_abs_diff_sum'] = np.abs(predictions['baseline'][known] - logged[known]).sum()
+    return summary
+
+
+def histogram_quantile(counts, edges, q):
+    """Quantile q (0-1) of histogrammed values, interpolated within its bin"""
+    total = counts.sum()
+    if total == 0:
+        return None
+    cumulative = np.cumsum(counts)
+    target = q * total
+    i = int(np.searchsorted(cumulative, target))
+    i = min(i, len(counts) - 1)
+    below = cumulative[i - 1] if i else 0
+    fraction = (target - below) / counts[i] if counts[i] else 0.0
+    return float(edges[i] + fraction * (edges[i + 1] - edges[i]))
+
+
+def psi(expected, actual, floor=1e-4):
+    """Population stability index between two histograms over the same bins"""
+    p = np.maximum(expected / max(expected.sum(), 1), floor)
+    q = np.maximum(actual / max(actual.sum(), 1), floor)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+
+def ks_statistic(expected, actual):
+    """Largest gap between the cumulative distributions of two histograms"""
+    if not expected.sum() or not actual.sum():
+        return None
+    return float(np.abs(np.cumsum(expected) / expected.sum() - np.cumsum(actual) / actual.sum()).max())
+
+
+class ReplaySummary:
+    """Merged block summaries and the report built from them"""
+
+    def __init__(self):
+        self.totals = {}
+        self.block_latencies = {name: [] for name in MODELS}
+
+    def add(self, summary):
+        rows = summary['rows']
+        for name in MODELS:
+            if f'{name}_seconds' in summary:
+                self.block_latencies[name].append(summary[f'{name}_seconds'] / rows * 1e6)
+        for key, value in summary.items():
+            if key == 'delta_abs_max':
+                self.totals[key] = max(self.totals.get(key, 0.0), value)
+            elif key in self.totals:
+                self.totals[key] = self.totals[key] + value
+            else:
+                self.totals[key] = value
+
+    def report(self, tolerance):
+        totals = self.totals
+        rows = totals.get('rows', 0)
+        report = {'rows': rows, 'requests': totals.get('requests', 0)}
+        if not rows:
+            return report
+        for name in MODELS:
+            hist = totals[f'{name}_hist']
+            mean = totals[f'{name}_sum'] / rows
+            latencies = self.block_latencies[name]
+            report[name] = {
+                'mean': round(mean, 4),
+                'std': round(float(np.sqrt(max(totals[f'{name}_sq'] / rows - mean ** 2, 0.0))), 4),
+                **{f'p{q}': round(histogram_quantile(hist, RATING_EDGES, q / 100), 3) for q in (5, 50, 95)},
+                'latency_us_per_row': round(totals[f'{name}_seconds'] / rows * 1e6, 3),
+                'latency_us_per_row_p50': round(float(np.percentile(latencies, 50)), 3),
+                'latency_us_per_row_p99': round(float(np.percentile(latencies, 99)), 3),
+            }
+        abs_hist = _absolute(totals['delta_hist'])
+        abs_edges = DELTA_EDGES[len(DELTA_EDGES) // 2:]
+        report['delta'] = {
+            'mean': round(totals['delta_sum'] / rows, 5),
+            'mean_abs': round(totals['delta_abs_sum'] / rows, 5),
+            'rmse': round(float(np.sqrt(totals['delta_sq'] / rows)), 5),
+            'max_abs': round(float(totals['delta_abs_max']), 5),
+            **{f'abs_p{q}': round(histogram_quantile(abs_hist, abs_edges, q / 100), 3) for q in (50, 95, 99)},
+            'tolerance': tolerance,
+            'share_over_tolerance': round(totals['over_tolerance'] / rows, 5),
+        }
+        report['shift'] = {
+            'mean': round(report['candidate']['mean'] - report['baseline']['mean'], 5),
+            'psi': round(psi(totals['baseline_hist'], totals['candidate_hist']), 5),
+            'ks': round(ks_statistic(totals['baseline_hist'], totals['candidate_hist']), 5),
+        }
+        logged_rows = totals.get('logged_rows', 0)
+        if logged_rows:
+            report['logged'] = {
+                'rows': logged_rows,
+                'p50': round(histogram_quantile(totals['logged_hist'], RATING_EDGES, 0.5), 3),
+                'baseline_mean_abs_diff': round(totals['logged_abs_diff_sum'] / logged_rows, 5),
+            }
+        return report
+
+
+def _absolute(delta_hist):
+    """Fold a histogram over DELTA_EDGES (symmetric around 0) into one of absolute values"""
+    half = len(delta_hist) // 2
+    return delta_hist[half:] + delta_hist[:half][::-1]
+
+
+def replay(paths, baseline_path, candidate_path, processes=None, chunk_bytes=1 << 21,
+           engine='sklearn', tolerance=0.1):
+    """
+    Replay every row of the log files through both models and return the
+    report (see ReplaySummary.report) with ``seconds`` and ``rows_per_second``.
+
+    With processes=0 the blocks are scored in this process; otherwise at
+    most two blocks per process are in flight.
+    """
+    processes = os.cpu_count() if processes is None else processes
+    summary = ReplaySummary()
+    started = time.perf_counter()
+    initargs = (baseline_path, candidate_path, engine, tolerance)
+    blocks = read_blocks(paths, chunk_bytes)
+
+    if processes == 0:
+        _load_worker_models(*initargs)
+        for block in blocks:
+            summary.add(_replay_block(block))
+    else:
+        with ProcessPoolExecutor(processes, initializer=_load_worker_models, initargs=initargs) as executor:
+            pending = deque()
+            for block in blocks:
+                pending.append(executor.submit(_replay_block, block))
+                if len(pending) >= 2 * processes:
+                    summary.add(pending.popleft().result())
+            while pending:
+                summary.add(pending.popleft().result())
+
+    report = summary.report(tolerance)
+    report['files'] = len(paths)
+    report['processes'] = processes
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    report['rows_per_second'] = round(report['rows'] / report['seconds'], 1) if report['seconds'] else 0.0
+    return report
+
+
+def format_report(report, baseline_path, candidate_path):
+    lines = [f"Replayed {report['rows']} rows from {report['requests']} logged requests "
+             f"({report['files']} files) in {report['seconds']:.2f} s "
+             f"({report['rows_per_second']:.0f} rows/s, {report['processes']} processes)"]
+    if not report['rows']:
+        return '\n'.join(lines)
+    for name, path in zip(MODELS, (baseline_path, candidate_path)):
+        stats = report[name]
+        lines.append(f"  {name:<10} {path}: mean {stats['mean']} std {stats['std']} "
+                     f"p5/p50/p95 {stats['p5']}/{stats['p50']}/{stats['p95']}, "
+                     f"{stats['latency_us_per_row']} us/row (blocks p50 {stats['latency_us_per_row_p50']}, "
+                     f"p99 {stats['latency_us_per_row_p99']})")
+    delta, shift = report['delta'], report['shift']
+    lines.append(f"  delta      mean {delta['mean']} mean abs {delta['mean_abs']} rmse {delta['rmse']} "
+                 f"max abs {delta['max_abs']}, |delta| p50/p95/p99 "
+                 f"{delta['abs_p50']}/{delta['abs_p95']}/{delta['abs_p99']}, "
+                 f"{delta['share_over_tolerance']:.2%} of rows over {delta['tolerance']}")
+    lines.append(f"  shift      mean {shift['mean']} PSI {shift['psi']} KS {shift['ks']}")
+    if 'logged' in report:
+        lines.append(f"  logged     baseline differs from served predictions by "
+                     f"{report['logged']['baseline_mean_abs_diff']} on average")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two models on logged prediction traffic')
+    parser.add_argument('logs', nargs='+', help='prediction log files or directories')
+    parser.add_argument('--candidate', required=True, help='model to evaluate (model.pkl or model.forest)')
+    parser.add_argument('--baseline', help='model it is compared with (default: what app.py serves)')
+    parser.add_argument('--processes', type=int, default=os.cpu_count(),
+                        help='worker processes (0 replays in this process)')
+    parser.add_argument('--chunk-bytes', type=int, default=1 << 21, help='bytes of log lines per block')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='delta counted as a changed prediction')
+    parser.add_argument('--engine', choices=['flat', 'sklearn'], default='sklearn',
+                        help="'flat' compiles a pickled forest to forest.FlatForest, only faster for chunks "
+                             "under forest.FALLBACK_MIN_ROWS rows (ignored for artifacts)")
+    parser.add_argument('--json', help='also write the report to this file as JSON')
+    args = parser.parse_args()
+
+    baseline = args.baseline or os.environ.get('ZOMATO_MODEL_PATH') or 'model.pkl'
+    for path in (baseline, args.candidate):
+        if not os.path.exists(path):
+            print(f"Error: {path} not found.")
+            sys.exit(1)
+    try:
+        paths = log_paths(args.logs)
+        report = replay(paths, baseline, args.candidate, args.processes, args.chunk_bytes,
+                        args.engine, args.tolerance)
+    except (OSError, ValueError, KeyError, RuntimeError) as e:
+        # RuntimeError covers a pool whose processes failed to load a model
+        print(f"Error replaying {', '.join(args.logs)}: {e}")
+        sys.exit(1)
+
+    print(format_report(report, baseline, args.candidate))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -18,7 +18,8 @@ def get_numpy():
         pytest.skip("numpy not available")
 
 # Add the parent directory to the path so we can import the app
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
 
 
 @pytest.fixture(scope="session")
@@ -56,6 +57,32 @@ def sample_data():
     }
 
 
+@pytest.fixture(scope="session")
+def trained_forest():
+    """Small ExtraTreesRegressor fitted like model.py, on synthetic data"""
+    np = get_numpy()
+    import pandas as pd
+    from sklearn.ensemble import ExtraTreesRegressor
+
+    rng = np.random.RandomState(42)
+    n_samples = 500
+    X = pd.DataFrame({
+        'online_order': rng.randint(0, 2, n_samples),
+        'book_table': rng.randint(0, 2, n_samples),
+        'votes': rng.randint(0, 5000, n_samples),
+        'location': rng.randint(0, 93, n_samples),
+        'rest_type': rng.randint(0, 93, n_samples),
+        'cuisines': rng.randint(0, 2700, n_samples),
+        'cost': rng.randint(40, 6000, n_samples).astype(float),
+        'menu_item': rng.randint(0, 9000, n_samples)
+    })
+    y = 2.0 + 3.0 * rng.rand(n_samples)
+
+    model = ExtraTreesRegressor(n_estimators=15, random_state=0)
+    model.fit(X, y)
+    return model, X
+
+
 @pytest.fixture
 def mock_model_file(test_data_dir, sample_model):
     """Create a temporary model file for testing"""
@@ -67,6 +94,19 @@ def mock_model_file(test_data_dir, sample_model):
     return model_path
 
 
+@pytest.fixture
+def flask_app_module():
+    """Import app.py from the project root, the way production resolves model.pkl"""
+    original_cwd = os.getcwd()
+    os.chdir(PROJECT_ROOT)
+    try:
+        import app as app_module
+    finally:
+        os.chdir(original_cwd)
+    app_module.app.config['TESTING'] = True
+    return app_module
+
+
 @pytest.fixture
 def app_config():
     """Application configuration for testing"""
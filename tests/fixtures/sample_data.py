@@ -106,3 +106,28 @@ def get_performance_test_data():
             'Menu Item': '40'
         }
     }
+
+
+class RowSumModel:
+    """Model stub returning one prediction per row and recording every matrix it scores"""
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, X):
+        self.calls.append(np.array(X))
+        return np.asarray(X).sum(axis=1) / 1000.0
+
+
+class ConstantModel:
+    """Model stub predicting a rating of 3.7 for every row"""
+
+    def predict(self, X):
+        return np.full(len(X), 3.7)
+
+
+class FailingModel:
+    """Model stub whose predictions always fail"""
+
+    def predict(self, X):
+        raise RuntimeError('corrupted forest')
@@ -44,11 +44,18 @@ class TestFlaskRoutes:
             shutil.copy2(temp_model_path, 'model.pkl')
             
             # Import and configure the app
+            import app as app_module
             from app import app as flask_app
             flask_app.config['TESTING'] = True
             flask_app.config['WTF_CSRF_ENABLED'] = False
-            
+
+            # The module may already have been imported by another test,
+            # so install the mock explicitly instead of relying on import order
+            original_model = app_module.model
+            app_module.model = mock_model
+
             yield flask_app
+            app_module.model = original_model
         finally:
             # Cleanup
             if os.path.exists('model.pkl'):
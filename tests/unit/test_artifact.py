@@ -0,0 +1,130 @@
+"""
+Unit tests for the standalone forest artifact format
+"""
+import os
+import subprocess
+import sys
+import pickle
+
+import pytest
+import numpy as np
+
+from artifact import ArtifactError, is_forest_artifact, load_forest, read_header, save_forest
+from forest import FlatForest
+from model_loader import load_model
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="module")
+def flat(trained_forest):
+    return FlatForest.from_sklearn(trained_forest[0])
+
+
+@pytest.fixture
+def artifact_path(tmp_path, flat):
+    path = str(tmp_path / 'model.forest')
+    save_forest(flat, path)
+    return path
+
+
+class TestForestArtifact:
+    """Test writing, mapping and validating forest artifacts"""
+
+    @pytest.mark.unit
+    def test_round_trip(self, artifact_path, flat, trained_forest):
+        """Test that the loaded forest predicts exactly like the one saved"""
+        model, X = trained_forest
+        loaded = load_forest(artifact_path)
+        assert loaded.n_estimators == flat.n_estimators
+        assert loaded.max_depth == flat.max_depth
+        np.testing.assert_array_equal(loaded.predict(X.values), flat.predict(X.values))
+        np.testing.assert_allclose(loaded.predict(X.values), model.predict(X), rtol=1e-9)
+
+    @pytest.mark.unit
+    def test_readable_by_other_users(self, artifact_path):
+        assert os.stat(artifact_path).st_mode & 0o777 == 0o644
+
+    @pytest.mark.unit
+    def test_arrays_are_read_only_views_of_the_file(self, artifact_path):
+        """Test that mapped node arrays are not copied into the heap"""
+        loaded = load_forest(artifact_path)
+        for array in loaded.arrays().values():
+            assert not array.flags.writeable
+            assert not array.flags.owndata
+            assert array.ctypes.data % 64 == 0
+        assert isinstance(loaded.threshold.base, np.memmap)
+
+    @pytest.mark.unit
+    def test_load_without_mmap(self, artifact_path, flat):
+        loaded = load_forest(artifact_path, mmap=False)
+        np.testing.assert_array_equal(loaded.value, flat.value)
+
+    @pytest.mark.unit
+    def test_header(self, artifact_path, flat):
+        header, data_offset = read_header(artifact_path)
+        assert header['n_nodes'] == flat.n_nodes
+        assert header['n_features'] == 8
+        assert data_offset % 64 == 0
+
+    @pytest.mark.unit
+    def test_detects_corruption(self, artifact_path):
+        """Test that a flipped byte in the node data fails the checksum"""
+        with open(artifact_path, 'r+b') as f:
+            f.seek(-1, os.SEEK_END)
+            last = f.read(1)
+            f.seek(-1, os.SEEK_END)
+            f.write(bytes([last[0] ^ 0xFF]))
+        with pytest.raises(ArtifactError, match='Checksum'):
+            load_forest(artifact_path)
+
+    @pytest.mark.unit
+    def test_detects_truncation(self, artifact_path):
+        with open(artifact_path, 'r+b') as f:
+            f.truncate(os.path.getsize(artifact_path) - 8)
+        with pytest.raises(ArtifactError):
+            load_forest(artifact_path)
+
+    @pytest.mark.unit
+    def test_rejects_other_files(self, tmp_path, trained_forest):
+        path = str(tmp_path / 'model.pkl')
+        with open(path, 'wb') as f:
+            pickle.dump(trained_forest[0], f)
+        assert not is_forest_artifact(path)
+        with pytest.raises(ArtifactError):
+            load_forest(path)
+
+
+class TestLoadingArtifacts:
+    """Test that serving code accepts artifacts in place of pickles"""
+
+    @pytest.mark.unit
+    def test_load_model_maps_artifact(self, artifact_path, flat):
+        loaded = load_model(artifact_path)
+        assert isinstance(loaded, FlatForest)
+        np.testing.assert_array_equal(loaded.roots, flat.roots)
+
+    @pytest.mark.unit
+    def test_loads_without_sklearn(self, artifact_path):
+        """Test that loading and predicting never imports scikit-learn"""
+        script = (
+            'import sys; import numpy as np; from artifact import load_forest; '
+            f'print(load_forest({artifact_path!r}).predict(np.ones((2, 8))).shape); '
+            'print("sklearn" in sys.modules)'
+        )
+        output = subprocess.run([sys.executable, '-c', script], cwd=PROJECT_ROOT,
+                                capture_output=True, text=True, check=True).stdout.split()
+        assert output == ['(2,)', 'False']
+
+    @pytest.mark.unit
+    def test_convert_cli(self, tmp_path, trained_forest, flat):
+        pickle_path, output = str(tmp_path / 'model.pkl'), str(tmp_path / 'model.forest')
+        with open(pickle_path, 'wb') as f:
+            pickle.dump(trained_forest[0], f)
+        subprocess.run([sys.executable, 'artifact.py', pickle_path, output],
+                       cwd=PROJECT_ROOT, capture_output=True, check=True)
+        np.testing.assert_array_equal(load_forest(output).threshold, flat.threshold)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
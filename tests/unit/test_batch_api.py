@@ -0,0 +1,112 @@
+"""
+Unit tests for the JSON batch prediction API
+"""
+import pytest
+import numpy as np
+
+from features import FEATURE_NAMES, PayloadError, payload_to_matrix
+from tests.fixtures.sample_data import RowSumModel
+
+
+def make_row(offset=0):
+    return {name: i + offset for i, name in enumerate(FEATURE_NAMES)}
+
+
+class TestPayloadParsing:
+    """Test conversion of JSON payloads into feature matrices"""
+
+    @pytest.mark.unit
+    def test_instances_payload(self):
+        """Test that row-oriented payloads keep feature order"""
+        matrix = payload_to_matrix({'instances': [make_row(), make_row(10)]})
+        assert matrix.shape == (2, 8)
+        assert matrix.dtype == np.float32
+        assert matrix.flags['C_CONTIGUOUS']
+        assert matrix[1].tolist() == [float(i + 10) for i in range(8)]
+
+    @pytest.mark.unit
+    def test_columns_payload(self):
+        """Test that column-oriented payloads produce the same matrix"""
+        rows = [make_row(), make_row(10)]
+        columns = {name: [row[name] for row in rows] for name in FEATURE_NAMES}
+        np.testing.assert_array_equal(
+            payload_to_matrix({'columns': columns}),
+            payload_to_matrix({'instances': rows})
+        )
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('payload', [
+        [],
+        {},
+        {'instances': [{'votes': 1}]},
+        {'instances': [dict(make_row(), votes='many')]},
+        {'columns': {name: [1, 2] for name in FEATURE_NAMES[:-1]}},
+        {'columns': dict({name: [1, 2] for name in FEATURE_NAMES}, cost=[1])},
+        {'columns': {name: 5 for name in FEATURE_NAMES}},
+        {'instances': [dict(make_row(), votes=[1, 2])]},
+        {'instances': [{name: [1, 2] for name in FEATURE_NAMES}]},
+    ])
+    def test_invalid_payloads(self, payload):
+        """Test that malformed payloads raise PayloadError"""
+        with pytest.raises(PayloadError):
+            payload_to_matrix(payload)
+
+
+class TestBatchPredictRoute:
+    """Test the /api/v1/predict route"""
+
+    @pytest.fixture
+    def model(self, flask_app_module, monkeypatch):
+        stub = RowSumModel()
+        monkeypatch.setattr(flask_app_module, 'model', stub)
+        # Count as warmed up, so no background warm-up call is recorded
+        monkeypatch.setattr(flask_app_module, 'warmed_model', stub)
+        return stub
+
+    @pytest.fixture
+    def client(self, flask_app_module):
+        return flask_app_module.app.test_client()
+
+    @pytest.mark.unit
+    def test_batch_uses_single_predict_call(self, client, model):
+        """Test that N rows are scored with exactly one model call"""
+        rows = [make_row(i) for i in range(50)]
+        response = client.post('/api/v1/predict', json={'instances': rows})
+
+        assert response.status_code == 200
+        body = response.get_json()
+        assert body['count'] == 50
+        assert len(model.calls) == 1
+        assert model.calls[0].shape == (50, 8)
+        assert body['predictions'][3] == pytest.approx(sum(range(3, 11)) / 1000.0)
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('payload', [
+        {'instances': [{'votes': 1}]},
+        {'columns': {name: 5 for name in FEATURE_NAMES}},
+        {'instances': [{name: [1, 2] for name in FEATURE_NAMES}]},
+    ])
+    def test_batch_rejects_invalid_payload(self, client, model, payload):
+        """Test that invalid payloads return 400 without calling the model"""
+        response = client.post('/api/v1/predict', json=payload)
+        assert response.status_code == 400
+        assert 'error' in response.get_json()
+        assert model.calls == []
+
+    @pytest.mark.unit
+    def test_batch_row_limit(self, client, model, flask_app_module, monkeypatch):
+        """Test that oversized batches are refused"""
+        monkeypatch.setattr(flask_app_module, 'MAX_BATCH_ROWS', 2)
+        response = client.post('/api/v1/predict', json={'instances': [make_row()] * 3})
+        assert response.status_code == 413
+
+    @pytest.mark.unit
+    def test_batch_without_model(self, client, flask_app_module, monkeypatch):
+        """Test that the API reports 503 when no model is loaded"""
+        monkeypatch.setattr(flask_app_module, 'model', None)
+        response = client.post('/api/v1/predict', json={'instances': [make_row()]})
+        assert response.status_code == 503
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
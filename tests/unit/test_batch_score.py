@@ -0,0 +1,120 @@
+"""
+Unit tests for the offline batch scoring CLI
+"""
+import io
+import json
+import os
+import pickle
+import subprocess
+import sys
+
+import pytest
+import numpy as np
+
+from batch_score import read_chunks, score_file
+from features import FEATURE_NAMES, PayloadError
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="module")
+def model_path(tmp_path_factory, trained_forest):
+    path = str(tmp_path_factory.mktemp('model') / 'model.pkl')
+    with open(path, 'wb') as f:
+        pickle.dump(trained_forest[0], f)
+    return path
+
+
+@pytest.fixture(scope="module")
+def csv_path(tmp_path_factory, trained_forest):
+    _, X = trained_forest
+    path = str(tmp_path_factory.mktemp('data') / 'restaurants.csv')
+    X.assign(restaurant=[f'r{i}' for i in range(len(X))], rate=4.0).to_csv(path, index=False)
+    return path
+
+
+def expected_predictions(trained_forest):
+    model, X = trained_forest
+    return model.predict(X)
+
+
+class TestReadChunks:
+    """Test chunked reading of the supported input formats"""
+
+    @pytest.mark.unit
+    def test_csv(self, csv_path, trained_forest):
+        chunks = list(read_chunks(csv_path, chunk_rows=128))
+        assert [len(X) for _, X in chunks] == [128, 128, 128, 116]
+        np.testing.assert_array_equal(np.vstack([X for _, X in chunks]), trained_forest[1].values)
+
+    @pytest.mark.unit
+    def test_npy_columns(self, tmp_path, trained_forest):
+        """Test a directory of per-column arrays, read through memory maps"""
+        _, X = trained_forest
+        for name in FEATURE_NAMES:
+            np.save(tmp_path / f'{name}.npy', X[name].values)
+        np.save(tmp_path / 'restaurant_id.npy', np.arange(len(X)) + 1000)
+
+        chunks = list(read_chunks(str(tmp_path), chunk_rows=200, id_column='restaurant_id'))
+        assert [len(X) for _, X in chunks] == [200, 200, 100]
+        assert chunks[1][0][:2] == [1200, 1201]
+        np.testing.assert_array_equal(np.vstack([X for _, X in chunks]), X.values)
+
+    @pytest.mark.unit
+    def test_npy_missing_column(self, tmp_path):
+        np.save(tmp_path / 'votes.npy', np.arange(3))
+        with pytest.raises(PayloadError, match='online_order.npy'):
+            list(read_chunks(str(tmp_path)))
+
+    @pytest.mark.unit
+    def test_parquet(self, tmp_path, trained_forest):
+        pytest.importorskip('pyarrow')
+        _, X = trained_forest
+        path = str(tmp_path / 'restaurants.parquet')
+        X.to_parquet(path)
+        chunks = list(read_chunks(path, chunk_rows=256))
+        np.testing.assert_array_equal(np.vstack([X for _, X in chunks]), X.values)
+
+
+class TestScoreFile:
+    """Test that parallel scoring writes every prediction in input order"""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('processes', [0, 2])
+    def test_predictions_in_input_order(self, model_path, csv_path, trained_forest, processes):
+        output = io.StringIO()
+        stats = score_file(model_path, csv_path, output, processes=processes, chunk_rows=64)
+
+        lines = output.getvalue().splitlines()
+        assert lines[0] == 'row,prediction'
+        rows = [line.split(',') for line in lines[1:]]
+        assert [int(row) for row, _ in rows] == list(range(500))
+        np.testing.assert_allclose([float(p) for _, p in rows], expected_predictions(trained_forest))
+        assert stats['rows'] == 500
+        assert stats['chunks'] == 8
+        assert stats['rows_per_second'] > 0
+        assert stats['predict'] > 0
+
+    @pytest.mark.unit
+    def test_ndjson_with_id_column(self, model_path, csv_path, trained_forest):
+        output = io.StringIO()
+        score_file(model_path, csv_path, output, processes=0, output_format='ndjson',
+                   id_column='restaurant')
+        records = [json.loads(line) for line in output.getvalue().splitlines()]
+        assert records[3]['restaurant'] == 'r3'
+        assert records[3]['prediction'] == pytest.approx(expected_predictions(trained_forest)[3])
+
+    @pytest.mark.unit
+    def test_cli(self, model_path, csv_path, tmp_path):
+        output = str(tmp_path / 'predictions.csv')
+        result = subprocess.run(
+            [sys.executable, 'batch_score.py', csv_path, output, '--model', model_path,
+             '--processes', '1', '--chunk-rows', '100'],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+        assert 'Scored 500 rows in 5 chunks' in result.stderr
+        with open(output) as f:
+            assert len(f.readlines()) == 501
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,105 @@
+"""
+Unit tests for the micro-batching scheduler
+"""
+import threading
+
+import pytest
+import numpy as np
+
+from batching import MicroBatcher
+
+
+class RowIdModel:
+    """Model stub predicting the first feature of each row, recording batch sizes"""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def predict(self, X):
+        X = np.asarray(X)
+        if (X < 0).any():
+            raise ValueError('negative feature')
+        self.batch_sizes.append(len(X))
+        return X[:, 0] / 10.0
+
+
+def row(i):
+    return [i, 0, 100, 5, 10, 15, 500, 20]
+
+
+class TestMicroBatcher:
+    """Test batching, per-caller results and metrics"""
+
+    @pytest.mark.unit
+    def test_single_request_flushes_on_timeout(self):
+        """Test that a lone request is not held longer than max_wait"""
+        batcher = MicroBatcher(max_batch_size=16, max_wait_us=200)
+        model = RowIdModel()
+
+        assert batcher.predict(model, row(7)) == pytest.approx(0.7)
+        stats = batcher.stats()
+        assert stats['batches'] == 1
+        assert stats['flushed_timeout'] == 1
+        assert stats['batch_size_histogram'] == {1: 1}
+
+    @pytest.mark.unit
+    def test_concurrent_requests_share_batches(self):
+        """Test that concurrent callers are merged and get their own row back"""
+        batcher = MicroBatcher(max_batch_size=8, max_wait_us=200000)
+        model = RowIdModel()
+        futures = [batcher.submit(model, row(i)) for i in range(16)]
+
+        results = [future.result(5) for future in futures]
+        assert results == pytest.approx([i / 10.0 for i in range(16)])
+        assert model.batch_sizes == [8, 8]
+        stats = batcher.stats()
+        assert stats['flushed_full'] == 2
+        assert stats['mean_batch_size'] == 8
+
+    @pytest.mark.unit
+    def test_threads_receive_their_own_results(self):
+        """Test result routing when callers block from separate threads"""
+        batcher = MicroBatcher(max_batch_size=4, max_wait_us=2000)
+        model = RowIdModel()
+        results = {}
+
+        def call(i):
+            results[i] = batcher.predict(model, row(i))
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        assert results == {i: pytest.approx(i / 10.0) for i in range(12)}
+        assert batcher.stats()['rows'] == 12
+
+    @pytest.mark.unit
+    def test_failing_row_does_not_fail_batch(self):
+        """Test that only the caller with the bad row sees the error"""
+        batcher = MicroBatcher(max_batch_size=3, max_wait_us=200000)
+        model = RowIdModel()
+        good, bad, other = (batcher.submit(model, r) for r in (row(1), row(-1), row(2)))
+
+        assert good.result(5) == pytest.approx(0.1)
+        assert other.result(5) == pytest.approx(0.2)
+        with pytest.raises(ValueError):
+            bad.result(5)
+
+    @pytest.mark.unit
+    def test_rows_scored_with_their_own_model(self):
+        """Test that a batch spanning a model swap uses each row's model"""
+        batcher = MicroBatcher(max_batch_size=2, max_wait_us=200000)
+        old_model, new_model = RowIdModel(), RowIdModel()
+        first = batcher.submit(old_model, row(1))
+        second = batcher.submit(new_model, row(2))
+
+        assert first.result(5) == pytest.approx(0.1)
+        assert second.result(5) == pytest.approx(0.2)
+        assert old_model.batch_sizes == [1]
+        assert new_model.batch_sizes == [1]
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,128 @@
+"""
+Unit tests for the latency and throughput benchmark suite
+"""
+import json
+import math
+import os
+import pickle
+import subprocess
+import sys
+
+import pytest
+
+import benchmark
+from tests.fixtures.sample_data import ConstantModel
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TestSummaries:
+    """Test percentile summaries, history and regression comparison"""
+
+    @pytest.mark.unit
+    def test_percentiles_in_milliseconds(self):
+        summary = benchmark.percentiles([i / 1000 for i in range(1, 101)], 'predict_single_ms')
+        assert summary['predict_single_ms_p50'] == pytest.approx(50.5)
+        assert summary['predict_single_ms_p99'] == pytest.approx(99.01)
+        assert set(summary) == {'predict_single_ms_p50', 'predict_single_ms_p95', 'predict_single_ms_p99'}
+
+    @pytest.mark.unit
+    def test_compare_respects_direction(self):
+        baseline = {'predict_single_ms_p50': 1.0, 'flask_predict_rps': 1000, 'training_s': 10}
+        metrics = {'predict_single_ms_p50': 1.5, 'flask_predict_rps': 700, 'training_s': 11,
+                   'model_load_ms': 3.0}
+        regressions = benchmark.compare(metrics, baseline, threshold=0.2)
+        assert [name for name, _, _, _ in regressions] == ['flask_predict_rps', 'predict_single_ms_p50']
+
+        # Improvements are never regressions
+        assert benchmark.compare({'predict_single_ms_p50': 0.1, 'flask_predict_rps': 5000}, baseline) == []
+
+    @pytest.mark.unit
+    def test_compare_flags_rises_from_zero(self):
+        baseline = {'server_predict_errors': 0, 'server_predict_rps': 0, 'model_load_ms': 0}
+        metrics = {'server_predict_errors': 3, 'server_predict_rps': 50, 'model_load_ms': 0}
+        regressions = benchmark.compare(metrics, baseline)
+        assert regressions == [('server_predict_errors', 0, 3, math.inf)]
+
+    @pytest.mark.unit
+    def test_history_is_appended(self, tmp_path):
+        path = str(tmp_path / 'history.jsonl')
+        for value in (1.0, 2.0):
+            benchmark.append_history(benchmark.make_record({'training_s': value}, 'model.pkl'), path)
+        history = benchmark.read_history(path)
+        assert [record['metrics']['training_s'] for record in history] == [1.0, 2.0]
+        assert history[0]['model'] == 'model.pkl'
+        assert 'timestamp' in history[0] and 'python' in history[0]
+
+
+class TestBenchmarks:
+    """Test the in-process benchmark sections"""
+
+    @pytest.mark.unit
+    def test_model_section(self, trained_forest):
+        metrics = benchmark.bench_model(trained_forest[0], repeat=20, batch_rows=50)
+        assert metrics['predict_single_ms_p50'] <= metrics['predict_single_ms_p99']
+        assert metrics['predict_batch_rows_per_s'] > 0
+
+    @pytest.mark.unit
+    def test_flask_section(self, flask_app_module, monkeypatch):
+        stub = ConstantModel()
+        monkeypatch.setattr(flask_app_module, 'model', stub)
+        monkeypatch.setattr(flask_app_module, 'warmed_model', stub)
+        monkeypatch.setattr(flask_app_module, 'prediction_cache', None)
+        metrics = benchmark.bench_flask(flask_app_module, repeat=20)
+        assert metrics['flask_predict_rps'] > 0
+        assert metrics['flask_predict_ms_p95'] > 0
+
+    @pytest.mark.unit
+    def test_load_section(self, trained_forest, tmp_path):
+        path = str(tmp_path / 'model.pkl')
+        with open(path, 'wb') as f:
+            pickle.dump(trained_forest[0], f)
+        metrics = benchmark.bench_load(path, repeat=2)
+        assert metrics['artifact_bytes'] == os.path.getsize(path)
+        assert metrics['model_load_ms'] > 0
+
+
+class TestCommandLine:
+    """Test history, baseline and regression gating through the CLI"""
+
+    def run_cli(self, model_path, tmp_path, *args):
+        return subprocess.run(
+            [sys.executable, os.path.join(PROJECT_ROOT, 'benchmark.py'), '--model', model_path,
+             '--skip', 'flask', 'server', 'training', '--repeat', '10', '--batch-rows', '20',
+             '--history', str(tmp_path / 'history.jsonl'), '--baseline', str(tmp_path / 'baseline.json'), *args],
+            cwd=str(tmp_path), capture_output=True, text=True, timeout=120)
+
+    @pytest.mark.unit
+    @pytest.mark.slow
+    def test_check_fails_on_regression(self, trained_forest, tmp_path):
+        model_path = str(tmp_path / 'model.pkl')
+        with open(model_path, 'wb') as f:
+            pickle.dump(trained_forest[0], f)
+
+        result = self.run_cli(model_path, tmp_path, '--save-baseline')
+        assert result.returncode == 0, result.stdout + result.stderr
+        with open(tmp_path / 'baseline.json') as f:
+            baseline = json.load(f)
+
+        # A baseline far faster than anything measurable makes every latency a regression
+        baseline['metrics'] = {name: (value / 1000 if name.endswith(('_p50', '_p95', '_p99')) else value)
+                               for name, value in baseline['metrics'].items()}
+        with open(tmp_path / 'baseline.json', 'w') as f:
+            json.dump(baseline, f)
+        result = self.run_cli(model_path, tmp_path, '--check', '--threshold', '0.5')
+        assert result.returncode == 1
+        assert 'REGRESSION predict_single_ms_p50' in result.stdout
+        assert len(benchmark.read_history(str(tmp_path / 'history.jsonl'))) == 2
+
+    @pytest.mark.unit
+    @pytest.mark.slow
+    def test_missing_model(self, tmp_path):
+        result = self.run_cli(str(tmp_path / 'missing.pkl'), tmp_path)
+        assert result.returncode == 1
+        assert 'Error' in result.stdout
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,151 @@
+"""
+Unit tests for chunked CSV parsing and the streaming CSV scoring endpoint
+"""
+import csv
+import io
+import json
+
+import pytest
+import numpy as np
+
+from features import (FEATURE_NAMES, PayloadError, csv_matrices, format_predictions, iter_text_lines,
+                      prediction_header)
+from tests.fixtures.sample_data import RowSumModel
+
+
+def make_csv(n_rows, extra_columns=True):
+    header = ['', 'rate'] + FEATURE_NAMES if extra_columns else FEATURE_NAMES
+    lines = [','.join(header)]
+    for i in range(n_rows):
+        values = [str(i + j) for j in range(len(FEATURE_NAMES))]
+        lines.append(','.join([f'r{i}', '4.1'] + values if extra_columns else values))
+    return '\n'.join(lines) + '\n'
+
+
+class TestCsvParsing:
+    """Test splitting CSV input into feature matrices"""
+
+    @pytest.mark.unit
+    def test_text_lines_across_blocks(self):
+        """Test that lines and multi-byte characters split across reads are rebuilt"""
+        text = 'café,1\r\nnaïve,2\nlast'
+        lines = list(iter_text_lines(io.BytesIO(text.encode()), block_size=3))
+        assert lines == ['café,1\r\n', 'naïve,2\n', 'last']
+
+    @pytest.mark.unit
+    def test_chunks(self):
+        """Test that rows are grouped into matrices of at most chunk_rows rows"""
+        chunks = list(csv_matrices(io.StringIO(make_csv(10)), chunk_rows=4))
+        assert [matrix.shape for _, matrix in chunks] == [(4, 8), (4, 8), (2, 8)]
+        assert chunks[0][1].dtype == np.float32
+        assert list(chunks[2][0]) == [8, 9]
+        assert chunks[1][1][0].tolist() == [float(4 + j) for j in range(8)]
+
+    @pytest.mark.unit
+    def test_id_column(self):
+        ids, _ = next(csv_matrices(io.StringIO(make_csv(3)), id_column=''))
+        assert ids == ['r0', 'r1', 'r2']
+
+    @pytest.mark.unit
+    def test_header_errors_are_raised_immediately(self):
+        """Test that a bad header fails before any rows are requested"""
+        with pytest.raises(PayloadError, match='menu_item'):
+            csv_matrices(io.StringIO('online_order,votes\n1,2\n'))
+        with pytest.raises(PayloadError):
+            csv_matrices(io.StringIO(''))
+        with pytest.raises(PayloadError):
+            csv_matrices(io.StringIO(make_csv(1)), id_column='restaurant')
+
+    @pytest.mark.unit
+    def test_ids_are_quoted(self):
+        """Test that ids with commas, quotes or line breaks survive a CSV round trip"""
+        ids = ['Cafe, Inc', 'Joe\'s "Diner"', 'two\nlines', 'plain']
+        text = prediction_header('name, city') + format_predictions(ids, [3.5, 3.6, 3.7, 3.8])
+        rows = list(csv.reader(io.StringIO(text)))
+        assert rows[0] == ['name, city', 'prediction']
+        assert rows[1:] == [[i, p] for i, p in zip(ids, ['3.5', '3.6', '3.7', '3.8'])]
+        assert format_predictions([7], [4.1]) == '7,4.1\n'
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('bad_row', ['1,2,3', ','.join(['x'] * 8), ','.join(['nan'] * 8)])
+    def test_bad_rows(self, bad_row):
+        chunks = csv_matrices(io.StringIO(make_csv(0, extra_columns=False) + bad_row + '\n'))
+        with pytest.raises(PayloadError):
+            list(chunks)
+
+
+class TestCsvScoringRoute:
+    """Test /api/v1/predict/csv"""
+
+    @pytest.fixture
+    def model(self, flask_app_module, monkeypatch):
+        stub = RowSumModel()
+        monkeypatch.setattr(flask_app_module, 'model', stub)
+        monkeypatch.setattr(flask_app_module, 'warmed_model', stub)
+        monkeypatch.setattr(flask_app_module, 'CSV_CHUNK_ROWS', 4)
+        return stub
+
+    @pytest.fixture
+    def client(self, flask_app_module):
+        return flask_app_module.app.test_client()
+
+    @pytest.mark.unit
+    def test_raw_body_streams_csv(self, client, model):
+        """Test that each chunk is scored with one model call"""
+        response = client.post('/api/v1/predict/csv', data=make_csv(10), content_type='text/csv')
+
+        assert response.status_code == 200
+        assert response.mimetype == 'text/csv'
+        assert not response.is_sequence
+        lines = response.get_data(as_text=True).splitlines()
+        assert lines[0] == 'row,prediction'
+        assert len(lines) == 11
+        row, prediction = lines[4].split(',')
+        assert row == '3'
+        assert float(prediction) == pytest.approx(sum(range(3, 11)) / 1000.0)
+        assert [len(X) for X in model.calls] == [4, 4, 2]
+
+    @pytest.mark.unit
+    def test_upload_as_ndjson(self, client, model):
+        data = {'file': (io.BytesIO(make_csv(5).encode()), 'restaurants.csv')}
+        response = client.post('/api/v1/predict/csv?format=ndjson&id_column=', data=data)
+
+        assert response.mimetype == 'application/x-ndjson'
+        records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert [record['row'] for record in records] == ['r0', 'r1', 'r2', 'r3', 'r4']
+        assert records[0]['prediction'] == pytest.approx(sum(range(8)) / 1000.0)
+
+    @pytest.mark.unit
+    def test_large_upload_spooled_to_disk(self, client, model, flask_app_module, monkeypatch):
+        """Test uploads that werkzeug keeps in a temporary file rather than memory"""
+        monkeypatch.setattr(flask_app_module, 'CSV_CHUNK_ROWS', 4096)
+        data = {'file': (io.BytesIO(make_csv(20000).encode()), 'restaurants.csv')}
+        response = client.post('/api/v1/predict/csv', data=data)
+        assert len(response.get_data(as_text=True).splitlines()) == 20001
+
+    @pytest.mark.unit
+    def test_bad_header_returns_400(self, client, model):
+        response = client.post('/api/v1/predict/csv', data='votes,cost\n1,2\n', content_type='text/csv')
+        assert response.status_code == 400
+        assert 'Missing feature columns' in response.get_json()['error']
+        assert model.calls == []
+
+    @pytest.mark.unit
+    def test_unknown_format_returns_400(self, client, model):
+        response = client.post('/api/v1/predict/csv?format=xml', data=make_csv(1), content_type='text/csv')
+        assert response.status_code == 400
+
+    @pytest.mark.unit
+    def test_error_after_first_chunk_ends_stream(self, client, model):
+        """Test that a bad row in a later chunk is reported in the stream"""
+        body = make_csv(6) + 'r6,4.1,' + ','.join(['x'] * 8) + '\n'
+        response = client.post('/api/v1/predict/csv', data=body, content_type='text/csv')
+
+        lines = response.get_data(as_text=True).splitlines()
+        assert response.status_code == 200
+        assert len(lines) == 1 + 4 + 1
+        assert lines[-1].startswith('error,"Non-numeric feature value')
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
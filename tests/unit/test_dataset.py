@@ -0,0 +1,114 @@
+"""
+Unit tests for the columnar training dataset cache
+"""
+import os
+
+import pytest
+import numpy as np
+
+from dataset import build_cache, default_cache_dir, downcast, is_fresh, load_columns, load_frame
+
+CSV = """,online_order,book_table,rate,votes,location,rest_type,cuisines,cost,menu_item
+0,1,1,4.1,775,1,20,1386,800.0,5047
+1,1,0,4.1,787,1,20,594,800.0,5047
+2,0,0,3.8,918,1,16,484,800.0,5047
+3,0,0,3.7,88,1,62,1587,300.0,5047
+"""
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'Zomato_df.csv'
+    path.write_text(CSV)
+    return str(path)
+
+
+class TestDowncast:
+    """Test the choice of the narrowest column dtype"""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('values, dtype', [
+        ([0, 1, 1], np.int8),
+        ([0, 5047, 16832], np.int16),
+        ([0, 70000], np.int32),
+        ([800.0, 300.0], np.int16),
+        ([4.1, 3.8], np.float32),
+        ([1.0, np.nan], np.float32),
+        ([True, False], np.int8),
+    ])
+    def test_dtypes(self, values, dtype):
+        result = downcast(np.array(values))
+        assert result.dtype == dtype
+        np.testing.assert_allclose(result.astype(float), np.array(values, dtype=float), rtol=1e-6)
+
+    @pytest.mark.unit
+    def test_rejects_text(self):
+        with pytest.raises(ValueError):
+            downcast(np.array(['Banashankari', 'BTM'], dtype=object))
+
+
+class TestDatasetCache:
+    """Test building, loading and invalidating the cache"""
+
+    @pytest.mark.unit
+    def test_builds_on_first_load(self, source):
+        columns = load_columns(source)
+        cache_dir = default_cache_dir(source)
+
+        assert cache_dir.endswith('Zomato_df.cache')
+        assert is_fresh(source, cache_dir)
+        assert list(columns) == ['restaurant_id', 'online_order', 'book_table', 'rate', 'votes',
+                                 'location', 'rest_type', 'cuisines', 'cost', 'menu_item']
+        assert columns['restaurant_id'].tolist() == [0, 1, 2, 3]
+        assert columns['votes'].dtype == np.int16
+        assert columns['rate'].dtype == np.float32
+
+    @pytest.mark.unit
+    def test_loads_read_only_memory_maps(self, source):
+        load_columns(source)
+        columns = load_columns(source)
+        assert isinstance(columns['cost'], np.memmap)
+        assert not columns['cost'].flags.writeable
+        assert not isinstance(load_columns(source, mmap=False)['cost'], np.memmap)
+
+    @pytest.mark.unit
+    def test_reuses_fresh_cache(self, source):
+        """Test that an unchanged source is not parsed again"""
+        cache_dir = default_cache_dir(source)
+        build_cache(source)
+        manifest_path = os.path.join(cache_dir, 'manifest.json')
+        built_at = os.stat(manifest_path).st_mtime_ns
+        load_columns(source)
+        assert os.stat(manifest_path).st_mtime_ns == built_at
+
+    @pytest.mark.unit
+    def test_rebuilds_when_source_changes(self, source):
+        """Test that a changed source hash invalidates the cache"""
+        load_columns(source)
+        with open(source, 'a') as f:
+            f.write('4,1,0,4.5,40000,2,3,4,500.0,6\n')
+        assert not is_fresh(source)
+
+        columns = load_columns(source)
+        assert len(columns['votes']) == 5
+        assert columns['votes'].dtype == np.int32
+
+    @pytest.mark.unit
+    def test_frame_matches_csv(self, source):
+        import pandas as pd
+        frame = load_frame(source)
+        expected = pd.read_csv(source).rename(columns={'Unnamed: 0': 'restaurant_id'})
+        pd.testing.assert_frame_equal(frame, expected, check_dtype=False, atol=1e-6)
+
+    @pytest.mark.unit
+    def test_cache_is_a_batch_scoring_input(self, source):
+        """Test that batch_score.py reads the cache directory as npy columns"""
+        from batch_score import read_chunks
+        build_cache(source)
+        ids, X = next(read_chunks(default_cache_dir(source), id_column='restaurant_id'))
+        assert ids == [0, 1, 2, 3]
+        assert X[3].tolist() == [0, 0, 88, 1, 62, 1587, 300, 5047]
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,226 @@
+"""
+Unit tests for the streaming feature-drift monitor
+"""
+import io
+import json
+import sys
+import threading
+
+import pytest
+import numpy as np
+
+from drift import PSI_WARNING, SMALL_MATRIX_ROWS, DriftBaseline, DriftMonitor, drift_status, main, psi
+from features import FEATURE_NAMES
+from tests.fixtures.sample_data import ConstantModel
+
+
+def training_matrix(n=5000, seed=0):
+    rng = np.random.RandomState(seed)
+    return np.column_stack([
+        rng.randint(0, 2, n),
+        rng.randint(0, 2, n),
+        rng.randint(0, 5000, n),
+        rng.randint(0, 90, n),
+        rng.randint(0, 70, n),
+        rng.zipf(1.5, n) % 1600,
+        rng.choice([200, 300, 400, 500, 800, 1200, 2000], n),
+        rng.randint(0, 5000, n),
+    ]).astype(np.float32)
+
+
+@pytest.fixture(scope="module")
+def baseline():
+    return DriftBaseline.from_matrix(training_matrix(), numeric_bins=10, top_categories=20)
+
+
+class TestDriftBaseline:
+    """Test the bin layout and its file format"""
+
+    @pytest.mark.unit
+    def test_bins(self, baseline):
+        sizes = baseline.sizes()
+        assert len(sizes) == len(FEATURE_NAMES)
+        votes = baseline.features[FEATURE_NAMES.index('votes')]
+        assert votes['kind'] == 'numeric' and len(votes['edges']) == 9
+        # Quantiles of the 7 distinct costs collapse onto those values
+        assert len(baseline.features[FEATURE_NAMES.index('cost')]['edges']) <= 7
+        cuisines = baseline.features[FEATURE_NAMES.index('cuisines')]
+        assert cuisines['kind'] == 'categorical' and len(cuisines['codes']) == 20
+        assert sizes[FEATURE_NAMES.index('online_order')] == 4
+        for feature, size in zip(baseline.features, sizes):
+            assert len(feature['counts']) == size
+            assert sum(feature['counts']) == baseline.rows
+
+    @pytest.mark.unit
+    def test_unseen_codes(self, baseline):
+        j = FEATURE_NAMES.index('location')
+        (_, stop) = baseline.slices()[j]
+        rows = np.tile(training_matrix(3)[0], (3, 1))
+        rows[:, j] = [-1, 1000, 2.5]
+        assert (baseline.bin_indices(rows)[:, j] == stop - 1).all()
+
+    @pytest.mark.unit
+    def test_file_round_trip(self, baseline, tmp_path):
+        path = str(tmp_path / 'baseline.json')
+        baseline.save(path)
+        loaded = DriftBaseline.from_file(path)
+        assert loaded.rows == baseline.rows
+        X = training_matrix(100, seed=1)
+        assert (loaded.bin_counts(X) == baseline.bin_counts(X)).all()
+
+        with open(path) as f:
+            data = json.load(f)
+        data['features'].reverse()
+        with open(path, 'w') as f:
+            json.dump(data, f)
+        with pytest.raises(ValueError):
+            DriftBaseline.from_file(path)
+
+
+class TestDriftMonitor:
+    """Test counting and drift scores"""
+
+    @pytest.mark.unit
+    def test_rows_and_matrices_count_alike(self, baseline):
+        X = training_matrix(300, seed=2)
+        by_row, by_matrix = DriftMonitor(baseline), DriftMonitor(baseline)
+        for row in X.tolist():
+            by_row.update(row)
+        by_matrix.update_matrix(X[:5])
+        by_matrix.update_matrix(X[5:])
+        assert (by_row.counts() == by_matrix.counts()).all()
+        assert (by_row.counts() == baseline.bin_counts(X)).all()
+
+    @pytest.mark.unit
+    def test_training_rows_are_stable(self, baseline):
+        monitor = DriftMonitor(baseline)
+        monitor.update_matrix(training_matrix(2000, seed=3))
+        report = monitor.evaluate()
+        assert report['window']['rows'] == 2000
+        assert report['window']['drifted'] == []
+        assert report['window']['max_psi'] < PSI_WARNING
+        assert all(scores['status'] == 'ok' for scores in report['window']['features'].values())
+
+    @pytest.mark.unit
+    def test_shifted_rows_drift(self, baseline):
+        monitor = DriftMonitor(baseline)
+        X = training_matrix(1000, seed=4)
+        X[:, FEATURE_NAMES.index('cost')] *= 3
+        X[:, FEATURE_NAMES.index('rest_type')] = 500
+        monitor.update_matrix(X)
+        window = monitor.evaluate()['window']
+        assert set(window['drifted']) == {'cost', 'rest_type'}
+        assert window['features']['rest_type']['unseen_share'] == 1.0
+        assert window['features']['votes']['status'] == 'ok'
+
+    @pytest.mark.unit
+    def test_window_starts_after_each_evaluation(self, baseline):
+        monitor = DriftMonitor(baseline, min_rows=200)
+        monitor.update_matrix(training_matrix(300, seed=5))
+        assert monitor.report() is None
+        first = monitor.evaluate()
+        monitor.update_matrix(training_matrix(50, seed=6))
+        second = monitor.evaluate()
+        assert first['window']['rows'] == 300
+        assert second['window']['rows'] == 50 and second['total']['rows'] == 350
+        assert second['window']['max_psi'] is None
+        assert second['window']['features']['votes']['status'] == 'insufficient_data'
+        assert second['window']['started_at'] == first['evaluated_at']
+        assert monitor.report() is second
+
+    @pytest.mark.unit
+    def test_concurrent_threads_are_all_counted(self, baseline):
+        monitor = DriftMonitor(baseline)
+        row = training_matrix(1, seed=7)[0].tolist()
+
+        def count():
+            for _ in range(1000):
+                monitor.update(row)
+
+        threads = [threading.Thread(target=count) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert monitor.evaluate()['total']['rows'] == 4000
+
+    @pytest.mark.unit
+    def test_finished_threads_fold_their_shards(self, baseline):
+        monitor = DriftMonitor(baseline)
+        X = training_matrix(SMALL_MATRIX_ROWS + 1, seed=9)
+
+        def count():
+            monitor.update(X[0].tolist())
+            monitor.update_matrix(X)
+
+        for _ in range(50):
+            threads = [threading.Thread(target=count) for _ in range(20)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        assert monitor._shards == []
+        expected = 1000 * (baseline.bin_counts(X[:1]) + baseline.bin_counts(X))
+        assert (monitor.counts() == expected).all()
+
+    @pytest.mark.unit
+    def test_psi(self):
+        assert psi([10, 20, 30], [1, 2, 3]) == pytest.approx(0)
+        assert psi([50, 50], [90, 10]) > psi([50, 50], [60, 40]) > 0
+        assert drift_status(0.05) == 'ok'
+        assert drift_status(0.2) == 'warning'
+        assert drift_status(0.3) == 'drift'
+
+
+class TestCommandLine:
+    """Test writing a baseline from a training table"""
+
+    @pytest.mark.unit
+    def test_writes_baseline(self, tmp_path, monkeypatch, capsys):
+        X = training_matrix(200, seed=8).astype(int)
+        csv_path = tmp_path / 'train.csv'
+        csv_path.write_text(','.join(FEATURE_NAMES) + ',rate\n' +
+                            ''.join(','.join(map(str, row)) + ',4.1\n' for row in X))
+        output = tmp_path / 'baseline.json'
+        monkeypatch.setattr(sys, 'argv', ['drift.py', str(csv_path), '--output', str(output)])
+        main()
+        assert DriftBaseline.from_file(str(output)).rows == 200
+        assert 'written to' in capsys.readouterr().out
+
+
+class TestDriftEndpoint:
+    """Test that prediction routes feed the monitor and /api/v1/drift reports it"""
+
+    @pytest.mark.unit
+    def test_routes_update_the_monitor(self, flask_app_module, monkeypatch, sample_form_data, baseline):
+        stub = ConstantModel()
+        monitor = DriftMonitor(baseline, interval=0, min_rows=1)
+        monkeypatch.setattr(flask_app_module, 'model', stub)
+        monkeypatch.setattr(flask_app_module, 'warmed_model', stub)
+        monkeypatch.setattr(flask_app_module, 'prediction_cache', None)
+        monkeypatch.setattr(flask_app_module, 'drift_monitor', monitor)
+        monkeypatch.setattr(flask_app_module, 'ADMIN_TOKEN', 's3cret')
+        client = flask_app_module.app.test_client()
+
+        client.post('/predict', data=sample_form_data)
+        client.post('/api/v1/predict', json={'columns': {name: [1, 2, 3] for name in FEATURE_NAMES}})
+        csv_body = ','.join(FEATURE_NAMES) + '\n' + ','.join(['1'] * 8) + '\n'
+        client.post('/api/v1/predict/csv', data={'file': (io.BytesIO(csv_body.encode()), 'rows.csv')}).get_data()
+
+        assert client.get('/api/v1/drift?refresh=1').status_code == 403
+        assert client.get('/api/v1/drift').get_json()['status'] == 'not_evaluated'
+        assert monitor.evaluations == 0
+        report = client.get('/api/v1/drift?refresh=1', headers={'X-Admin-Token': 's3cret'}).get_json()
+        assert report['window']['rows'] == 5
+        assert set(report['window']['features']) == set(FEATURE_NAMES)
+        assert client.get('/api/v1/drift').get_json() == report
+        assert 'zomato_feature_drift_psi{feature="votes",period="window"}' in client.get('/metrics').get_data(as_text=True)
+
+    @pytest.mark.unit
+    def test_disabled(self, flask_app_module, monkeypatch):
+        monkeypatch.setattr(flask_app_module, 'drift_monitor', None)
+        assert flask_app_module.app.test_client().get('/api/v1/drift').status_code == 404
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
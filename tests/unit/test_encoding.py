@@ -0,0 +1,189 @@
+"""
+Unit tests for server-side encoding of raw feature values
+"""
+import pytest
+import numpy as np
+
+from encoding import UNKNOWN_CODE, CategoricalEncoder, UnknownCategoryError
+from features import FEATURE_NAMES, PayloadError
+from tests.fixtures.sample_data import RowSumModel
+
+VOCABULARIES = {
+    'location': ['BTM', 'Banashankari', 'Koramangala 5th Block'],
+    'rest_type': ['Cafe', 'Casual Dining', 'Quick Bites'],
+    'cuisines': ['Biryani', 'North Indian, Chinese', 'South Indian'],
+    'menu_item': ["['Masala Dosa', 'Idli']", '[]'],
+}
+
+
+def make_raw_row(**overrides):
+    row = {
+        'online_order': 'Yes', 'book_table': 'No', 'votes': 775, 'location': 'Banashankari',
+        'rest_type': 'Casual Dining', 'cuisines': 'North Indian, Chinese', 'cost': '1,200',
+        'menu_item': '[]',
+    }
+    row.update(overrides)
+    return row
+
+
+class TestCategoricalEncoder:
+    """Test the per-column lookup indexes and the unknown-category policies"""
+
+    @pytest.mark.unit
+    def test_encodes_like_label_encoder(self):
+        """Test that codes are positions in the sorted vocabularies"""
+        matrix, unknown = CategoricalEncoder(VOCABULARIES).encode_payload({'instances': [make_raw_row()]})
+        assert matrix.dtype == np.float32
+        assert matrix.flags['C_CONTIGUOUS']
+        assert matrix[0].tolist() == [1, 0, 775, 1, 1, 1, 1200, 1]
+        assert unknown == {}
+
+    @pytest.mark.unit
+    def test_lenient_match(self):
+        """Test that case and repeated whitespace are ignored when there is no exact match"""
+        row = make_raw_row(location='  koramangala   5TH block', rest_type='quick bites')
+        matrix, _ = CategoricalEncoder(VOCABULARIES).encode_payload({'instances': [row]})
+        assert matrix[0, FEATURE_NAMES.index('location')] == 2
+        assert matrix[0, FEATURE_NAMES.index('rest_type')] == 2
+
+    @pytest.mark.unit
+    def test_rejects_unknown(self):
+        """Test that unseen categories are reported by column under 'reject'"""
+        rows = [make_raw_row(location='Atlantis'), make_raw_row(cuisines='Martian'),
+                make_raw_row(location='Atlantis')]
+        with pytest.raises(UnknownCategoryError) as excinfo:
+            CategoricalEncoder(VOCABULARIES).encode_payload({'instances': rows})
+        assert excinfo.value.unknown == {'location': ['Atlantis'], 'cuisines': ['Martian']}
+        assert isinstance(excinfo.value, PayloadError)
+
+    @pytest.mark.unit
+    def test_fallback_unknown(self):
+        """Test that unseen categories get UNKNOWN_CODE under 'fallback'"""
+        encoder = CategoricalEncoder(VOCABULARIES, unknown='fallback')
+        matrix, unknown = encoder.encode_payload({'instances': [make_raw_row(location='Atlantis')]})
+        assert matrix[0, FEATURE_NAMES.index('location')] == UNKNOWN_CODE
+        assert unknown == {'location': ['Atlantis']}
+
+    @pytest.mark.unit
+    def test_columns_payload(self):
+        """Test that column-oriented payloads produce the same matrix"""
+        encoder = CategoricalEncoder(VOCABULARIES)
+        rows = [make_raw_row(), make_raw_row(book_table='yes', cost=300, location='BTM')]
+        columns = {name: [row[name] for row in rows] for name in FEATURE_NAMES}
+        np.testing.assert_array_equal(encoder.encode_payload({'columns': columns})[0],
+                                      encoder.encode_payload({'instances': rows})[0])
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('payload', [
+        [],
+        {'instances': [{'votes': 1}]},
+        {'instances': [make_raw_row(location=3)]},
+        {'instances': [make_raw_row(online_order='Maybe')]},
+        {'instances': [make_raw_row(cost='cheap')]},
+        {'instances': [make_raw_row(votes=float('nan'))]},
+        {'instances': [make_raw_row(cost=10 ** 400)]},
+        {'columns': {name: ['BTM'] for name in FEATURE_NAMES[:-1]}},
+        {'columns': {name: 5 for name in FEATURE_NAMES}},
+        {'columns': dict({name: [1] for name in FEATURE_NAMES}, votes='1')},
+    ])
+    def test_invalid_payloads(self, payload):
+        with pytest.raises(PayloadError):
+            CategoricalEncoder(VOCABULARIES).encode_payload(payload)
+
+    @pytest.mark.unit
+    def test_form_values(self):
+        """Test that integer codes pass through and raw strings are encoded"""
+        encoder = CategoricalEncoder(VOCABULARIES)
+        assert encoder.encode_form(['1', '0', '775', '1', '1', '1', '1200', '1']) == [1, 0, 775, 1, 1, 1, 1200, 1]
+        raw = list(make_raw_row().values())
+        assert encoder.encode_form(raw) == [1, 0, 775, 1, 1, 1, 1200.0, 1]
+        with pytest.raises(UnknownCategoryError):
+            encoder.encode_form(list(make_raw_row(menu_item='Pizza').values()))
+        with pytest.raises(PayloadError):
+            encoder.encode_form(['1', '0', '775', '1', '1', '1', '1200'])
+        with pytest.raises(PayloadError):
+            encoder.encode_form(['1', '0', '775', '1', '1', '1', '1200', '1', '1'])
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('votes, cost', [('nan', '1200'), ('775', 'inf'), ('-Infinity', '1200'), ('775', '1e40')])
+    def test_form_rejects_non_finite_numbers(self, votes, cost):
+        with pytest.raises(PayloadError):
+            CategoricalEncoder(VOCABULARIES).encode_form(['1', '0', votes, '1', '1', '1', cost, '1'])
+
+    @pytest.mark.unit
+    def test_invalid_configuration(self):
+        with pytest.raises(ValueError):
+            CategoricalEncoder(VOCABULARIES, unknown='ignore')
+        with pytest.raises(ValueError):
+            CategoricalEncoder({'location': ['BTM']})
+
+
+class TestRawPredictRoute:
+    """Test the /api/v1/predict/raw route"""
+
+    @pytest.fixture
+    def model(self, flask_app_module, monkeypatch):
+        stub = RowSumModel()
+        monkeypatch.setattr(flask_app_module, 'model', stub)
+        monkeypatch.setattr(flask_app_module, 'warmed_model', stub)
+        monkeypatch.setattr(flask_app_module, 'category_encoder', CategoricalEncoder(VOCABULARIES))
+        return stub
+
+    @pytest.fixture
+    def client(self, flask_app_module):
+        return flask_app_module.app.test_client()
+
+    @pytest.mark.unit
+    def test_scores_raw_rows(self, client, model):
+        response = client.post('/api/v1/predict/raw', json={'instances': [make_raw_row()] * 3})
+        assert response.status_code == 200
+        body = response.get_json()
+        assert body['count'] == 3
+        assert body['predictions'][0] == pytest.approx((1 + 775 + 3 + 1200 + 1) / 1000.0)
+        assert len(model.calls) == 1
+
+    @pytest.mark.unit
+    def test_unknown_category(self, client, model):
+        """Test that unseen categories answer 400 and name the offending values"""
+        response = client.post('/api/v1/predict/raw', json={'instances': [make_raw_row(location='Atlantis')]})
+        assert response.status_code == 400
+        assert response.get_json()['unknown_categories'] == {'location': ['Atlantis']}
+        assert model.calls == []
+
+    @pytest.mark.unit
+    def test_scalar_columns(self, client, model):
+        response = client.post('/api/v1/predict/raw', json={'columns': {name: 5 for name in FEATURE_NAMES}})
+        assert response.status_code == 400
+        assert model.calls == []
+
+    @pytest.mark.unit
+    def test_fallback_reports_unknown(self, client, model, flask_app_module, monkeypatch):
+        monkeypatch.setattr(flask_app_module, 'category_encoder',
+                            CategoricalEncoder(VOCABULARIES, unknown='fallback'))
+        response = client.post('/api/v1/predict/raw', json={'instances': [make_raw_row(location='Atlantis')]})
+        assert response.status_code == 200
+        assert response.get_json()['unknown_categories'] == {'location': ['Atlantis']}
+
+    @pytest.mark.unit
+    def test_without_vocabularies(self, client, model, flask_app_module, monkeypatch):
+        """Test that the route reports 503 when no vocabularies are loaded"""
+        monkeypatch.setattr(flask_app_module, 'category_encoder', None)
+        response = client.post('/api/v1/predict/raw', json={'instances': [make_raw_row()]})
+        assert response.status_code == 503
+
+    @pytest.mark.unit
+    def test_form_accepts_raw_values(self, client, model):
+        """Test that the HTML form encodes raw strings server-side"""
+        response = client.post('/predict', data=make_raw_row())
+        assert response.status_code == 200
+        assert b'Your Rating is' in response.data
+
+    @pytest.mark.unit
+    def test_form_rejects_non_finite_numbers(self, client, model):
+        response = client.post('/predict', data=make_raw_row(votes='nan', cost='inf'))
+        assert b'Error: Invalid input.' in response.data
+        assert model.calls == []
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
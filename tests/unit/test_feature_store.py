@@ -0,0 +1,167 @@
+"""
+Unit tests for the per-restaurant feature store and /api/v1/predict/by-id
+"""
+import pytest
+import numpy as np
+
+from dataset import build_cache, default_cache_dir
+from feature_store import FeatureStore, UnknownRestaurantError
+from features import FEATURE_NAMES, PayloadError
+from tests.fixtures.sample_data import RowSumModel
+
+CSV = """,online_order,book_table,rate,votes,location,rest_type,cuisines,cost,menu_item
+0,1,1,4.1,775,1,20,1386,800.0,5047
+1,1,0,4.1,787,1,20,594,800.0,5047
+2,0,0,3.8,918,1,16,484,800.0,5047
+5,0,0,3.7,88,1,62,1587,300.0,5047
+"""
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'Zomato_df.csv'
+    path.write_text(CSV)
+    return str(path)
+
+
+@pytest.fixture
+def store(source):
+    return FeatureStore.from_dataset(source)
+
+
+class TestFeatureStore:
+    """Test building the store and resolving IDs"""
+
+    @pytest.mark.unit
+    def test_lookup_in_request_order(self, store):
+        matrix = store.lookup([5, 0, 5])
+        assert matrix.dtype == np.float32
+        assert matrix.flags['C_CONTIGUOUS']
+        assert matrix[0].tolist() == [0, 0, 88, 1, 62, 1587, 300, 5047]
+        assert matrix[1].tolist() == [1, 1, 775, 1, 20, 1386, 800, 5047]
+        np.testing.assert_array_equal(matrix[0], matrix[2])
+
+    @pytest.mark.unit
+    def test_unknown_ids(self, store):
+        """Test that every missing ID is reported, including past the last key"""
+        with pytest.raises(UnknownRestaurantError) as excinfo:
+            store.lookup([0, 3, 99, 3, -1])
+        assert excinfo.value.unknown == [-1, 3, 99]
+
+    @pytest.mark.unit
+    def test_lookup_returns_a_copy(self, store):
+        """Test that overriding a looked-up row leaves the store unchanged"""
+        matrix = store.lookup([0])
+        matrix[0, 0] = 42
+        assert store.lookup([0])[0, 0] == 1
+        assert not store.features.flags.writeable
+
+    @pytest.mark.unit
+    def test_unsorted_and_duplicate_keys(self):
+        features = np.arange(24, dtype=np.float32).reshape(3, 8)
+        store = FeatureStore([30, 10, 20], features)
+        assert store.keys.tolist() == [10, 20, 30]
+        assert store.lookup([30])[0].tolist() == features[0].tolist()
+        with pytest.raises(ValueError):
+            FeatureStore([1, 2, 1], features)
+
+    @pytest.mark.unit
+    def test_positional_keys(self):
+        """Test that a table without a restaurant_id column is keyed by row"""
+        columns = {name: np.array([j, j + 10]) for j, name in enumerate(FEATURE_NAMES)}
+        store = FeatureStore.from_columns(columns)
+        assert store.lookup([1])[0].tolist() == [10 + j for j in range(8)]
+
+    @pytest.mark.unit
+    def test_from_cache_directory(self, source, store):
+        build_cache(source)
+        cached = FeatureStore.from_dataset(default_cache_dir(source))
+        np.testing.assert_array_equal(cached.keys, store.keys)
+        np.testing.assert_array_equal(cached.features, store.features)
+
+
+class TestFeatureStorePayloads:
+    """Test the ids and instances payloads and their overrides"""
+
+    @pytest.mark.unit
+    def test_overrides_apply_to_every_row(self, store):
+        matrix = store.payload_to_matrix({'ids': [0, 1], 'overrides': {'cost': 500, 'online_order': 0}})
+        assert matrix[:, FEATURE_NAMES.index('cost')].tolist() == [500, 500]
+        assert matrix[:, FEATURE_NAMES.index('online_order')].tolist() == [0, 0]
+        assert matrix[:, FEATURE_NAMES.index('votes')].tolist() == [775, 787]
+
+    @pytest.mark.unit
+    def test_per_instance_overrides(self, store):
+        matrix = store.payload_to_matrix({'instances': [{'id': 0, 'cost': 500}, {'id': 1}]})
+        assert matrix[:, FEATURE_NAMES.index('cost')].tolist() == [500, 800]
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('payload', [
+        [],
+        {},
+        {'ids': 'all'},
+        {'ids': [0.5]},
+        {'ids': ['0']},
+        {'ids': [0], 'overrides': {'rate': 4.5}},
+        {'ids': [0], 'overrides': {'cost': 'cheap'}},
+        {'ids': [0], 'overrides': {'cost': 1e40}},
+        {'ids': [0], 'overrides': {'votes': 10 ** 400}},
+        {'instances': [{'id': 0, 'cost': 1e40}]},
+        {'ids': [0], 'overrides': [500]},
+        {'instances': [{'cost': 500}]},
+        {'instances': [{'id': 0, 'cost': None}]},
+    ])
+    def test_invalid_payloads(self, store, payload):
+        with pytest.raises(PayloadError):
+            store.payload_to_matrix(payload)
+
+
+class TestPredictByIdRoute:
+    """Test the /api/v1/predict/by-id route"""
+
+    @pytest.fixture
+    def model(self, flask_app_module, store, monkeypatch):
+        stub = RowSumModel()
+        monkeypatch.setattr(flask_app_module, 'model', stub)
+        monkeypatch.setattr(flask_app_module, 'warmed_model', stub)
+        monkeypatch.setattr(flask_app_module, 'feature_store', store)
+        return stub
+
+    @pytest.fixture
+    def client(self, flask_app_module):
+        return flask_app_module.app.test_client()
+
+    @pytest.mark.unit
+    def test_scores_ids_in_one_call(self, client, model, store):
+        response = client.post('/api/v1/predict/by-id', json={'ids': [5, 0], 'overrides': {'cost': 500}})
+        assert response.status_code == 200
+        body = response.get_json()
+        assert body['count'] == 2
+        assert len(model.calls) == 1
+        expected = store.lookup([5, 0])
+        expected[:, FEATURE_NAMES.index('cost')] = 500
+        assert body['predictions'] == pytest.approx((expected.sum(axis=1) / 1000.0).tolist())
+
+    @pytest.mark.unit
+    def test_unknown_ids(self, client, model):
+        """Test that unknown restaurants answer 404 without calling the model"""
+        response = client.post('/api/v1/predict/by-id', json={'ids': [0, 7]})
+        assert response.status_code == 404
+        assert response.get_json()['unknown_ids'] == [7]
+        assert model.calls == []
+
+    @pytest.mark.unit
+    def test_invalid_payload(self, client, model):
+        response = client.post('/api/v1/predict/by-id', json={'ids': [0], 'overrides': {'stars': 5}})
+        assert response.status_code == 400
+
+    @pytest.mark.unit
+    def test_without_store(self, client, model, flask_app_module, monkeypatch):
+        """Test that the route reports 503 when no feature store is loaded"""
+        monkeypatch.setattr(flask_app_module, 'feature_store', None)
+        response = client.post('/api/v1/predict/by-id', json={'ids': [0]})
+        assert response.status_code == 503
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
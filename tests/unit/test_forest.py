@@ -0,0 +1,96 @@
+"""
+Unit tests for the flattened forest inference engine
+"""
+import pytest
+import numpy as np
+
+from forest import FALLBACK_MIN_ROWS, FlatForest, compile_model
+
+
+@pytest.fixture(scope="module")
+def flat(trained_forest):
+    model, _ = trained_forest
+    return FlatForest.from_sklearn(model)
+
+
+class TestFlatForest:
+    """Test that FlatForest reproduces the sklearn forest it was built from"""
+
+    @pytest.mark.unit
+    def test_layout(self, flat, trained_forest):
+        """Test that all trees are concatenated into one set of arrays"""
+        model, _ = trained_forest
+        assert flat.n_estimators == len(model.estimators_)
+        assert flat.n_nodes == sum(e.tree_.node_count for e in model.estimators_)
+        for array in (flat.feature, flat.threshold, flat.children, flat.value):
+            assert array.flags['C_CONTIGUOUS']
+
+    @pytest.mark.unit
+    def test_matches_sklearn_predictions(self, flat, trained_forest):
+        """Test that batch predictions match ExtraTreesRegressor.predict"""
+        model, X = trained_forest
+        np.testing.assert_allclose(flat.predict(X.values), model.predict(X), rtol=1e-9, atol=1e-12)
+
+    @pytest.mark.unit
+    def test_matches_sklearn_on_unseen_rows(self, flat, trained_forest):
+        """Test agreement on inputs outside the training rows, including split boundaries"""
+        model, X = trained_forest
+        rng = np.random.RandomState(7)
+        unseen = X.sample(200, replace=True, random_state=7) + rng.randint(-3, 4, size=(200, 8))
+        np.testing.assert_allclose(flat.predict(unseen.values), model.predict(unseen), rtol=1e-9)
+
+        thresholds = model.estimators_[0].tree_.threshold
+        features = model.estimators_[0].tree_.feature
+        boundary = X.values[:1].astype(float).copy()
+        boundary[0, features[0]] = thresholds[0]
+        assert flat.predict(boundary)[0] == pytest.approx(model.predict(boundary)[0])
+
+    @pytest.mark.unit
+    def test_single_row_inputs(self, flat, trained_forest):
+        """Test the input shapes app.py passes for a single form submission"""
+        model, X = trained_forest
+        row = X.values[3]
+        expected = model.predict(X.iloc[[3]])[0]
+        assert flat.predict([row])[0] == pytest.approx(expected)
+        assert flat.predict(row)[0] == pytest.approx(expected)
+
+    @pytest.mark.unit
+    def test_rejects_wrong_feature_count(self, flat):
+        """Test that inputs with the wrong width are refused"""
+        with pytest.raises(ValueError):
+            flat.predict(np.zeros((2, 7)))
+
+
+class TestCompileModel:
+    """Test compile_model's handling of non-forest models"""
+
+    @pytest.mark.unit
+    def test_compiles_forest(self, trained_forest):
+        model, _ = trained_forest
+        assert isinstance(compile_model(model), FlatForest)
+
+    @pytest.mark.unit
+    def test_large_matrices_fall_back_on_sklearn(self, trained_forest, monkeypatch):
+        """Test that only matrices of FALLBACK_MIN_ROWS rows or more go to the sklearn model"""
+        model, X = trained_forest
+        flat = compile_model(model)
+        assert flat.fallback.estimators_ is model.estimators_
+        assert hasattr(model, 'feature_names_in_')
+        np.testing.assert_allclose(flat.predict(X.values), model.predict(X), rtol=1e-9)
+
+        monkeypatch.setattr(flat, 'apply', lambda X: pytest.fail('walked a large matrix'))
+        assert len(flat.predict(X.values[:FALLBACK_MIN_ROWS])) == FALLBACK_MIN_ROWS
+        monkeypatch.undo()
+        monkeypatch.setattr(flat.fallback, 'predict', lambda X: pytest.fail('sent a small matrix to sklearn'))
+        assert len(flat.predict(X.values[:FALLBACK_MIN_ROWS - 1])) == FALLBACK_MIN_ROWS - 1
+
+    @pytest.mark.unit
+    def test_passes_through_other_models(self, sample_model):
+        """Test that mocks and already-flat models are returned unchanged"""
+        assert compile_model(sample_model) is sample_model
+        flat = FlatForest([0], [np.inf], [[0, 0]], [4.2], [0], n_features=8, max_depth=0)
+        assert compile_model(flat) is flat
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
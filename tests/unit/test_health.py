@@ -0,0 +1,101 @@
+"""
+Unit tests for the liveness and readiness endpoints
+"""
+import time
+
+import pytest
+import numpy as np
+
+from features import FEATURE_NAMES
+from forest import FlatForest
+
+
+def constant_forest(value):
+    """Single-leaf forest predicting the same rating for every row"""
+    return FlatForest([0], [np.inf], [[0, 0]], [value], [0], n_features=8, max_depth=0)
+
+
+class BrokenModel:
+    def predict(self, X):
+        return np.full(len(X), np.nan)
+
+
+def wait_for_status(client, status_code, timeout=5):
+    deadline = time.time() + timeout
+    while True:
+        response = client.get('/readyz')
+        if response.status_code == status_code or time.time() > deadline:
+            return response
+        time.sleep(0.01)
+
+
+class TestHealthEndpoints:
+    """Test /healthz, /readyz and the optional not-ready gate"""
+
+    @pytest.fixture
+    def app_module(self, flask_app_module, monkeypatch):
+        monkeypatch.setattr(flask_app_module, 'warmed_model', None)
+        monkeypatch.setattr(flask_app_module, 'warmup_error', None)
+        monkeypatch.setattr(flask_app_module, '_warmup_model', None)
+        monkeypatch.setattr(flask_app_module, 'model_version', 'test')
+        return flask_app_module
+
+    @pytest.mark.unit
+    def test_healthz_always_ok(self, app_module, monkeypatch):
+        monkeypatch.setattr(app_module, 'model', None)
+        response = app_module.app.test_client().get('/healthz')
+        assert response.status_code == 200
+        assert response.get_json() == {'status': 'ok'}
+
+    @pytest.mark.unit
+    def test_readyz_without_model(self, app_module, monkeypatch):
+        monkeypatch.setattr(app_module, 'model', None)
+        response = app_module.app.test_client().get('/readyz')
+        assert response.status_code == 503
+        assert response.get_json()['reason'] == 'Model not loaded'
+
+    @pytest.mark.unit
+    def test_readyz_after_warm_up(self, app_module, monkeypatch):
+        """Test that the first request starts the warm-up and readiness follows"""
+        monkeypatch.setattr(app_module, 'model', constant_forest(4.0))
+        response = wait_for_status(app_module.app.test_client(), 200)
+        assert response.status_code == 200
+        assert response.get_json() == {'status': 'ready', 'model_version': 'test'}
+
+    @pytest.mark.unit
+    def test_readyz_reports_failed_warm_up(self, app_module, monkeypatch):
+        monkeypatch.setattr(app_module, 'model', BrokenModel())
+        client = app_module.app.test_client()
+        deadline = time.time() + 5
+        while app_module.warmup_error is None and time.time() < deadline:
+            client.get('/readyz')
+            time.sleep(0.01)
+
+        response = client.get('/readyz')
+        assert response.status_code == 503
+        assert response.get_json()['reason'].startswith('Warm-up failed')
+
+    @pytest.mark.unit
+    def test_installed_model_is_ready(self, app_module):
+        """Test that a hot-reloaded model, already validated, is ready at once"""
+        app_module.install_model(constant_forest(2.0), 'v2')
+        assert app_module.app.test_client().get('/readyz').status_code == 200
+
+    @pytest.mark.unit
+    def test_reject_until_ready(self, app_module, monkeypatch):
+        """Test that prediction routes answer 503 while the model is not warm"""
+        monkeypatch.setattr(app_module, 'REJECT_UNTIL_READY', True)
+        monkeypatch.setattr(app_module, 'model', BrokenModel())
+        monkeypatch.setattr(app_module, '_warmup_model', app_module.model)
+        monkeypatch.setattr(app_module, '_warmup_pid', app_module.os.getpid())
+        client = app_module.app.test_client()
+        rows = {'instances': [{name: 1 for name in FEATURE_NAMES}]}
+
+        response = client.post('/api/v1/predict', json=rows)
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+        assert client.get('/healthz').status_code == 200
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
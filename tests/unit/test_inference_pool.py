@@ -0,0 +1,142 @@
+"""
+Unit tests for the shared-memory inference process pool
+"""
+import time
+from multiprocessing import shared_memory
+
+import pytest
+import numpy as np
+
+from forest import FlatForest
+from inference_pool import InferencePool, PoolSaturated, SharedForest, attach_forest
+
+
+@pytest.fixture(scope="module")
+def flat(trained_forest):
+    return FlatForest.from_sklearn(trained_forest[0])
+
+
+class TestSharedForest:
+    """Test copying a forest into shared memory and attaching to it"""
+
+    @pytest.mark.unit
+    def test_attach_without_copy(self, flat, trained_forest):
+        """Test that the attached forest reads straight from the shared block"""
+        _, X = trained_forest
+        shared = SharedForest(flat)
+        try:
+            attached, block = attach_forest(shared.spec)
+            for array in attached.arrays().values():
+                assert not array.flags.owndata
+                assert not array.flags.writeable
+            np.testing.assert_array_equal(attached.predict(X.values), flat.predict(X.values))
+            del attached
+            block.close()
+        finally:
+            shared.release()
+
+    @pytest.mark.unit
+    def test_release_unlinks_block(self, flat):
+        shared = SharedForest(flat)
+        name = shared.spec['name']
+        shared.release()
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+
+class TestInferencePool:
+    """Test prediction, back-pressure and reloading in worker processes"""
+
+    @pytest.mark.unit
+    def test_predictions_match_in_process_forest(self, flat, trained_forest):
+        _, X = trained_forest
+        pool = InferencePool(flat, processes=1)
+        try:
+            np.testing.assert_array_equal(pool.predict(X.values, timeout=60), flat.predict(X.values))
+            assert pool.queue_depth == 0
+        finally:
+            pool.close()
+
+    @pytest.mark.unit
+    def test_queue_depth_limit(self, flat):
+        """Test that submissions beyond the depth limit are refused"""
+        pool = InferencePool(flat, processes=1, max_queue_depth=1)
+        try:
+            first = pool.submit(np.zeros((5000, 8)))
+            with pytest.raises(PoolSaturated):
+                pool.submit(np.zeros((1, 8)))
+            first.result(60)
+        finally:
+            pool.close()
+
+    @pytest.mark.unit
+    def test_reload_switches_forest_and_recycles_workers(self, flat, trained_forest):
+        """Test that a reload serves the new forest and releases the old block"""
+        _, X = trained_forest
+        pool = InferencePool(flat, processes=1)
+        try:
+            old_name = pool._shared.spec['name']
+            in_flight = pool.submit(X.values)
+
+            constant = FlatForest([0], [np.inf], [[0, 0]], [1.5], [0], n_features=8, max_depth=0)
+            pool.reload(constant)
+
+            np.testing.assert_array_equal(in_flight.result(60), flat.predict(X.values))
+            assert pool.predict(X.values[:3], timeout=60).tolist() == [1.5] * 3
+            assert pool.model is constant
+
+            deadline = time.time() + 30
+            while time.time() < deadline:
+                try:
+                    shared_memory.SharedMemory(name=old_name).close()
+                except FileNotFoundError:
+                    break
+                time.sleep(0.05)
+            else:
+                pytest.fail('Old shared forest was not released')
+        finally:
+            pool.close()
+
+
+class TestBatchRouteWithPool:
+    """Test that the JSON API hands matrices to the pool serving the model"""
+
+    class FakePool:
+        def __init__(self, model, saturated=False):
+            self.model = model
+            self.saturated = saturated
+            self.submitted = []
+
+        def predict(self, X):
+            if self.saturated:
+                raise PoolSaturated('full')
+            self.submitted.append(X)
+            return np.full(len(X), 3.3)
+
+    @pytest.fixture
+    def client(self, flask_app_module, monkeypatch, flat):
+        monkeypatch.setattr(flask_app_module, 'model', flat)
+        return flask_app_module.app.test_client()
+
+    @pytest.mark.unit
+    def test_batch_runs_in_pool(self, client, flask_app_module, monkeypatch, flat, trained_forest):
+        pool = self.FakePool(flat)
+        monkeypatch.setattr(flask_app_module, 'inference_pool', pool)
+        columns = {name: trained_forest[1][name].tolist()[:4] for name in trained_forest[1].columns}
+
+        response = client.post('/api/v1/predict', json={'columns': columns})
+        assert response.get_json()['predictions'] == [3.3] * 4
+        assert pool.submitted[0].shape == (4, 8)
+
+    @pytest.mark.unit
+    def test_saturated_pool_returns_503(self, client, flask_app_module, monkeypatch, flat, trained_forest):
+        monkeypatch.setattr(flask_app_module, 'inference_pool', self.FakePool(flat, saturated=True))
+        columns = {name: trained_forest[1][name].tolist()[:4] for name in trained_forest[1].columns}
+
+        response = client.post('/api/v1/predict', json={'columns': columns})
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
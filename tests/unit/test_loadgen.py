@@ -0,0 +1,171 @@
+"""
+Unit tests for the load generator
+"""
+import asyncio
+import json
+import threading
+import urllib.parse
+
+import pytest
+import numpy as np
+from werkzeug.serving import make_server
+
+import loadgen
+from features import FEATURE_NAMES
+from tests.fixtures.sample_data import ConstantModel
+
+
+@pytest.fixture
+def server(flask_app_module, monkeypatch):
+    """The app with a stub model, served by werkzeug on a free local port"""
+    stub = ConstantModel()
+    monkeypatch.setattr(flask_app_module, 'model', stub)
+    monkeypatch.setattr(flask_app_module, 'warmed_model', stub)
+    monkeypatch.setattr(flask_app_module, 'prediction_cache', None)
+    httpd = make_server('127.0.0.1', 0, flask_app_module.app, threaded=True)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_port
+    httpd.shutdown()
+    thread.join()
+
+
+def rows(n):
+    return np.arange(n * 8, dtype=np.float32).reshape(n, 8) % 50 + 1
+
+
+class TestRequests:
+    """Test building requests from dataset rows and recorded logs"""
+
+    @pytest.mark.unit
+    def test_form_and_api_requests(self):
+        forms = loadgen.rows_to_requests(rows(3))
+        assert len(forms) == 3
+        assert urllib.parse.parse_qs(forms[0].body.decode())['Votes'] == ['3']
+
+        batches = loadgen.rows_to_requests(rows(5), 'api', batch_size=2)
+        assert [len(json.loads(r.body)['columns']['votes']) for r in batches] == [2, 2, 1]
+        assert batches[0].path == '/api/v1/predict'
+
+    @pytest.mark.unit
+    def test_dataset_requests(self, tmp_path):
+        path = tmp_path / 'data.csv'
+        path.write_text(','.join(FEATURE_NAMES) + '\n' + '\n'.join(
+            ','.join(str(i + j) for j in range(8)) for i in range(20)) + '\n')
+        requests = loadgen.dataset_requests(str(path), 'api', batch_size=4, n_requests=5)
+        assert len(requests) == 5
+        votes = json.loads(requests[0].body)['columns']['votes']
+        assert all(2 <= v < 22 for v in votes)
+
+    @pytest.mark.unit
+    def test_read_log(self, tmp_path):
+        path = tmp_path / 'log.jsonl'
+        lines = [
+            {'t': 0.0, 'path': '/api/v1/predict', 'json': {'instances': []}},
+            {'t': 0.5, 'path': '/predict', 'form': {'Votes': '3'}},
+            dict({name: 1 for name in FEATURE_NAMES}, t=1.5),
+            {'path': '/healthz'},
+        ]
+        path.write_text('\n'.join(json.dumps(line) for line in lines) + '\n\n')
+        entries = loadgen.read_log(str(path))
+        assert [offset for offset, _ in entries] == [0.0, 0.5, 1.5, None]
+        assert [request.path for _, request in entries] == ['/api/v1/predict', '/predict', '/predict', '/healthz']
+        assert entries[3][1].method == 'GET'
+
+    @pytest.mark.unit
+    def test_read_log_reports_bad_line(self, tmp_path):
+        path = tmp_path / 'log.jsonl'
+        path.write_text('{"path": "/predict", "form": {}}\n{"votes": 1}\n')
+        with pytest.raises(ValueError, match='line 2'):
+            loadgen.read_log(str(path))
+
+
+class TestReporting:
+    """Test latency summaries, arrival schedules and saturation"""
+
+    @pytest.mark.unit
+    def test_summary(self):
+        results = loadgen.Results()
+        for i in range(1, 100):
+            results.record(i / 1000, 200)
+        results.record(0.5, 503)
+        results.record(0.5, 'timeout')
+        summary = results.summary(offered_rate=50)
+        assert summary['requests'] == 101
+        assert summary['errors'] == {'503': 1, 'timeout': 1}
+        assert summary['error_rate'] == pytest.approx(2 / 101, abs=1e-4)
+        assert summary['latency_ms_p50'] == pytest.approx(50)
+        assert summary['latency_ms_max'] == pytest.approx(99)
+        assert summary['offered_rps'] == 50
+
+    @pytest.mark.unit
+    def test_arrival_offsets(self):
+        poisson = loadgen.arrival_offsets(100, 20, seed=1)
+        assert len(poisson) == 2000 and poisson[0] == 0
+        assert np.all(np.diff(poisson) >= 0)
+        assert poisson[-1] == pytest.approx(20, rel=0.1)
+        assert np.allclose(np.diff(loadgen.arrival_offsets(10, 1, poisson=False)), 0.1)
+
+    @pytest.mark.unit
+    def test_saturated(self):
+        healthy = {'offered_rps': 100, 'throughput_rps': 99, 'error_rate': 0.0, 'latency_ms_p99': 20}
+        assert not loadgen.saturated(healthy, slo_ms=100, max_error_rate=0.01)
+        assert loadgen.saturated(dict(healthy, throughput_rps=80), 100, 0.01)
+        assert loadgen.saturated(dict(healthy, latency_ms_p99=150), 100, 0.01)
+        assert loadgen.saturated(dict(healthy, error_rate=0.05), 100, 0.01)
+
+    @pytest.mark.unit
+    def test_parse_ramp(self):
+        assert loadgen.parse_ramp('100:300:100') == [100, 200, 300]
+        with pytest.raises(Exception):
+            loadgen.parse_ramp('300:100:100')
+
+
+class TestLoad:
+    """Test driving a local server"""
+
+    @pytest.mark.unit
+    def test_closed_loop(self, server):
+        requests = loadgen.rows_to_requests(rows(10)) + loadgen.rows_to_requests(rows(10), 'api', batch_size=5)
+
+        async def go():
+            pool = loadgen.ConnectionPool('127.0.0.1', server, limit=4)
+            try:
+                return await loadgen.run_closed_loop(pool, requests, concurrency=3)
+            finally:
+                pool.close()
+
+        results = asyncio.run(go())
+        assert results.statuses == {200: 12}
+        assert len(results.latencies) == 12
+
+    @pytest.mark.unit
+    def test_open_loop_counts_errors(self, server):
+        requests = [loadgen.json_request('/api/v1/predict', {'instances': [{'votes': 1}]}),
+                    loadgen.rows_to_requests(rows(1))[0]]
+
+        async def go():
+            pool = loadgen.ConnectionPool('127.0.0.1', server)
+            try:
+                return await loadgen.run_open_loop(pool, requests, rate=200, duration=0.1)
+            finally:
+                pool.close()
+
+        summary = asyncio.run(go()).summary(200)
+        assert summary['requests'] == 20
+        assert summary['errors'] == {'400': 10}
+        assert summary['error_rate'] == 0.5
+
+    @pytest.mark.unit
+    def test_connection_refused_is_an_error(self):
+        async def go():
+            pool = loadgen.ConnectionPool('127.0.0.1', 1, timeout=2)
+            return await loadgen.run_closed_loop(pool, loadgen.rows_to_requests(rows(2)), concurrency=1)
+
+        summary = asyncio.run(go()).summary()
+        assert summary['error_rate'] == 1.0
+        assert summary['errors'] == {'ConnectionRefusedError': 2}
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,172 @@
+"""
+Unit tests for the Prometheus metrics registry and the /metrics endpoint
+"""
+import re
+import threading
+
+import pytest
+
+from features import FEATURE_NAMES
+from metrics import Registry
+from tests.fixtures.sample_data import ConstantModel, FailingModel
+
+
+def sample_value(text, sample):
+    """Value of one sample line, e.g. 'zomato_requests_total{route="predict"}'"""
+    match = re.search('^' + re.escape(sample) + r' (\S+)$', text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+class TestRegistry:
+    """Test recording and rendering in the text exposition format"""
+
+    @pytest.mark.unit
+    def test_counter_and_gauge(self):
+        registry = Registry()
+        counter = registry.counter('app_requests_total', 'Requests', ('route',))
+        gauge = registry.gauge('app_in_flight', 'In flight')
+        counter.inc('predict')
+        counter.inc('predict', amount=2)
+        gauge.inc()
+        gauge.dec()
+        text = registry.render()
+
+        assert '# HELP app_requests_total Requests\n# TYPE app_requests_total counter\n' in text
+        assert sample_value(text, 'app_requests_total{route="predict"}') == 3
+        assert sample_value(text, 'app_in_flight') == 0
+
+    @pytest.mark.unit
+    def test_histogram_buckets_are_cumulative(self):
+        registry = Registry()
+        histogram = registry.histogram('app_rows', 'Rows', buckets=(1, 10, 100))
+        for value in (1, 5, 10, 50, 500):
+            histogram.observe(value)
+        text = registry.render()
+
+        assert sample_value(text, 'app_rows_bucket{le="1"}') == 1
+        assert sample_value(text, 'app_rows_bucket{le="10"}') == 3
+        assert sample_value(text, 'app_rows_bucket{le="100"}') == 4
+        assert sample_value(text, 'app_rows_bucket{le="+Inf"}') == 5
+        assert sample_value(text, 'app_rows_sum') == 566
+        assert sample_value(text, 'app_rows_count') == 5
+
+    @pytest.mark.unit
+    def test_threads_record_into_separate_shards(self):
+        """Test that concurrent increments from many threads are all counted"""
+        registry = Registry()
+        counter = registry.counter('app_events_total', 'Events')
+        histogram = registry.histogram('app_latency_seconds', 'Latency')
+
+        def record():
+            for _ in range(5000):
+                counter.inc()
+                histogram.observe(0.002)
+
+        threads = [threading.Thread(target=record) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        text = registry.render()
+        assert sample_value(text, 'app_events_total') == 40000
+        assert sample_value(text, 'app_latency_seconds_count') == 40000
+
+    @pytest.mark.unit
+    def test_finished_threads_fold_their_shards(self):
+        """Test that short-lived threads leave their counts but not their shards behind"""
+        registry = Registry()
+        counter = registry.counter('app_events_total', 'Events', ['kind'])
+        histogram = registry.histogram('app_latency_seconds', 'Latency')
+
+        def record():
+            counter.inc('a')
+            counter.inc('b', amount=2)
+            histogram.observe(0.002)
+
+        for _ in range(50):
+            threads = [threading.Thread(target=record) for _ in range(20)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        assert counter._shards == [] and histogram._shards == []
+        text = registry.render()
+        assert sample_value(text, 'app_events_total{kind="a"}') == 1000
+        assert sample_value(text, 'app_events_total{kind="b"}') == 2000
+        assert sample_value(text, 'app_latency_seconds_count') == 1000
+        assert sample_value(text, 'app_latency_seconds_sum') == pytest.approx(2.0)
+
+    @pytest.mark.unit
+    def test_collectors_and_label_escaping(self):
+        registry = Registry()
+        registry.collector(lambda: [('app_info', 'gauge', 'Info', [({'version': 'a"b\\c'}, 1)])])
+        assert 'app_info{version="a\\"b\\\\c"} 1' in registry.render()
+
+
+class TestMetricsEndpoint:
+    """Test what the app records per request"""
+
+    @pytest.fixture
+    def app_module(self, flask_app_module, monkeypatch):
+        stub = ConstantModel()
+        monkeypatch.setattr(flask_app_module, 'model', stub)
+        monkeypatch.setattr(flask_app_module, 'warmed_model', stub)
+        monkeypatch.setattr(flask_app_module, 'prediction_cache', None)
+        return flask_app_module
+
+    def scrape(self, client):
+        response = client.get('/metrics')
+        assert response.status_code == 200
+        assert response.mimetype == 'text/plain'
+        return response.get_data(as_text=True)
+
+    @pytest.mark.unit
+    def test_requests_latency_and_batch_sizes(self, app_module):
+        client = app_module.app.test_client()
+        before = self.scrape(client)
+        rows = {'columns': {name: [1] * 5 for name in FEATURE_NAMES}}
+        assert client.post('/api/v1/predict', json=rows).status_code == 200
+        after = self.scrape(client)
+
+        def delta(sample):
+            return (sample_value(after, sample) or 0) - (sample_value(before, sample) or 0)
+
+        assert delta('zomato_requests_total{route="predict_batch",method="POST",status="200"}') == 1
+        assert delta('zomato_request_duration_seconds_count{route="predict_batch"}') == 1
+        assert delta('zomato_forest_batch_rows_bucket{le="4"}') == 0
+        assert delta('zomato_forest_batch_rows_bucket{le="8"}') == 1
+        assert sample_value(after, 'zomato_requests_in_flight{route="predict_batch"}') == 0
+        assert sample_value(after, 'zomato_requests_in_flight{route="metrics"}') == 1
+
+    @pytest.mark.unit
+    def test_invalid_input_and_prediction_failure_are_told_apart(
+            self, app_module, monkeypatch, sample_form_data, invalid_form_data):
+        client = app_module.app.test_client()
+        before = self.scrape(client)
+        client.post('/predict', data=invalid_form_data)
+        short_form = dict(sample_form_data)
+        del short_form['Menu Item']
+        assert b'Error: Invalid input.' in client.post('/predict', data=short_form).data
+        failing = FailingModel()
+        monkeypatch.setattr(app_module, 'model', failing)
+        monkeypatch.setattr(app_module, 'warmed_model', failing)
+        response = client.post('/predict', data=sample_form_data)
+        after = self.scrape(client)
+
+        assert b'Error: Prediction failed.' in response.data
+        for error_type, count in (('invalid_input', 2), ('prediction_failed', 1)):
+            sample = f'zomato_errors_total{{route="predict",type="{error_type}"}}'
+            assert (sample_value(after, sample) or 0) - (sample_value(before, sample) or 0) == count
+
+    @pytest.mark.unit
+    def test_model_statistics(self, app_module, monkeypatch):
+        monkeypatch.setattr(app_module, 'model_version', 'model.forest@1700000000:42')
+        monkeypatch.setattr(app_module, 'model_load_seconds', 0.04)
+        text = self.scrape(app_module.app.test_client())
+        assert sample_value(text, 'zomato_model_info{version="model.forest@1700000000:42",engine="ConstantModel"}') == 1
+        assert sample_value(text, 'zomato_model_load_seconds') == 0.04
+        assert sample_value(text, 'zomato_model_ready') == 1
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
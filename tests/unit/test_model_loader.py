@@ -0,0 +1,168 @@
+"""
+Unit tests for model loading, warm-up validation and hot reloading
+"""
+import itertools
+import os
+import pickle
+import threading
+import time
+
+import pytest
+import numpy as np
+
+from features import FEATURE_NAMES
+from forest import FlatForest
+from model_loader import InvalidModelError, ModelReloader, load_model, warm_up
+
+_writes = itertools.count(1)
+
+
+def constant_forest(value):
+    """Single-leaf forest predicting the same rating for every row"""
+    return FlatForest([0], [np.inf], [[0, 0]], [value], [0], n_features=8, max_depth=0)
+
+
+def write_model(path, model):
+    with open(path, 'wb') as f:
+        pickle.dump(model, f)
+    # Give every write a distinct mtime, even on coarse-grained filesystems
+    stamp = time.time_ns() + next(_writes) * 10 ** 9
+    os.utime(path, ns=(stamp, stamp))
+
+
+class BrokenModel:
+    def predict(self, X):
+        return np.full(len(X), np.nan)
+
+
+class TestWarmUp:
+    """Test validation of freshly loaded models"""
+
+    @pytest.mark.unit
+    def test_accepts_working_model(self, trained_forest):
+        warm_up(trained_forest[0])
+        warm_up(constant_forest(4.0), n_rows=4)
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('model', [object(), BrokenModel()])
+    def test_rejects_broken_models(self, model):
+        with pytest.raises(InvalidModelError):
+            warm_up(model)
+
+    @pytest.mark.unit
+    def test_rejects_wrong_prediction_count(self, sample_model):
+        """Test that a model returning one value for a batch is refused"""
+        with pytest.raises(InvalidModelError):
+            warm_up(sample_model)
+
+
+class TestModelReloader:
+    """Test that reloads only ever install validated models"""
+
+    @pytest.fixture
+    def model_path(self, tmp_path):
+        path = str(tmp_path / 'model.pkl')
+        write_model(path, constant_forest(3.0))
+        return path
+
+    @pytest.mark.unit
+    def test_load_model_compiles_forest(self, tmp_path, trained_forest):
+        path = str(tmp_path / 'forest.pkl')
+        write_model(path, trained_forest[0])
+        assert isinstance(load_model(path), FlatForest)
+        assert not isinstance(load_model(path, engine='sklearn'), FlatForest)
+
+    @pytest.mark.unit
+    def test_reload_installs_new_model(self, model_path):
+        installed = []
+        reloader = ModelReloader(model_path, lambda m, v: installed.append((m, v)))
+        write_model(model_path, constant_forest(4.5))
+
+        ok, version = reloader.reload()
+        assert ok
+        assert installed[0][0].predict(np.zeros((1, 8)))[0] == 4.5
+        assert installed[0][1] == version
+
+    @pytest.mark.unit
+    def test_broken_artifact_is_not_installed(self, model_path):
+        installed = []
+        reloader = ModelReloader(model_path, lambda m, v: installed.append(m))
+        with open(model_path, 'wb') as f:
+            f.write(b'not a pickle')
+
+        ok, message = reloader.reload()
+        assert not ok
+        assert 'UnpicklingError' in message
+        assert installed == []
+        assert reloader.failures == 1
+
+    @pytest.mark.unit
+    def test_watcher_reloads_changed_file(self, model_path):
+        installed = threading.Event()
+        reloader = ModelReloader(model_path, lambda m, v: installed.set(), poll_interval=0.05)
+        reloader.start_watching()
+        write_model(model_path, constant_forest(2.5))
+        assert installed.wait(5)
+
+
+class TestAdminReloadRoute:
+    """Test the /admin/reload endpoint and the atomic model swap"""
+
+    @pytest.fixture
+    def app_module(self, flask_app_module, monkeypatch, tmp_path):
+        path = str(tmp_path / 'model.pkl')
+        write_model(path, constant_forest(3.5))
+        reloader = ModelReloader(path, flask_app_module.install_model)
+        monkeypatch.setattr(flask_app_module, 'model_reloader', reloader)
+        monkeypatch.setattr(flask_app_module, 'model', constant_forest(1.0))
+        monkeypatch.setattr(flask_app_module, 'model_version', 'old')
+        monkeypatch.setattr(flask_app_module, 'ADMIN_TOKEN', 's3cret')
+        return flask_app_module
+
+    @pytest.mark.unit
+    def test_requires_admin_token(self, app_module):
+        client = app_module.app.test_client()
+        assert client.post('/admin/reload').status_code == 403
+        assert client.post('/admin/reload', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+
+    @pytest.mark.unit
+    def test_reload_swaps_model(self, app_module, sample_form_data):
+        client = app_module.app.test_client()
+        response = client.post('/admin/reload', headers={'X-Admin-Token': 's3cret'})
+
+        assert response.status_code == 200
+        assert response.get_json()['version'] == app_module.model_version
+        assert b'Your Rating is: 3.5' in client.post('/predict', data=sample_form_data).data
+
+    @pytest.mark.unit
+    def test_in_flight_request_finishes_on_old_model(self, app_module, monkeypatch):
+        """Test that a swap during a prediction does not affect that prediction"""
+        started, release = threading.Event(), threading.Event()
+
+        class SlowModel:
+            def predict(self, X):
+                started.set()
+                release.wait(5)
+                return np.full(len(X), 2.0)
+
+        slow_model = SlowModel()
+        monkeypatch.setattr(app_module, 'model', slow_model)
+        monkeypatch.setattr(app_module, 'warmed_model', slow_model)
+        client = app_module.app.test_client()
+        rows = {'instances': [{name: 1 for name in FEATURE_NAMES}]}
+        responses = []
+        request_thread = threading.Thread(
+            target=lambda: responses.append(client.post('/api/v1/predict', json=rows)))
+        request_thread.start()
+        assert started.wait(5)
+
+        app_module.install_model(constant_forest(4.0), 'new')
+        release.set()
+        request_thread.join(5)
+
+        assert responses[0].get_json()['predictions'] == [2.0]
+        assert app_module.model_version == 'new'
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
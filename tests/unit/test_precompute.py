@@ -0,0 +1,178 @@
+"""
+Unit tests for the materialized prediction table
+"""
+import threading
+
+import pytest
+import numpy as np
+
+from feature_store import FeatureStore, FeatureStoreReloader
+from precompute import PredictionTable, PredictionTableKeeper
+from tests.fixtures.sample_data import RowSumModel
+
+
+def make_store(n_rows=20, offset=0):
+    features = np.arange(n_rows * 8, dtype=np.float32).reshape(n_rows, 8) + offset
+    return FeatureStore(np.arange(n_rows), features)
+
+
+def scored_rows(model):
+    return sum(len(X) for X in model.calls)
+
+
+class TestPredictionTable:
+    """Test building the table and answering known feature vectors from it"""
+
+    @pytest.mark.unit
+    def test_build_matches_live_predictions(self):
+        model, store = RowSumModel(), make_store(20)
+        table = PredictionTable.build(model, store, chunk_rows=8)
+        assert len(table) == 20
+        assert [len(X) for X in model.calls] == [8, 8, 4]
+        np.testing.assert_array_equal(table.predictions, store.features.sum(axis=1) / 1000.0)
+
+    @pytest.mark.unit
+    def test_only_novel_rows_reach_the_model(self):
+        """Test that known vectors are looked up and the rest scored in one call"""
+        model, store = RowSumModel(), make_store(20)
+        table = PredictionTable.build(model, store)
+        model.calls.clear()
+
+        novel = np.full((2, 8), 0.5, dtype=np.float32)
+        X = np.vstack([store.features[[3, 17]], novel, store.features[[3]]])
+        predictions = table.predict(X, model.predict)
+
+        np.testing.assert_array_equal(predictions, X.sum(axis=1) / 1000.0)
+        assert len(model.calls) == 1
+        np.testing.assert_array_equal(model.calls[0], novel)
+        table.predict(store.features[:5], model.predict)
+        assert len(model.calls) == 1
+
+    @pytest.mark.unit
+    def test_single_row_lookup(self):
+        model, store = RowSumModel(), make_store(5)
+        table = PredictionTable.build(model, store)
+        row = [int(value) for value in store.features[2]]
+        assert table.get(row) == pytest.approx(sum(row) / 1000.0)
+        assert table.get([0.5] * 8) is None
+
+    @pytest.mark.unit
+    def test_update_rescores_changed_rows_only(self):
+        """Test that a new store reuses the predictions of unchanged vectors"""
+        model, store = RowSumModel(), make_store(20)
+        table = PredictionTable.build(model, store)
+        model.calls.clear()
+
+        features = np.array(store.features)
+        features[4, 6] = 9999
+        grown = FeatureStore(np.arange(21), np.vstack([features, np.full((1, 8), 7, np.float32)]))
+        updated, scored = table.update(grown)
+
+        assert scored == 2 and scored_rows(model) == 2
+        assert updated.store is grown and updated.model is model
+        np.testing.assert_array_equal(updated.predictions, grown.features.sum(axis=1) / 1000.0)
+
+
+class TestPredictionTableKeeper:
+    """Test background builds as the model or the store change"""
+
+    @pytest.mark.unit
+    def test_builds_in_background(self):
+        release = threading.Event()
+
+        class BlockedModel(RowSumModel):
+            def predict(self, X):
+                release.wait(5)
+                return super().predict(X)
+
+        model, store = BlockedModel(), make_store(10)
+        keeper = PredictionTableKeeper()
+        keeper.refresh(model, store)
+        assert keeper.current(model, store) is None
+        release.set()
+        keeper.refresh(model, store, wait=True)
+
+        assert keeper.current(model, store) is not None
+        assert keeper.stats()['builds'] == 1
+        assert scored_rows(model) == 10
+
+    @pytest.mark.unit
+    def test_new_model_rebuilds_new_store_updates(self):
+        model, store = RowSumModel(), make_store(10)
+        keeper = PredictionTableKeeper()
+        keeper.refresh(model, store, wait=True)
+
+        new_store = FeatureStore(np.arange(11), np.vstack([store.features, np.ones((1, 8), np.float32)]))
+        keeper.refresh(model, new_store, wait=True)
+        assert scored_rows(model) == 11
+        assert keeper.stats()['incremental_updates'] == 1
+
+        new_model = RowSumModel()
+        keeper.refresh(new_model, new_store, wait=True)
+        assert scored_rows(new_model) == 11
+        assert keeper.current(model, new_store) is None
+        assert keeper.current(new_model, new_store) is not None
+
+    @pytest.mark.unit
+    def test_failed_build_is_reported(self):
+        class BrokenModel:
+            def predict(self, X):
+                raise RuntimeError('boom')
+
+        keeper = PredictionTableKeeper()
+        keeper.refresh(BrokenModel(), make_store(4), wait=True)
+        assert keeper.table is None
+        assert 'boom' in keeper.stats()['last_error']
+
+
+class TestPrecomputedServing:
+    """Test that the app answers known restaurants without evaluating the forest"""
+
+    @pytest.fixture
+    def app_module(self, flask_app_module, monkeypatch):
+        model, store = RowSumModel(), make_store(20)
+        monkeypatch.setattr(flask_app_module, 'model', model)
+        monkeypatch.setattr(flask_app_module, 'warmed_model', model)
+        monkeypatch.setattr(flask_app_module, 'feature_store', store)
+        monkeypatch.setattr(flask_app_module, 'prediction_tables', PredictionTableKeeper())
+        flask_app_module.refresh_prediction_table(wait=True)
+        model.calls.clear()
+        return flask_app_module
+
+    @pytest.mark.unit
+    def test_by_id_served_from_table(self, app_module):
+        client = app_module.app.test_client()
+        response = client.post('/api/v1/predict/by-id', json={'ids': [3, 4, 5]})
+        assert response.status_code == 200
+        assert response.get_json()['predictions'] == pytest.approx(
+            (app_module.feature_store.lookup([3, 4, 5]).sum(axis=1) / 1000.0).tolist())
+        assert app_module.model.calls == []
+
+    @pytest.mark.unit
+    def test_overrides_fall_through_to_forest(self, app_module):
+        """Test that a vector changed by an override is scored live"""
+        client = app_module.app.test_client()
+        response = client.post('/api/v1/predict/by-id', json={'instances': [{'id': 3}, {'id': 4, 'cost': 1}]})
+        assert response.status_code == 200
+        assert [len(X) for X in app_module.model.calls] == [1]
+
+    @pytest.mark.unit
+    def test_store_reload_updates_table(self, app_module, tmp_path):
+        """Test that a changed training table only rescores its new rows"""
+        path = tmp_path / 'Zomato_df.csv'
+        header = ',online_order,book_table,rate,votes,location,rest_type,cuisines,cost,menu_item\n'
+        rows = [f'{i},' + ','.join(str(v) for v in [*row[:2], 4.0, *row[2:]]) + '\n'
+                for i, row in enumerate(app_module.feature_store.features.astype(int).tolist())]
+        path.write_text(header + ''.join(rows) + '20,1,1,4.0,1,2,3,4,5,6\n')
+
+        reloader = FeatureStoreReloader(str(path), app_module.install_feature_store)
+        ok, _ = reloader.reload()
+        app_module.refresh_prediction_table(wait=True)
+
+        assert ok and len(app_module.feature_store) == 21
+        assert scored_rows(app_module.model) == 1
+        assert app_module.current_table(app_module.model).store is app_module.feature_store
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
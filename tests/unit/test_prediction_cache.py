@@ -0,0 +1,124 @@
+"""
+Unit tests for the LRU prediction cache
+"""
+import threading
+import time
+
+import pytest
+
+from prediction_cache import PredictionCache
+
+
+class TestPredictionCache:
+    """Test LRU behaviour, counters, invalidation and request coalescing"""
+
+    @pytest.mark.unit
+    def test_hit_and_miss_counters(self):
+        """Test that repeats are served from the cache"""
+        cache = PredictionCache(maxsize=4)
+        model = object()
+        calls = []
+
+        for _ in range(3):
+            value = cache.get_or_compute((1, 2), lambda: calls.append(1) or 4.2, model)
+            assert value == 4.2
+
+        assert len(calls) == 1
+        stats = cache.stats()
+        assert stats['hits'] == 2
+        assert stats['misses'] == 1
+        assert stats['hit_ratio'] == pytest.approx(2 / 3)
+
+    @pytest.mark.unit
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted at the size bound"""
+        cache = PredictionCache(maxsize=2)
+        model = object()
+        cache.get_or_compute('a', lambda: 1, model)
+        cache.get_or_compute('b', lambda: 2, model)
+        cache.get_or_compute('a', lambda: 1, model)  # refresh 'a'
+        cache.get_or_compute('c', lambda: 3, model)  # evicts 'b'
+
+        assert len(cache) == 2
+        assert cache.get_or_compute('a', lambda: -1, model) == 1
+        assert cache.get_or_compute('b', lambda: -2, model) == -2
+
+    @pytest.mark.unit
+    def test_invalidated_by_model_change(self):
+        """Test that a new model object drops predictions of the old one"""
+        cache = PredictionCache()
+        old_model, new_model = object(), object()
+        cache.get_or_compute('row', lambda: 3.0, old_model)
+
+        assert cache.get_or_compute('row', lambda: 4.0, new_model) == 4.0
+        assert cache.stats()['misses'] == 2
+
+    @pytest.mark.unit
+    def test_concurrent_misses_are_coalesced(self):
+        """Test that identical concurrent misses run only one evaluation"""
+        cache = PredictionCache()
+        model = object()
+        release = threading.Event()
+        calls = []
+
+        def slow_compute():
+            calls.append(1)
+            release.wait(5)
+            return 3.9
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get_or_compute('row', slow_compute, model)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        while cache.stats()['coalesced'] < 7:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        assert calls == [1]
+        assert results == [3.9] * 8
+
+    @pytest.mark.unit
+    def test_failures_are_not_cached(self):
+        """Test that an exception reaches the caller and the next call retries"""
+        cache = PredictionCache()
+        model = object()
+
+        def failing():
+            raise ValueError('bad row')
+
+        with pytest.raises(ValueError):
+            cache.get_or_compute('row', failing, model)
+        assert cache.get_or_compute('row', lambda: 2.5, model) == 2.5
+
+
+class TestPredictRouteCaching:
+    """Test that /predict answers repeated rows from the cache"""
+
+    @pytest.mark.unit
+    def test_repeated_form_submissions(self, flask_app_module, monkeypatch, sample_form_data):
+        class CountingModel:
+            calls = 0
+
+            def predict(self, X):
+                CountingModel.calls += 1
+                return [4.2]
+
+        stub = CountingModel()
+        monkeypatch.setattr(flask_app_module, 'model', stub)
+        monkeypatch.setattr(flask_app_module, 'warmed_model', stub)
+        monkeypatch.setattr(flask_app_module, 'prediction_cache', PredictionCache(16))
+        client = flask_app_module.app.test_client()
+
+        for _ in range(3):
+            response = client.post('/predict', data=sample_form_data)
+            assert b'Your Rating is: 4.2' in response.data
+        assert CountingModel.calls == 1
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,135 @@
+"""
+Unit tests for the buffered prediction log
+"""
+import gzip
+import io
+import time
+
+import pytest
+import numpy as np
+
+from features import FEATURE_NAMES
+from prediction_log import PredictionLog, log_files, read_records
+from tests.fixtures.sample_data import ConstantModel
+
+
+def records(directory):
+    return [record for path in log_files(str(directory)) for record in read_records(path)]
+
+
+class TestPredictionLog:
+    """Test buffering, writing, rotation and the drop policy"""
+
+    @pytest.mark.unit
+    def test_rows_and_matrices(self, tmp_path):
+        log = PredictionLog(str(tmp_path), flush_interval=3600)
+        log.record('predict', [1, 0, 100, 5, 10, 15, 500, 20], np.float64(4.2), 1.23456, 'v1')
+        log.record('predict_batch', np.arange(16, dtype=np.float32).reshape(2, 8), np.array([3.5, 3.9]))
+        assert log.stats()['queued'] == 2
+        assert log.flush() == 2
+
+        single, batch = records(tmp_path)
+        assert single['endpoint'] == 'predict'
+        assert single['features'] == [[1, 0, 100, 5, 10, 15, 500, 20]]
+        assert single['predictions'] == [4.2]
+        assert single['latency_ms'] == 1.235
+        assert single['model_version'] == 'v1'
+        assert batch['features'][1] == list(range(8, 16))
+        assert batch['predictions'] == [3.5, 3.9]
+        assert batch['latency_ms'] is None
+        assert log.stats()['written'] == 2
+
+    @pytest.mark.unit
+    def test_full_buffer_drops_oldest(self, tmp_path):
+        log = PredictionLog(str(tmp_path), capacity=3, flush_interval=3600)
+        for i in range(5):
+            log.record('predict', [i] * 8, float(i))
+        stats = log.stats()
+        assert stats['dropped'] == 2 and stats['queued'] == 3
+        log.flush()
+        assert [record['predictions'] for record in records(tmp_path)] == [[2.0], [3.0], [4.0]]
+
+    @pytest.mark.unit
+    def test_background_writer(self, tmp_path):
+        log = PredictionLog(str(tmp_path), flush_interval=0.01)
+        log.record('predict', [1] * 8, 4.0)
+        deadline = time.monotonic() + 5
+        while log.stats()['written'] < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(records(tmp_path)) == 1
+        log.close()
+
+    @pytest.mark.unit
+    def test_size_rotation_and_compression(self, tmp_path):
+        log = PredictionLog(str(tmp_path), max_bytes=300, compress=True, flush_interval=3600)
+        for i in range(6):
+            log.record('predict', [i] * 8, float(i))
+            log.flush()
+        log.close()
+
+        paths = log_files(str(tmp_path))
+        assert len(paths) > 1
+        assert all(path.endswith('.jsonl.gz') for path in paths)
+        with gzip.open(paths[0], 'rt') as f:
+            assert f.readline().startswith('{"time":')
+        assert [record['predictions'][0] for record in records(tmp_path)] == [0.0, 1.0, 2.0, 3.0, 4.0, 5.0]
+
+    @pytest.mark.unit
+    def test_time_rotation(self, tmp_path):
+        log = PredictionLog(str(tmp_path), rotate_seconds=0.05, flush_interval=3600)
+        log.record('predict', [1] * 8, 4.0)
+        log.flush()
+        time.sleep(0.06)
+        log.record('predict', [2] * 8, 4.0)
+        log.flush()
+        log.close()
+        assert log.stats()['files'] == 2
+        assert len(log_files(str(tmp_path))) == 2
+
+    @pytest.mark.unit
+    def test_write_errors_drop_entries(self, tmp_path, monkeypatch):
+        log = PredictionLog(str(tmp_path), flush_interval=3600)
+        log.record('predict', [1] * 8, 4.0)
+
+        def fail():
+            raise OSError('disk full')
+
+        monkeypatch.setattr(log, '_open', fail)
+        assert log.flush() == 0
+        assert log.stats()['write_errors'] == 1
+        assert log.stats()['dropped'] == 1
+
+
+class TestAppLogging:
+    """Test that each prediction route logs what it predicted"""
+
+    @pytest.mark.unit
+    def test_routes_are_logged(self, flask_app_module, monkeypatch, sample_form_data, tmp_path):
+        stub = ConstantModel()
+        log = PredictionLog(str(tmp_path), flush_interval=3600)
+        monkeypatch.setattr(flask_app_module, 'model', stub)
+        monkeypatch.setattr(flask_app_module, 'warmed_model', stub)
+        monkeypatch.setattr(flask_app_module, 'prediction_cache', None)
+        monkeypatch.setattr(flask_app_module, 'prediction_log', log)
+        monkeypatch.setattr(flask_app_module, 'model_version', 'model.forest@1:2')
+        client = flask_app_module.app.test_client()
+
+        assert b'Your Rating is: 3.7' in client.post('/predict', data=sample_form_data).data
+        rows = {'columns': {name: [1, 2, 3] for name in FEATURE_NAMES}}
+        assert client.post('/api/v1/predict', json=rows).status_code == 200
+        csv_body = ','.join(FEATURE_NAMES) + '\n' + ','.join(['1'] * 8) + '\n'
+        client.post('/api/v1/predict/csv', data={'file': (io.BytesIO(csv_body.encode()), 'rows.csv')}).get_data()
+        client.post('/api/v1/predict', json={'columns': {'votes': [1]}})
+        log.flush()
+
+        logged = records(tmp_path)
+        assert [record['endpoint'] for record in logged] == ['predict', 'predict_batch', 'predict_csv']
+        assert [len(record['predictions']) for record in logged] == [1, 3, 1]
+        assert all(record['model_version'] == 'model.forest@1:2' for record in logged)
+        assert all(record['latency_ms'] >= 0 for record in logged)
+        assert logged[0]['features'][0][2] == int(sample_form_data['Votes'])
+        assert flask_app_module.app.test_client().get('/api/v1/stats').get_json()['prediction_log']['written'] == 3
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,143 @@
+"""
+Unit tests for the raw data preprocessing pipeline
+"""
+import csv
+import os
+import subprocess
+import sys
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from preprocessing import CATEGORICAL_COLUMNS, load_vocabularies, preprocess
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+RAW_HEADER = [
+    'url', 'address', 'name', 'online_order', 'book_table', 'rate', 'votes', 'phone',
+    'location', 'rest_type', 'dish_liked', 'cuisines', 'approx_cost(for two people)',
+    'reviews_list', 'menu_item', 'listed_in(type)', 'listed_in(city)'
+]
+
+
+def make_raw_rows(n_rows, seed=0):
+    """Listings shaped like the Kaggle dump, with its duplicates, gaps and odd ratings"""
+    rng = np.random.RandomState(seed)
+    locations = ['BTM', 'Banashankari', 'Indiranagar', 'Koramangala 5th Block', 'JP Nagar']
+    rest_types = ['Casual Dining', 'Quick Bites', 'Cafe', 'Delivery', 'Casual Dining, Bar']
+    cuisines = ['North Indian, Chinese', 'South Indian', 'Cafe, Italian', 'Biryani']
+    menus = ['[]', "['Masala Dosa', 'Idli']", "['Paneer Tikka', 'Naan, Butter']"]
+    ratings = ['4.1/5', '3.8 /5', 'NEW', '-', '2.9/5', '4.5/5']
+    rows = []
+    for i in range(n_rows):
+        rows.append([
+            f'https://www.zomato.com/r{i}', f'{i} Main Road, Bangalore', f'Restaurant {i % 40}',
+            rng.choice(['Yes', 'No']), rng.choice(['Yes', 'No']), rng.choice(ratings),
+            str(rng.randint(0, 5000)), f'080 {i}', rng.choice(locations), rng.choice(rest_types),
+            rng.choice(['Pasta, Pizza', '']), rng.choice(cuisines),
+            rng.choice(['800', '1,200', '300', '2,500']),
+            f"[('Rated 4.0', 'RATED\\n  Great food, \"nice\" place {i}')]",
+            rng.choice(menus), 'Delivery', 'BTM',
+        ])
+    # Re-listed restaurants: identical apart from url and phone
+    for i in range(0, n_rows, 7):
+        rows.append([f'https://www.zomato.com/dup{i}'] + rows[i][1:7] + ['999'] + rows[i][8:])
+    return rows
+
+
+def write_raw(path, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(RAW_HEADER)
+        writer.writerows(rows)
+
+
+def notebook_pipeline(raw_path):
+    """The cleaning and encoding cells of Zomato.ipynb, as written there"""
+    from sklearn.preprocessing import LabelEncoder
+    data = pd.read_csv(raw_path)
+    df = data.drop(['url', 'phone'], axis=1)
+    df.drop_duplicates(inplace=True)
+    df.dropna(how='any', inplace=True)
+    df = df.rename(columns={'approx_cost(for two people)': 'cost', 'listed_in(type)': 'type',
+                            'listed_in(city)': 'city'})
+    df['cost'] = df['cost'].astype(str).apply(lambda x: x.replace(',', ''))
+    df['cost'] = df['cost'].astype(float)
+    df = df.loc[(df.rate != 'NEW') & (df.rate != '-')]
+    df['rate'] = df['rate'].apply(lambda x: x.replace('/5', ''))
+    df['rate'] = df['rate'].astype(float)
+    df['online_order'] = (df['online_order'] == 'Yes').astype(int)
+    df['book_table'] = (df['book_table'] == 'Yes').astype(int)
+    le = LabelEncoder()
+    for column in CATEGORICAL_COLUMNS:
+        df[column] = le.fit_transform(df[column])
+    df.index = range(df.shape[0])
+    return df.iloc[:, [2, 3, 4, 5, 6, 7, 9, 10, 12]]
+
+
+@pytest.fixture
+def raw_path(tmp_path):
+    path = str(tmp_path / 'zomato.csv')
+    write_raw(path, make_raw_rows(300))
+    return path
+
+
+class TestPreprocess:
+    """Test that the streamed pipeline reproduces the notebook's table"""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('chunk_rows', [16, 100000])
+    def test_matches_notebook(self, raw_path, tmp_path, chunk_rows):
+        """Test identical output whether duplicates fall in one chunk or across chunks"""
+        output = str(tmp_path / 'Zomato_df.csv')
+        stats = preprocess(raw_path, output, str(tmp_path / 'vocabularies.json'), chunk_rows)
+
+        expected = notebook_pipeline(raw_path)
+        table = pd.read_csv(output, index_col=0)
+        pd.testing.assert_frame_equal(table, expected, check_dtype=False)
+        assert stats['rows_written'] == len(expected)
+        assert stats['duplicates'] > 0 and stats['incomplete'] > 0 and stats['invalid'] > 0
+
+    @pytest.mark.unit
+    def test_output_loads_like_zomato_df(self, raw_path, tmp_path):
+        """Test that the table has the same header as the shipped Zomato_df.csv"""
+        output = str(tmp_path / 'Zomato_df.csv')
+        preprocess(raw_path, output, str(tmp_path / 'vocabularies.json'))
+        with open(output) as f, open(os.path.join(PROJECT_ROOT, 'Zomato_df.csv')) as shipped:
+            assert f.readline() == shipped.readline()
+
+    @pytest.mark.unit
+    def test_vocabularies(self, raw_path, tmp_path):
+        """Test that every code in the table indexes its column's vocabulary"""
+        output, vocab_path = str(tmp_path / 'Zomato_df.csv'), str(tmp_path / 'vocabularies.json')
+        preprocess(raw_path, output, vocab_path, chunk_rows=50)
+
+        vocabularies = load_vocabularies(vocab_path)
+        table = pd.read_csv(output, index_col=0)
+        raw = notebook_pipeline_raw_values(raw_path)
+        for column in CATEGORICAL_COLUMNS:
+            assert vocabularies[column] == sorted(vocabularies[column])
+            decoded = [vocabularies[column][code] for code in table[column]]
+            assert decoded == raw[column]
+
+    @pytest.mark.unit
+    def test_cli(self, raw_path, tmp_path):
+        output = str(tmp_path / 'table.csv')
+        result = subprocess.run(
+            [sys.executable, 'preprocessing.py', raw_path, '--output', output,
+             '--vocabularies', str(tmp_path / 'vocab.json'), '--chunk-rows', '64'],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+        assert 'Wrote' in result.stdout
+        assert os.path.exists(output)
+
+
+def notebook_pipeline_raw_values(raw_path):
+    """Categorical strings of the rows the notebook keeps, before encoding"""
+    df = pd.read_csv(raw_path).drop(['url', 'phone'], axis=1).drop_duplicates().dropna(how='any')
+    df = df.loc[(df.rate != 'NEW') & (df.rate != '-')]
+    return {column: df[column].tolist() for column in CATEGORICAL_COLUMNS}
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,171 @@
+"""
+Unit tests for on-demand profiling of live requests
+"""
+import marshal
+import pstats
+import threading
+import time
+
+import pytest
+
+from profiling import ProfileSession, collapse
+from tests.fixtures.sample_data import ConstantModel
+
+
+def busy(seconds=0.002):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class TestProfileSession:
+    """Test capturing requests with cProfile and stack sampling"""
+
+    @pytest.mark.unit
+    def test_cprofile_next_requests(self):
+        session = ProfileSession('cprofile', requests=2, endpoints={'predict'})
+        for endpoint in ('predict', 'home', 'predict', 'predict'):
+            token = session.begin(endpoint)
+            busy()
+            if token is not None:
+                session.end(token)
+
+        assert session.captured == 2
+        assert session.wait(0)
+        stats = pstats.Stats()
+        stats.stats = marshal.loads(session.result('pstats')[0])
+        assert any(func == 'busy' for _, _, func in stats.stats)
+        assert b'busy' in session.result('text')[0]
+
+    @pytest.mark.unit
+    def test_cprofile_one_request_at_a_time(self):
+        """Test that a request overlapping a profiled one is not captured"""
+        session = ProfileSession('cprofile', requests=5)
+        first = session.begin('predict')
+        assert session.begin('predict') is None
+        session.end(first)
+        assert session.captured == 1
+
+    @pytest.mark.unit
+    def test_sampling_collapsed_stacks(self):
+        session = ProfileSession('sample', requests=1, interval=0.001)
+        started = threading.Event()
+
+        def handle():
+            token = session.begin('predict')
+            started.set()
+            busy(0.1)
+            session.end(token)
+
+        thread = threading.Thread(target=handle)
+        thread.start()
+        assert session.wait(5)
+        thread.join()
+        session.close()
+
+        body, mimetype = session.result()
+        lines = body.decode().splitlines()
+        assert mimetype == 'text/plain'
+        assert session.samples > 0
+        assert any(line.rsplit(' ', 1)[0].endswith(f'busy (test_profiling.py:{busy.__code__.co_firstlineno})')
+                   for line in lines)
+        assert sum(int(line.rsplit(' ', 1)[1]) for line in lines) == session.samples
+
+    @pytest.mark.unit
+    def test_time_window(self):
+        session = ProfileSession('cprofile', seconds=0.05)
+        assert not session.wait(0)
+        assert session.wait(5)
+        assert session.begin('predict') is None
+
+    @pytest.mark.unit
+    def test_collapse_outermost_first(self):
+        def inner():
+            import sys
+            return collapse(sys._getframe())
+
+        frames = inner().split(';')
+        assert frames[-1].startswith('inner (test_profiling.py:')
+        assert frames[-2].startswith('test_collapse_outermost_first')
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('kwargs', [
+        {'mode': 'perf', 'requests': 1},
+        {'requests': 1, 'seconds': 1},
+        {},
+        {'requests': 0},
+        {'seconds': 1, 'interval': 0},
+    ])
+    def test_invalid_sessions(self, kwargs):
+        with pytest.raises(ValueError):
+            ProfileSession(**kwargs)
+
+
+class TestProfileRoute:
+    """Test the admin-protected /admin/profile route"""
+
+    @pytest.fixture
+    def app_module(self, flask_app_module, monkeypatch):
+        stub = ConstantModel()
+        monkeypatch.setattr(flask_app_module, 'model', stub)
+        monkeypatch.setattr(flask_app_module, 'warmed_model', stub)
+        monkeypatch.setattr(flask_app_module, 'prediction_cache', None)
+        monkeypatch.setattr(flask_app_module, 'ADMIN_TOKEN', 's3cret')
+        return flask_app_module
+
+    def profile(self, app_module, query):
+        client = app_module.app.test_client()
+        return client.post(f'/admin/profile?{query}', headers={'X-Admin-Token': 's3cret'})
+
+    def send_traffic(self, app_module, form, count):
+        """Post count forms from another thread once a profile is being captured"""
+        def run():
+            client = app_module.app.test_client()
+            deadline = time.monotonic() + 5
+            while app_module.profile_session is None and time.monotonic() < deadline:
+                time.sleep(0.001)
+            for _ in range(count):
+                client.post('/predict', data=form)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+
+    @pytest.mark.unit
+    def test_requires_admin_token(self, app_module):
+        assert app_module.app.test_client().post('/admin/profile').status_code == 403
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('query', ['mode=perf', 'mode=sample&format=pstats', 'requests=many', 'seconds=600'])
+    def test_invalid_parameters(self, app_module, query):
+        assert self.profile(app_module, query).status_code == 400
+
+    @pytest.mark.unit
+    def test_profiles_next_predictions(self, app_module, sample_form_data, tmp_path, monkeypatch):
+        monkeypatch.setattr(app_module, 'PROFILE_DIR', str(tmp_path))
+        traffic = self.send_traffic(app_module, sample_form_data, 3)
+        response = self.profile(app_module, 'requests=3&timeout=10')
+        traffic.join()
+
+        assert response.status_code == 200
+        assert response.headers['X-Profile-Requests'] == '3'
+        assert response.headers['X-Profile-Complete'] == 'true'
+        stats = pstats.Stats(response.headers['X-Profile-Path'])
+        assert any(func == 'predict_one' for _, _, func in stats.stats)
+        assert app_module.profile_session is None
+
+    @pytest.mark.unit
+    def test_incomplete_profile_after_timeout(self, app_module):
+        response = self.profile(app_module, 'requests=3&timeout=0.05&format=text')
+        assert response.status_code == 200
+        assert response.headers['X-Profile-Complete'] == 'false'
+        assert response.headers['X-Profile-Requests'] == '0'
+
+    @pytest.mark.unit
+    def test_one_session_at_a_time(self, app_module, monkeypatch):
+        monkeypatch.setattr(app_module, 'profile_session', ProfileSession(requests=1))
+        assert self.profile(app_module, 'requests=1').status_code == 409
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
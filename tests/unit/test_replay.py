@@ -0,0 +1,162 @@
+"""
+Unit tests for the offline replay evaluator
+"""
+import gzip
+import json
+import os
+import pickle
+import subprocess
+import sys
+
+import pytest
+import numpy as np
+from sklearn.ensemble import ExtraTreesRegressor
+
+from prediction_log import PredictionLog
+from replay import (RATING_EDGES, histogram_quantile, ks_statistic, log_paths, parse_block, psi,
+                    read_blocks, replay)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="module")
+def models(tmp_path_factory, trained_forest):
+    """Paths of the trained forest and of a candidate fitted with another seed"""
+    model, X = trained_forest
+    candidate = ExtraTreesRegressor(n_estimators=15, random_state=1).fit(X, model.predict(X) + 0.2)
+    directory = tmp_path_factory.mktemp('models')
+    paths = []
+    for name, forest in (('baseline.pkl', model), ('candidate.pkl', candidate)):
+        paths.append(str(directory / name))
+        with open(paths[-1], 'wb') as f:
+            pickle.dump(forest, f)
+    return paths
+
+
+@pytest.fixture(scope="module")
+def logs(tmp_path_factory, trained_forest):
+    """Prediction logs of every training row: single-row requests, then batches, split over files"""
+    _, X = trained_forest
+    X = X.values.astype(np.float32)
+    directory = tmp_path_factory.mktemp('logs')
+    log = PredictionLog(str(directory), max_bytes=8000, compress=True, flush_interval=3600)
+    for row in X[:100]:
+        log.record('predict', row.astype(int).tolist(), 3.5, 1.0, 'v1')
+        log.flush()
+    for start in range(100, len(X), 50):
+        log.record('predict_batch', X[start:start + 50], np.full(len(X[start:start + 50]), 3.5))
+        log.flush()
+    log.close()
+    return str(directory), X
+
+
+class TestReading:
+    """Test streaming prediction logs in blocks"""
+
+    @pytest.mark.unit
+    def test_blocks_keep_lines_whole(self, logs):
+        directory, X = logs
+        paths = log_paths([directory])
+        assert len(paths) > 1 and all(path.endswith('.gz') for path in paths)
+        blocks = list(read_blocks(paths, chunk_bytes=5000))
+        assert len(blocks) > 2
+        matrices = [parse_block(block)[0] for block in blocks]
+        np.testing.assert_array_equal(np.vstack(matrices), X)
+        assert sum(parse_block(block)[2] for block in blocks) == 100 + 8
+
+    @pytest.mark.unit
+    def test_parse_block(self):
+        lines = [
+            {'features': [[1] * 8], 'predictions': [4.0]},
+            {'features': [[2] * 8, [3] * 8], 'predictions': []},
+        ]
+        X, logged, requests = parse_block(b'\n'.join(json.dumps(line).encode() for line in lines) + b'\n\n')
+        assert X.shape == (3, 8) and requests == 2
+        assert logged[0] == 4.0 and np.isnan(logged[1:]).all()
+
+    @pytest.mark.unit
+    def test_missing_log(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            log_paths([str(tmp_path / 'missing.jsonl')])
+
+
+class TestStatistics:
+    """Test histogram quantiles and distribution shift measures"""
+
+    @pytest.mark.unit
+    def test_histogram_quantile(self):
+        values = np.random.RandomState(0).uniform(2.0, 4.5, 10000)
+        counts = np.histogram(values, RATING_EDGES)[0]
+        for q in (0.05, 0.5, 0.95):
+            assert histogram_quantile(counts, RATING_EDGES, q) == pytest.approx(np.quantile(values, q), abs=0.01)
+        assert histogram_quantile(np.zeros(500), RATING_EDGES, 0.5) is None
+
+    @pytest.mark.unit
+    def test_shift_measures(self):
+        rng = np.random.RandomState(0)
+        same = np.histogram(rng.normal(3.5, 0.3, 5000), RATING_EDGES)[0]
+        also_same = np.histogram(rng.normal(3.5, 0.3, 5000), RATING_EDGES)[0]
+        shifted = np.histogram(rng.normal(4.0, 0.3, 5000), RATING_EDGES)[0]
+        assert psi(same, same) == 0 and ks_statistic(same, same) == 0
+        assert ks_statistic(same, also_same) < 0.05
+        assert psi(same, shifted) > psi(same, also_same)
+        assert ks_statistic(same, shifted) > 0.5
+
+
+class TestReplay:
+    """Test replaying logs through two models"""
+
+    @pytest.mark.unit
+    def test_report_matches_direct_predictions(self, logs, models, trained_forest):
+        directory, X = logs
+        baseline_path, candidate_path = models
+        report = replay(log_paths([directory]), baseline_path, candidate_path, processes=0, chunk_bytes=5000)
+
+        with open(baseline_path, 'rb') as f:
+            baseline = pickle.load(f).predict(X)
+        with open(candidate_path, 'rb') as f:
+            candidate = pickle.load(f).predict(X)
+        delta = candidate - baseline
+        assert report['rows'] == len(X)
+        assert report['baseline']['mean'] == pytest.approx(baseline.mean(), abs=1e-4)
+        assert report['candidate']['p50'] == pytest.approx(np.median(candidate), abs=0.02)
+        assert report['delta']['mean'] == pytest.approx(delta.mean(), abs=1e-5)
+        assert report['delta']['max_abs'] == pytest.approx(np.abs(delta).max(), abs=1e-5)
+        assert report['delta']['share_over_tolerance'] == pytest.approx((np.abs(delta) > 0.1).mean(), abs=1e-5)
+        assert report['shift']['psi'] > 0
+        assert report['baseline']['latency_us_per_row'] > 0
+        assert report['logged']['rows'] == len(X)
+
+    @pytest.mark.unit
+    def test_same_model_has_no_deltas(self, logs, models):
+        directory, _ = logs
+        report = replay([directory + '/' + name for name in sorted(os.listdir(directory))],
+                        models[0], models[0], processes=0)
+        assert report['delta']['max_abs'] == 0
+        assert report['shift'] == {'mean': 0, 'psi': 0, 'ks': 0}
+
+    @pytest.mark.unit
+    @pytest.mark.slow
+    def test_process_pool_cli(self, logs, models, tmp_path):
+        directory, X = logs
+        report_path = tmp_path / 'report.json'
+        result = subprocess.run(
+            [sys.executable, os.path.join(PROJECT_ROOT, 'replay.py'), directory, '--baseline', models[0],
+             '--candidate', models[1], '--processes', '2', '--chunk-bytes', '5000', '--json', str(report_path)],
+            capture_output=True, text=True, timeout=120)
+        assert result.returncode == 0, result.stdout + result.stderr
+        assert f'Replayed {len(X)} rows' in result.stdout
+        with open(report_path) as f:
+            assert json.load(f)['processes'] == 2
+
+    @pytest.mark.unit
+    def test_empty_log(self, tmp_path, models):
+        path = tmp_path / 'predictions-empty.jsonl.gz'
+        with gzip.open(path, 'wb'):
+            pass
+        report = replay([str(path)], models[0], models[1], processes=0)
+        assert report['rows'] == 0
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,150 @@
+"""
+Unit tests for the pre-fork serving configuration and memory report
+"""
+import os
+import pickle
+import runpy
+import subprocess
+import sys
+
+import pytest
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TestGunicornConfig:
+    """Test the settings read by gunicorn from gunicorn.conf.py"""
+
+    @pytest.mark.unit
+    def test_preloads_app_before_forking(self):
+        """Test that the model is loaded in the master, not per worker"""
+        config = runpy.run_path(os.path.join(PROJECT_ROOT, 'gunicorn.conf.py'))
+        assert config['preload_app'] is True
+        assert config['worker_class'] == 'gthread'
+        assert callable(config['when_ready'])
+
+    @pytest.mark.unit
+    def test_workers_and_threads_from_environment(self, monkeypatch):
+        """Test that worker and thread counts are configurable"""
+        monkeypatch.setenv('ZOMATO_WORKERS', '3')
+        monkeypatch.setenv('ZOMATO_THREADS', '8')
+        config = runpy.run_path(os.path.join(PROJECT_ROOT, 'gunicorn.conf.py'))
+        assert config['workers'] == 3
+        assert config['threads'] == 8
+
+    @pytest.mark.unit
+    def test_freeze_model(self, flask_app_module, monkeypatch, trained_forest):
+        """Test that freezing makes the served node arrays read-only"""
+        from forest import FlatForest
+        flat = FlatForest.from_sklearn(trained_forest[0])
+        monkeypatch.setattr(flask_app_module, 'model', flat)
+        try:
+            flask_app_module.freeze_model()
+        finally:
+            import gc
+            gc.unfreeze()
+        assert not flat.threshold.flags.writeable
+        with pytest.raises(ValueError):
+            flat.value[0] = 0.0
+
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/smaps_rollup'), reason="requires Linux /proc")
+class TestWorkerMemory:
+    """Test the per-process memory report"""
+
+    @pytest.mark.unit
+    def test_process_memory(self):
+        from worker_memory import process_memory
+        usage = process_memory(os.getpid())
+        assert usage['rss'] > 0
+        assert usage['pss'] <= usage['rss']
+        assert usage['private'] + usage['shared'] == pytest.approx(usage['rss'], abs=8)
+
+    @pytest.mark.unit
+    def test_reports_children_of_master(self):
+        """Test that forked children are listed as workers"""
+        from worker_memory import memory_report
+        child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+        try:
+            report = memory_report(os.getpid())
+        finally:
+            child.kill()
+            child.wait()
+        assert report[0][:2] == ('master', os.getpid())
+        assert ('worker', child.pid) in [(role, pid) for role, pid, _ in report]
+
+    @pytest.mark.unit
+    @pytest.mark.slow
+    def test_mapped_artifact_shares_forest_between_processes(self, tmp_path):
+        """
+        Measure private memory per serving process with the forest unpickled
+        into each heap versus memory-mapped from one artifact
+        """
+        from artifact import save_forest
+        forest = complete_forest(n_trees=64, depth=14)
+        model_kb = sum(array.nbytes for array in forest.arrays().values()) / 1024
+        pickled, mapped = str(tmp_path / 'model.pkl'), str(tmp_path / 'model.forest')
+        with open(pickled, 'wb') as f:
+            pickle.dump(forest, f)
+        save_forest(forest, mapped)
+
+        usage = {'pickle': serving_memory(pickled), 'mmap': serving_memory(mapped)}
+        print(f"\nforest {model_kb / 1024:.1f} MB, private MB per process:")
+        for name, processes in usage.items():
+            print(f"  {name:<7}" + ''.join(f"{u['private'] / 1024:>8.1f}" for u in processes))
+
+        pickle_private = min(u['private'] for u in usage['pickle'])
+        mmap_private = max(u['private'] for u in usage['mmap'])
+        assert pickle_private - mmap_private > 0.8 * model_kb
+        assert all(u['shared'] > 0.8 * model_kb for u in usage['mmap'])
+
+
+def complete_forest(n_trees, depth, seed=0):
+    """FlatForest of complete binary trees, large enough to dominate process memory"""
+    from forest import FlatForest
+    rng = np.random.RandomState(seed)
+    per_tree = 2 ** (depth + 1) - 1
+    local = np.arange(per_tree)
+    internal = local < 2 ** depth - 1
+    offsets = np.repeat(np.arange(n_trees) * per_tree, per_tree)
+    left = np.tile(np.where(internal, 2 * local + 1, local), n_trees) + offsets
+    right = np.tile(np.where(internal, 2 * local + 2, local), n_trees) + offsets
+    return FlatForest(
+        feature=rng.randint(0, 8, n_trees * per_tree),
+        threshold=np.tile(np.where(internal, 0.0, np.inf), n_trees) + rng.rand(n_trees * per_tree),
+        children=np.stack([left, right], axis=1),
+        value=rng.rand(n_trees * per_tree),
+        roots=np.arange(n_trees) * per_tree,
+        n_features=8,
+        max_depth=depth,
+    )
+
+
+def serving_memory(model_path, processes=2):
+    """Memory of independent processes that each load model_path and touch every node"""
+    from worker_memory import process_memory
+    script = (
+        'import sys; import numpy as np; from model_loader import load_model; '
+        'model = load_model(sys.argv[1]); '
+        '[array.sum() for array in model.arrays().values()]; '
+        'model.predict(np.zeros((4, 8))); '
+        'print("ready", flush=True); sys.stdin.read()'
+    )
+    children = [subprocess.Popen([sys.executable, '-c', script, model_path], cwd=PROJECT_ROOT,
+                                 stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+                for _ in range(processes)]
+    try:
+        for child in children:
+            assert child.stdout.readline().strip() == 'ready'
+        # Measure only once all processes hold the model, so pages they
+        # map together are counted as shared
+        return [process_memory(child.pid) for child in children]
+    finally:
+        for child in children:
+            child.stdin.close()
+            child.wait(30)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
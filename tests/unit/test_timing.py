@@ -0,0 +1,119 @@
+"""
+Unit tests for per-request phase timing and span export
+"""
+import json
+import re
+
+import pytest
+
+from features import FEATURE_NAMES
+from timing import JsonlSpanExporter, current_timer, end_request, phase, start_request
+from tests.fixtures.sample_data import ConstantModel
+
+SERVER_TIMING = re.compile(r'^[a-z]+;dur=\d+\.\d{3}$')
+
+
+class TestRequestTimer:
+    """Test recording phases and rendering them"""
+
+    @pytest.mark.unit
+    def test_phases_and_header(self):
+        timer, token = start_request('predict')
+        try:
+            with phase('parse'):
+                pass
+            for _ in range(2):
+                with phase('forest'):
+                    pass
+        finally:
+            end_request(token)
+
+        assert [name for name, _, _ in timer.phases] == ['parse', 'forest', 'forest']
+        entries = timer.server_timing().split(', ')
+        assert [entry.split(';')[0] for entry in entries] == ['parse', 'forest', 'total']
+        assert all(SERVER_TIMING.match(entry) for entry in entries)
+
+    @pytest.mark.unit
+    def test_phase_is_noop_without_timer(self):
+        """Test that untimed code shares one no-op context manager"""
+        assert current_timer() is None
+        assert phase('parse') is phase('forest')
+        with phase('parse'):
+            pass
+
+    @pytest.mark.unit
+    def test_phase_records_on_error(self):
+        timer, token = start_request('predict')
+        try:
+            with pytest.raises(ValueError):
+                with phase('convert'):
+                    raise ValueError('bad input')
+        finally:
+            end_request(token)
+        assert [name for name, _, _ in timer.phases] == ['convert']
+        assert current_timer() is None
+
+    @pytest.mark.unit
+    def test_jsonl_exporter(self, tmp_path):
+        path = tmp_path / 'spans.jsonl'
+        exporter = JsonlSpanExporter(str(path))
+        for name in ('predict', 'predict_batch'):
+            timer, token = start_request(name)
+            with phase('forest'):
+                pass
+            end_request(token)
+            exporter(timer.to_record(status=200))
+
+        records = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [record['name'] for record in records] == ['predict', 'predict_batch']
+        assert records[0]['status'] == 200
+        assert records[0]['spans'][0]['name'] == 'forest'
+        assert records[0]['trace_id'] != records[1]['trace_id']
+
+
+class TestServerTimingHeader:
+    """Test the Flask hooks that time requests"""
+
+    @pytest.fixture
+    def app_module(self, flask_app_module, monkeypatch):
+        stub = ConstantModel()
+        monkeypatch.setattr(flask_app_module, 'model', stub)
+        monkeypatch.setattr(flask_app_module, 'warmed_model', stub)
+        monkeypatch.setattr(flask_app_module, 'prediction_cache', None)
+        return flask_app_module
+
+    @pytest.mark.unit
+    def test_disabled_by_default(self, app_module, monkeypatch, sample_form_data):
+        monkeypatch.setattr(app_module, 'REQUEST_TIMING', False)
+        monkeypatch.setattr(app_module, 'span_exporter', None)
+        response = app_module.app.test_client().post('/predict', data=sample_form_data)
+        assert 'Server-Timing' not in response.headers
+
+    @pytest.mark.unit
+    def test_predict_phases(self, app_module, monkeypatch, sample_form_data):
+        """Test that /predict reports each step of the form prediction"""
+        monkeypatch.setattr(app_module, 'REQUEST_TIMING', True)
+        response = app_module.app.test_client().post('/predict', data=sample_form_data)
+        assert b'Your Rating is: 3.7' in response.data
+        names = [entry.split(';')[0] for entry in response.headers['Server-Timing'].split(', ')]
+        assert names == ['form', 'convert', 'array', 'forest', 'predict', 'round', 'render', 'total']
+
+    @pytest.mark.unit
+    def test_exporter_receives_request_record(self, app_module, monkeypatch):
+        """Test that a pluggable exporter gets spans even without the header"""
+        records = []
+        monkeypatch.setattr(app_module, 'REQUEST_TIMING', False)
+        monkeypatch.setattr(app_module, 'span_exporter', records.append)
+        rows = {'columns': {name: [1, 2] for name in FEATURE_NAMES}}
+        client = app_module.app.test_client()
+        response = client.post('/api/v1/predict', json=rows)
+
+        assert 'Server-Timing' not in response.headers
+        assert len(records) == 1
+        assert records[0]['path'] == '/api/v1/predict'
+        assert records[0]['status'] == response.status_code == 200
+        assert [span['name'] for span in records[0]['spans']] == ['parse', 'encode', 'forest', 'predict', 'serialize']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
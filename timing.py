@@ -0,0 +1,136 @@
+"""
+Lightweight per-request phase timing
+
+A RequestTimer is started for each request and made current for the
+handling thread; code on the request path wraps its steps in phase():
+
+    with phase('forest'):
+        predictions = model.predict(X)
+
+When the request ends the durations are rendered as a Server-Timing header
+(milliseconds, summed per phase name, plus ``total``) and the record can be
+handed to an exporter: any callable taking the record dict, such as
+JsonlSpanExporter, which appends one JSON line per request to a local file.
+
+Without a current timer phase() returns a shared no-op context manager,
+so instrumented code costs one context variable lookup when timing is off.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+
+_current = contextvars.ContextVar('request_timer', default=None)
+
+
+class RequestTimer:
+    """Start time and phases of one request"""
+
+    def __init__(self, name):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex
+        self.start_time = time.time()
+        self.started = time.perf_counter()
+        self.phases = []
+        self.duration = None
+
+    def record(self, name, start, end):
+        self.phases.append((name, start - self.started, end - start))
+
+    def finish(self):
+        if self.duration is None:
+            self.duration = time.perf_counter() - self.started
+        return self.duration
+
+    def server_timing(self):
+        """Server-Timing header value: each phase's total milliseconds, then the request's"""
+        totals = {}
+        for name, _, duration in self.phases:
+            totals[name] = totals.get(name, 0.0) + duration
+        totals['total'] = self.finish()
+        return ', '.join(f'{name};dur={duration * 1000:.3f}' for name, duration in totals.items())
+
+    def to_record(self, **attributes):
+        """The request and its phases as a JSON-serializable span record"""
+        return {
+            'trace_id': self.trace_id,
+            'name': self.name,
+            'start': self.start_time,
+            'duration_ms': round(self.finish() * 1000, 3),
+            **attributes,
+            'spans': [
+                {'name': name, 'offset_ms': round(offset * 1000, 3), 'duration_ms': round(duration * 1000, 3)}
+                for name, offset, duration in self.phases
+            ],
+        }
+
+
+class _Phase:
+    __slots__ = ('timer', 'name', 'start')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timer.record(self.name, self.start, time.perf_counter())
+        return False
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+def phase(name):
+    """Context manager timing one step of the current request, if it is timed"""
+    timer = _current.get()
+    return _NULL_PHASE if timer is None else _Phase(timer, name)
+
+
+def start_request(name):
+    """Start timing a request in this context; returns (timer, token for end_request)"""
+    timer = RequestTimer(name)
+    return timer, _current.set(timer)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def current_timer():
+    return _current.get()
+
+
+class JsonlSpanExporter:
+    """Appends each request record as one JSON line to a local file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+        self._pid = None
+
+    def __call__(self, record):
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        with self._lock:
+            # Each forked worker opens its own handle; O_APPEND keeps lines whole
+            if self._pid != os.getpid():
+                self._file = open(self.path, 'a', encoding='utf-8')
+                self._pid = os.getpid()
+            self._file.write(line)
+            self._file.flush()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Report resident memory of a pre-fork server's master and worker processes
+
+Reads /proc/<pid>/smaps_rollup (Linux). ``rss`` counts every resident page
+a process maps, including pages shared with its siblings; ``pss`` splits
+shared pages evenly between the processes mapping them and ``private`` is
+memory owned by that process alone. With the model shared copy-on-write, a
+worker's private memory should be a small fraction of the model size.
+
+    python worker_memory.py <master_pid>
+"""
+import argparse
+import os
+import sys
+
+_FIELDS = {
+    'Rss': 'rss',
+    'Pss': 'pss',
+    'Shared_Clean': 'shared_clean',
+    'Shared_Dirty': 'shared_dirty',
+    'Private_Clean': 'private_clean',
+    'Private_Dirty': 'private_dirty',
+}
+
+
+def process_memory(pid):
+    """Memory counters of one process in kB"""
+    usage = dict.fromkeys(_FIELDS.values(), 0)
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            name, _, rest = line.partition(':')
+            if name in _FIELDS:
+                usage[_FIELDS[name]] = int(rest.split()[0])
+    usage['private'] = usage['private_clean'] + usage['private_dirty']
+    usage['shared'] = usage['shared_clean'] + usage['shared_dirty']
+    return usage
+
+
+def child_pids(pid):
+    """PIDs whose parent is pid"""
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces, the ppid follows ')'
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def memory_report(master_pid):
+    """Memory of the master and each of its workers, keyed by role and pid"""
+    report = [('master', master_pid, process_memory(master_pid))]
+    for pid in child_pids(master_pid):
+        try:
+            report.append(('worker', pid, process_memory(pid)))
+        except OSError:
+            continue  # worker exited while we were looking
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report per-worker memory of a pre-fork server')
+    parser.add_argument('pid', type=int, help='PID of the master process')
+    args = parser.parse_args()
+
+    try:
+        report = memory_report(args.pid)
+    except OSError as e:
+        print(f"Error reading /proc for pid {args.pid}: {e}")
+        sys.exit(1)
+
+    print(f"{'role':<8}{'pid':>8}{'rss MB':>10}{'pss MB':>10}{'shared MB':>11}{'private MB':>12}")
+    for role, pid, usage in report:
+        print(f"{role:<8}{pid:>8}{usage['rss'] / 1024:>10.1f}{usage['pss'] / 1024:>10.1f}"
+              f"{usage['shared'] / 1024:>11.1f}{usage['private'] / 1024:>12.1f}")
+    workers = [usage for role, _, usage in report if role == 'worker']
+    if workers:
+        total_pss = sum(usage['pss'] for _, _, usage in report) / 1024
+        print(f"\n{len(workers)} workers, {total_pss:.1f} MB proportional total "
+              f"({sum(u['rss'] for u in workers) / 1024:.1f} MB if each worker's RSS were private)")
+
+
+if __name__ == '__main__':
+    main()